@@ -1,28 +1,45 @@
 import requests
+from resilience import CircuitBreaker, CircuitOpenError, Policy
 
 class ElmoV2API:
     PORT = 8001
 
-    def __init__(self, robot_ip, debug=False):
+    def __init__(self, robot_ip, debug=False, timeout=2.0, hedge_after=None):
         self.REQUEST_PATH = f"http://{robot_ip}:{self.PORT}/"
         self.GET_REQUEST_PATH = self.REQUEST_PATH + "status"
         self.POST_COMMAND_PATH = self.REQUEST_PATH + "command"
         self.debug = debug
+        # (connect, read) deadline for every HTTP call, in seconds
+        self.timeout = timeout
+
+        # One breaker for the robot link: while Elmo is unreachable, every call
+        # fails fast instead of each one waiting out its own timeout.
+        self.breaker = CircuitBreaker("robot")
+        # Status is an idempotent read, so it may be retried and hedged
+        self.status_policy = Policy("robot.status", attempts=3, breaker=self.breaker,
+                                    hedge_after=hedge_after, retry_on=(requests.exceptions.RequestException,))
+        # Commands move motors and play sounds, so they are never resent
+        self.command_policy = Policy("robot.command", breaker=self.breaker)
 
     # Check the status of the robot and
     def status(self):
         try:
-            response = requests.get(self.GET_REQUEST_PATH)
-            response.raise_for_status()
-            # Additional code will only run if the request is successful
+            response = self.status_policy.call(self._get_status)
 
             if self.debug:
                 print(response.json())
 
             return response.json()
 
-        except requests.exceptions.HTTPError as error:
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             print(error)
+            return None
+
+    def _get_status(self):
+        response = requests.get(self.GET_REQUEST_PATH, timeout=self.timeout)
+        response.raise_for_status()
+        # Additional code will only run if the request is successful
+        return response
 
 
     def enable_behavior(self, name, control):
@@ -144,11 +161,17 @@ class ElmoV2API:
 
     def post_command(self, command):
         try:
-            response = requests.post(self.POST_COMMAND_PATH, json=command)
-            response.raise_for_status()
-            # Additional code will only run if the request is successful
-        except requests.exceptions.HTTPError as error:
+            response = self.command_policy.call(self._post, command)
+        except (requests.exceptions.RequestException, CircuitOpenError) as error:
             print(error)
+            return None
 
         if self.debug:
             print(response.json())
+        return response
+
+    def _post(self, command):
+        response = requests.post(self.POST_COMMAND_PATH, json=command, timeout=self.timeout)
+        response.raise_for_status()
+        # Additional code will only run if the request is successful
+        return response
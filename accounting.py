@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+
+# Gemini bills roughly one token per four characters of English text. Good
+# enough to see how the prompt grows turn over turn without a count_tokens
+# round trip per message.
+CHARS_PER_TOKEN = 4
+
+# Per-turn counters stages can report into
+COUNTERS = [
+    "prompt_tokens",     # system prompt + uploaded context + chat history + input
+    "response_tokens",
+    "history_messages",  # messages resent with this turn
+    "context_bytes",     # uploaded transcript carried by every request
+    "stt_bytes_up",      # audio sent to the speech-to-text service
+    "sftp_bytes_up",     # replies uploaded to the robot
+    "sftp_bytes_down",   # recordings downloaded from the robot
+    "tts_bytes_down",    # synthesized audio received from the TTS service
+    "chunks",            # LLM chunks streamed (taken from the Turn)
+    "speculative_tokens_wasted",  # cancelled replies to partial transcripts
+]
+
+
+def estimate_tokens(text_or_chars):
+    chars = text_or_chars if isinstance(text_or_chars, int) else len(text_or_chars or "")
+    return -(-chars // CHARS_PER_TOKEN)
+
+
+class SessionAccountant:
+    """Per-turn token and payload accounting for one conversation session.
+
+    Stages call `add()` while a turn is in flight; `observe()` (registered as a
+    ConversationEngine observer) closes the turn and stores its record.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id or time.strftime("%Y%m%d-%H%M%S")
+        self.turns = []
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, key, amount=1):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+
+    def observe(self, turn):
+        with self._lock:
+            record, self._pending = self._pending, dict.fromkeys(COUNTERS, 0)
+
+        record["turn"] = len(self.turns) + 1
+        record["user_text"] = turn.user_text
+        record["from_fast_path"] = turn.from_fast_path
+        record["response_tokens"] = record["response_tokens"] or estimate_tokens(turn.response_text)
+        record["chunks"] = turn.chunks
+        record["sentences"] = len(turn.sentences)
+        record["time_to_first_audio"] = turn.time_to_first_audio()
+        record["turn_seconds"] = turn.timings.get("done")
+        record["audio_bytes_up"] = record["stt_bytes_up"] + record["sftp_bytes_up"]
+        record["audio_bytes_down"] = record["sftp_bytes_down"] + record["tts_bytes_down"]
+        self.turns.append(record)
+        return record
+
+    def summary(self):
+        """Session totals and means, plus how much the prompt grew from first to last turn."""
+        answered = [t for t in self.turns if t["user_text"]]
+        keys = COUNTERS + ["audio_bytes_up", "audio_bytes_down"]
+        totals = {k: sum(t[k] for t in self.turns) for k in keys}
+        means = {k: totals[k] / len(answered) for k in keys} if answered else {}
+
+        ttfa = [t["time_to_first_audio"] for t in answered if t["time_to_first_audio"] is not None]
+        llm_turns = [t for t in answered if not t["from_fast_path"]]
+        return {
+            "session_id": self.session_id,
+            "turns": len(self.turns),
+            "answered_turns": len(answered),
+            "totals": totals,
+            "means": means,
+            "prompt_token_growth": (llm_turns[-1]["prompt_tokens"] - llm_turns[0]["prompt_tokens"]) if llm_turns else 0,
+            "mean_time_to_first_audio": sum(ttfa) / len(ttfa) if ttfa else None,
+            "max_time_to_first_audio": max(ttfa) if ttfa else None,
+        }
+
+    def report(self):
+        s = self.summary()
+        lines = [f"Session {s['session_id']}: {s['answered_turns']}/{s['turns']} turns answered"]
+        lines.append(f"{'turn':>4} {'prompt':>8} {'reply':>6} {'hist':>5} {'up KB':>7} {'down KB':>8} {'chunks':>6} {'TTFA s':>7}")
+        for t in self.turns:
+            ttfa = f"{t['time_to_first_audio']:.2f}" if t["time_to_first_audio"] is not None else "-"
+            lines.append(
+                f"{t['turn']:>4} {t['prompt_tokens']:>8} {t['response_tokens']:>6} {t['history_messages']:>5} "
+                f"{t['audio_bytes_up'] / 1024:>7.1f} {t['audio_bytes_down'] / 1024:>8.1f} {t['chunks']:>6} {ttfa:>7}"
+            )
+        lines.append(f"Prompt grew by {s['prompt_token_growth']} tokens over the session")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Writes the per-turn records and session summary as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "turns": self.turns}, f, indent=2)
+        return path
@@ -1,20 +1,33 @@
 import os
+import socket
 import time
 import paramiko
 import speech_recognition as sr
 import edge_tts
 import asyncio
 from dotenv import load_dotenv
+from persona import VOICE
+from resilience import CircuitBreaker, Policy
 
 load_dotenv()
 
+# Errors worth another connection attempt. Wrong credentials or paths would
+# fail the same way again, so they are not retried.
+SSH_TRANSIENT_ERRORS = (socket.timeout, paramiko.ssh_exception.NoValidConnectionsError, EOFError,
+                        ConnectionError)
+
 class AudioHandler:
-    def __init__(self, robot_ip, robot_user="idmind", robot_pass="asdf"):
+    def __init__(self, robot_ip, robot_user="idmind", robot_pass="asdf", timeout=5.0):
         self.robot_ip = robot_ip
         self.robot_user = robot_user
         self.robot_pass = robot_pass
         self.ssh = paramiko.SSHClient()
         self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+        # Deadline (seconds) for connecting and for each SFTP read/write
+        self.timeout = timeout
+        self.ssh_policy = Policy("robot.ssh", attempts=2, breaker=CircuitBreaker("robot.ssh"),
+                                 retry_on=SSH_TRANSIENT_ERRORS)
         
         # Local paths
         self.local_recording_path = "temp_recording.wav"
@@ -26,18 +39,26 @@ class AudioHandler:
 
     def connect_ssh(self):
         try:
-            self.ssh.connect(self.robot_ip, username=self.robot_user, password=self.robot_pass)
+            self.ssh_policy.call(self.ssh.connect, self.robot_ip, username=self.robot_user,
+                                 password=self.robot_pass, timeout=self.timeout,
+                                 banner_timeout=self.timeout, auth_timeout=self.timeout)
             return True
         except Exception as e:
             print(f"SSH Connection failed: {e}")
             return False
 
+    def open_sftp(self):
+        """Opens SFTP on the connected client; a stalled transfer raises instead of hanging."""
+        sftp = self.ssh.open_sftp()
+        sftp.get_channel().settimeout(self.timeout)
+        return sftp
+
     def download_recording(self):
         if not self.connect_ssh():
             return False
         
         try:
-            sftp = self.ssh.open_sftp()
+            sftp = self.open_sftp()
             # We need to find the latest recording. 
             # For now, assuming a fixed filename or we list files.
             # Let's try to list files in the recording directory to find the newest one if needed.
@@ -54,13 +75,32 @@ class AudioHandler:
             self.ssh.close()
             return False
 
-    def upload_response(self, filename="response.mp3"):
+    def has_sound(self, filename):
+        """True if `filename` is already in the robot's sounds directory."""
+        if not self.connect_ssh():
+            return False
+        try:
+            sftp = self.open_sftp()
+            try:
+                sftp.stat(os.path.join(self.robot_sounds_path, filename))
+                return True
+            except IOError:
+                return False
+            finally:
+                sftp.close()
+        except Exception as e:
+            print(f"Failed to check for {filename}: {e}")
+            return False
+        finally:
+            self.ssh.close()
+
+    def upload_response(self, filename="response.mp3", local_file=None):
         if not self.connect_ssh():
             return False
         
         try:
-            sftp = self.ssh.open_sftp()
-            local_file = self.local_response_path
+            sftp = self.open_sftp()
+            local_file = local_file or self.local_response_path
             remote_file = os.path.join(self.robot_sounds_path, filename)
             sftp.put(local_file, remote_file)
             sftp.close()
@@ -89,14 +129,13 @@ class AudioHandler:
             print(f"Error transcribing: {e}")
             return None
 
-    async def _generate_voice_async(self, text):
-        voice = "en-IE-ConnorNeural"
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(self.local_response_path)
+    async def _generate_voice_async(self, text, path=None):
+        communicate = edge_tts.Communicate(text, VOICE)
+        await communicate.save(path or self.local_response_path)
 
-    def generate_audio(self, text):
+    def generate_audio(self, text, path=None):
         try:
-            asyncio.run(self._generate_voice_async(text))
+            asyncio.run(self._generate_voice_async(text, path))
             return True
         except Exception as e:
             print(f"Error generating audio: {e}")
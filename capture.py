@@ -0,0 +1,236 @@
+import math
+import queue
+import threading
+import time
+
+# Always-on microphone capture. One thread reads the device for the whole
+# session into a preallocated ring buffer, tracks the noise floor and finds
+# utterances; `next_utterance()` hands them out as views into the buffer. Speech
+# that starts while we are still thinking is therefore not lost, and the
+# device is opened once instead of every turn.
+
+
+class RingBuffer:
+    """Fixed-size int16 sample history, written without allocating.
+
+    Every sample is stored twice, `capacity` apart, so any window of up to
+    `capacity` samples is contiguous and `view()` never has to copy.
+    """
+
+    def __init__(self, capacity):
+        import numpy as np
+
+        self.capacity = capacity
+        self.data = np.zeros(2 * capacity, dtype=np.int16)
+        self.total = 0  # samples written since the start
+
+    def write_slot(self, n):
+        """Where the next `n` samples go; fill it, then call `commit(n)`."""
+        pos = self.total % self.capacity
+        return self.data[pos:pos + n]
+
+    def commit(self, n):
+        cap = self.capacity
+        pos = self.total % cap
+        head = min(n, cap - pos)
+        self.data[pos + cap:pos + cap + head] = self.data[pos:pos + head]
+        if n > head:
+            self.data[:n - head] = self.data[cap:cap + n - head]
+        self.total += n
+
+    def write(self, samples):
+        n = len(samples)
+        self.write_slot(n)[:] = samples
+        self.commit(n)
+
+    def available(self, start):
+        """True while samples from absolute index `start` haven't been overwritten."""
+        return self.total - start <= self.capacity
+
+    def view(self, start, end):
+        """Zero-copy view of absolute sample indices [start, end)."""
+        if not self.available(start) or end > self.total or end - start > self.capacity:
+            raise IndexError(f"samples {start}-{end} are no longer (or not yet) in the buffer")
+        offset = start % self.capacity
+        return self.data[offset:offset + end - start]
+
+
+class Utterance:
+    """One detected phrase: a view into the ring buffer plus its timing."""
+
+    def __init__(self, buffer, start, onset, end, rate, end_time):
+        self.buffer = buffer
+        self.start = start  # includes pre-roll
+        self.onset = onset  # first chunk above the threshold
+        self.end = end
+        self.rate = rate
+        self.end_time = end_time
+
+    @property
+    def samples(self):
+        return self.buffer.view(self.start, self.end)
+
+    @property
+    def frame_data(self):
+        """The samples as a bytes-like object for speech_recognition, without copying."""
+        return memoryview(self.samples).cast("B")
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / self.rate
+
+
+class MicDevice:
+    """Adapts a speech_recognition Microphone, opened once for the session."""
+
+    def __init__(self, mic):
+        self.mic = mic.__enter__()
+        self.rate = mic.SAMPLE_RATE
+        self.chunk = mic.CHUNK
+
+    def read(self, n):
+        return self.mic.stream.read(n)
+
+    def close(self):
+        self.mic.__exit__(None, None, None)
+
+
+class MicCapture:
+    """Reads `device` continuously and splits the stream into utterances.
+
+    `device` has `read(n) -> bytes` (int16 mono), or `readinto(array) -> int`
+    to fill the ring buffer directly. A phrase starts after `min_speech`
+    seconds above the tracker's threshold and ends after `pause` seconds
+    below it; `pre_roll` seconds before the onset are included, so soft
+    first syllables aren't clipped. Chunks captured while `gate` says our own
+    voice is playing are never taken for speech or noise. With a `suppressor`
+    (echo_control.EchoSuppressor), chunks that overlap our output are cleaned
+    before they are stored, so the filter keeps adapting through every reply.
+    """
+
+    def __init__(self, device, rate=16000, chunk=1024, seconds=60.0, pre_roll=0.5, pause=0.8,
+                 min_speech=0.15, max_phrase=20.0, tracker=None, gate=None, suppressor=None,
+                 clock=time.monotonic):
+        import numpy as np
+
+        from noise_floor import NoiseFloorTracker
+
+        self.device = device
+        self.rate = rate
+        self.chunk = chunk
+        self.buffer = RingBuffer(int(seconds * rate))
+        self.pre_roll = int(pre_roll * rate)
+        self.pause = int(pause * rate)
+        self.min_speech = int(min_speech * rate)
+        self.max_phrase = int(max_phrase * rate)
+        self.tracker = tracker or NoiseFloorTracker()
+        self.gate = gate
+        self.suppressor = suppressor
+        self.clock = clock
+        self.utterances = queue.Queue()
+        self.stats = {"chunks": 0, "onsets": 0, "utterances": 0, "dropped": 0}
+
+        self.np = np
+        self._scratch = np.zeros(chunk, dtype=np.float64)  # for chunk energy
+        self._speech_start = None  # first loud sample of the current run
+        self._onset = None         # set once the run is long enough to be a phrase
+        self._last_speech = None   # end of the last loud chunk
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="mic-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        try:
+            while self._running and self.read_chunk():
+                pass
+        except Exception as e:
+            print(f"Microphone capture stopped: {e}")
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def read_chunk(self):
+        """Reads and processes one chunk. Returns False when the device is exhausted."""
+        slot = self.buffer.write_slot(self.chunk)
+        if hasattr(self.device, "readinto"):
+            n = self.device.readinto(slot)
+        else:
+            data = self.device.read(self.chunk)
+            n = len(data) // 2
+            slot[:n] = self.np.frombuffer(data, dtype=self.np.int16, count=n)
+        if not n:
+            return False
+        if self.suppressor and self.gate and self.gate.references:
+            self._suppress_echo(slot[:n])
+        self.buffer.commit(n)
+        self.process(slot[:n])
+        return True
+
+    def _suppress_echo(self, samples):
+        end = self.clock()
+        reference = self.gate.reference_between(end - len(samples) / self.rate, end, self.rate)
+        if reference.any():
+            cleaned = self.suppressor.process(samples / 32768.0, reference)
+            samples[:] = self.np.clip(cleaned * 32768.0, -32768, 32767)
+
+    def _energy(self, samples):
+        scratch = self._scratch[:len(samples)]
+        scratch[:] = samples  # cast in place; a ufunc with dtype= would allocate cast buffers
+        return math.sqrt(self.np.dot(scratch, scratch) / len(samples))
+
+    def process(self, samples):
+        """Endpointing for one chunk that has just been committed to the buffer."""
+        self.stats["chunks"] += 1
+        end = self.buffer.total
+        clear = self.gate is None or self.gate.is_clear()
+        energy = self._energy(samples)
+        speech = clear and energy > self.tracker.threshold
+        if clear:
+            self.tracker.update(energy, len(samples) / self.rate)
+
+        if speech:
+            if self._speech_start is None:
+                self._speech_start = end - len(samples)
+            self._last_speech = end
+            if self._onset is None and end - self._speech_start >= self.min_speech:
+                self._onset = self._speech_start
+                self.stats["onsets"] += 1
+        elif self._onset is None:
+            self._speech_start = None
+
+        if self._onset is not None:
+            silent_for = end - self._last_speech
+            if silent_for >= self.pause or end - self._onset >= self.max_phrase:
+                self._emit(self._last_speech if silent_for >= self.pause else end)
+
+    def _emit(self, end):
+        start = max(self._onset - self.pre_roll, self.buffer.total - self.buffer.capacity, 0)
+        end_time = self.clock() - (self.buffer.total - end) / self.rate
+        self.utterances.put(Utterance(self.buffer, start, self._onset, end, self.rate, end_time))
+        self.stats["utterances"] += 1
+        self._speech_start = self._onset = self._last_speech = None
+
+    def next_utterance(self, timeout=None):
+        """Blocks for the next phrase. Returns None on timeout or when capture has stopped."""
+        while True:
+            try:
+                utterance = self.utterances.get(timeout=timeout if timeout is not None else 0.1)
+            except queue.Empty:
+                if timeout is not None or not self._running:
+                    return None
+                continue
+            if self.buffer.available(utterance.start):
+                return utterance
+            self.stats["dropped"] += 1  # waited so long it was overwritten
@@ -0,0 +1,362 @@
+import asyncio
+import time
+
+from persona import SentenceSplitter, clean_text_for_speech
+
+# Every deployment (robot, fluid, local) is the same loop:
+#
+#   AudioSource -> SpeechToText -> LanguageModel -> TextToSpeech -> AudioSink
+#                                                 \-> RobotEffects (screen, LEDs, motors)
+#
+# Stages are plain blocking objects; the engine runs them in worker threads and
+# connects the streaming part (LLM chunks -> sentences -> clips -> playback)
+# with bounded asyncio queues, so the first sentence is spoken while the rest
+# of the reply is still being generated and synthesized.
+
+_DONE = object()
+
+
+class EndOfConversation(Exception):
+    """Raised by a stage to stop the engine (e.g. source exhausted, backend unavailable)."""
+
+
+class Clip:
+    """A piece of speech ready for an AudioSink."""
+
+    def __init__(self, path, text="", temporary=True, expressions=()):
+        self.path = path
+        self.text = text
+        # Temporary clips are deleted by the sink once played; cached ones are kept
+        self.temporary = temporary
+        # Emotions/gestures to show while it plays (see expressions.py)
+        self.expressions = expressions
+
+    def __repr__(self):
+        return f"Clip({self.path!r}, {self.text!r})"
+
+
+class Stage:
+    # Set by the engine when a SessionAccountant is attached (see accounting.py)
+    accountant = None
+
+    def account(self, key, amount):
+        """Reports a per-turn payload figure (bytes moved, tokens sent, ...)."""
+        if self.accountant:
+            self.accountant.add(key, amount)
+
+
+class AudioSource(Stage):
+    """Captures one user utterance."""
+    # PlaybackGate shared with the sink (see echo_control.py), set by the engine
+    gate = None
+    # Called with partial transcripts by incremental sources (none ship yet; see speculation.py)
+    on_partial = None
+
+    def listen(self):
+        """Blocks until the user has spoken. Returns audio, or None if nothing was captured."""
+        raise NotImplementedError
+
+    def partial(self, text):
+        """Reports what has been understood so far while the user is still speaking."""
+        if self.on_partial:
+            self.on_partial(text)
+
+
+class SpeechToText(Stage):
+    def transcribe(self, audio):
+        """Returns the transcript, or None if the audio could not be understood."""
+        raise NotImplementedError
+
+
+class LanguageModel(Stage):
+    def fast_path(self, text):
+        """Optional local answer (an object with `response` and `audio_path`), or None."""
+        return None
+
+    def stream(self, text):
+        """Yields the reply as text chunks."""
+        raise NotImplementedError
+
+
+class TextToSpeech(Stage):
+    def synthesize(self, text):
+        """Returns a Clip for one sentence of speech."""
+        raise NotImplementedError
+
+
+class AudioSink(Stage):
+    # PlaybackGate to notify around each clip, set by the engine
+    gate = None
+
+    def play(self, clip):
+        """Plays a clip, blocking until it has been handed to the speaker."""
+        raise NotImplementedError
+
+    def wait(self):
+        """Blocks until all output has finished, before the mic listens again."""
+
+
+class RobotEffects:
+    """Screen/LED/motor hooks. The defaults do nothing, for deployments without a robot."""
+
+    def listening(self):
+        pass
+
+    def processing(self):
+        pass
+
+    def heard(self, text):
+        pass
+
+    def not_understood(self):
+        pass
+
+    def speaking(self, text):
+        pass
+
+    def express(self, clip):
+        """Called as `clip` starts playing, if the tagger found expressions in it."""
+        pass
+
+    def finished(self, response_text):
+        pass
+
+
+class Turn:
+    """One listen/think/speak exchange and its stage timings (seconds since turn start)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.user_text = None
+        self.response_text = ""
+        self.sentences = []
+        self.from_fast_path = False
+        self.chunks = 0
+        self.timings = {}
+
+    def mark(self, event):
+        """Records the first time `event` happens in this turn."""
+        self.timings.setdefault(event, time.perf_counter() - self.started)
+
+    def time_to_first_audio(self):
+        """Seconds from final transcript to the first clip reaching the sink."""
+        if "first_audio" not in self.timings or "transcribed" not in self.timings:
+            return None
+        return self.timings["first_audio"] - self.timings["transcribed"]
+
+
+class ConversationEngine:
+    def __init__(self, source, stt, llm, tts, sink, effects=None, split_sentences=True,
+                 queue_size=4, speaker="Asterix", error_delay=0, accountant=None, gate=None, tagger=None):
+        self.source = source
+        self.stt = stt
+        self.llm = llm
+        self.tts = tts
+        self.sink = sink
+        self.effects = effects or RobotEffects()
+        # Sentence-by-sentence TTS; when False the whole reply becomes one clip
+        self.split_sentences = split_sentences
+        self.queue_size = queue_size
+        self.speaker = speaker
+        self.error_delay = error_delay
+        # expressions.ExpressionTagger: tags each sentence for the robot's face and head
+        self.tagger = tagger
+        # Callables run with each completed Turn (metrics, logging, recording)
+        self.observers = []
+        self.last_turn = None
+
+        # Keeps the mic closed while our own voice is playing
+        self.gate = gate
+        if gate:
+            source.gate = sink.gate = gate
+
+        self.accountant = accountant
+        if accountant:
+            for stage in (source, stt, llm, tts, sink):
+                stage.accountant = accountant
+            self.observers.append(accountant.observe)
+
+    def hear(self, turn):
+        """Listens and transcribes. Returns True when there is something to answer."""
+        if self.gate:
+            self.gate.wait_clear()
+            turn.mark("mic_open")
+        self.effects.listening()
+        audio = self.source.listen()
+        turn.mark("listened")
+        if audio is None:
+            return False
+
+        self.effects.processing()
+        turn.user_text = self.stt.transcribe(audio)
+        turn.mark("transcribed")
+        if not turn.user_text:
+            print("Could not understand audio.")
+            self.effects.not_understood()
+            self._finish(turn)
+            return False
+
+        print(f"You said: {turn.user_text}")
+        self.effects.heard(turn.user_text)
+        return True
+
+    async def respond(self, turn):
+        """Streams the reply for a heard turn through LLM, TTS and the sink."""
+        sentences = asyncio.Queue(self.queue_size)
+        clips = asyncio.Queue(self.queue_size)
+        await asyncio.gather(
+            self._think(turn, sentences, clips),
+            self._synthesize(turn, sentences, clips),
+            self._play(turn, clips),
+        )
+        if self.gate:
+            # The gate may let the mic open before the last clip has ended
+            await asyncio.to_thread(self.gate.wait_clear)
+        else:
+            await asyncio.to_thread(self.sink.wait)
+        self.effects.finished(turn.response_text)
+        return self._finish(turn)
+
+    async def run_turn(self):
+        """Runs one exchange entirely on the event loop (e.g. many sessions at once).
+
+        Returns the Turn, or None if nothing was captured.
+        """
+        turn = Turn()
+        if await asyncio.to_thread(self.hear, turn):
+            return await self.respond(turn)
+        return turn if "transcribed" in turn.timings else None
+
+    def _finish(self, turn):
+        turn.mark("done")
+        self.last_turn = turn
+        for observer in self.observers:
+            try:
+                observer(turn)
+            except Exception as e:
+                print(f"Turn observer failed: {e}")
+        return turn
+
+    async def _think(self, turn, sentences, clips):
+        """LLM stage: streams the reply and queues clean sentences for TTS."""
+        try:
+            hit = await asyncio.to_thread(self.llm.fast_path, turn.user_text)
+            if hit:
+                turn.from_fast_path = True
+                turn.mark("first_chunk")
+                turn.response_text = hit.response
+                if hit.audio_path:
+                    # Pre-synthesized answer: skip TTS entirely
+                    print(f"{self.speaker} (FAQ): {hit.response}")
+                    turn.sentences.append(clean_text_for_speech(hit.response))
+                    turn.mark("first_clip")
+                    await clips.put(Clip(hit.audio_path, turn.sentences[-1], temporary=False,
+                                         expressions=self._tag(hit.response)))
+                    return
+                chunks = iter([hit.response])
+            else:
+                print(f"{self.speaker} is thinking...")
+                chunks = self.llm.stream(turn.user_text)
+
+            loop = asyncio.get_running_loop()
+            await asyncio.to_thread(self._pump, turn, chunks, sentences, loop)
+        finally:
+            await sentences.put(_DONE)
+
+    def _pump(self, turn, chunks, sentences, loop):
+        """Runs in a worker thread; blocks on the bounded queue when TTS falls behind."""
+        tagged = []   # expressions of the last queued sentence
+        carried = []  # from a leading action-only "sentence", for the next one
+
+        def emit(sentence):
+            expressions = self._tag(sentence)  # with its *actions* still in
+            spoken = clean_text_for_speech(sentence)
+            if not spoken:
+                # "We won! *laughs*": the action ends the sentence before it (which is
+                # normally still being synthesized, so its clip picks this up)
+                for expression in expressions:
+                    expression.at = 1.0 if tagged else 0.0
+                (tagged[-1] if tagged else carried).extend(expressions)
+                return
+            print(f"{self.speaker} (speaking): {spoken}")
+            turn.sentences.append(spoken)
+            expressions[:0], carried[:] = carried, []
+            tagged.append(expressions)
+            asyncio.run_coroutine_threadsafe(sentences.put((spoken, expressions)), loop).result()
+
+        splitter = SentenceSplitter()
+        for chunk in chunks:
+            turn.mark("first_chunk")
+            turn.chunks += 1
+            turn.response_text += chunk
+            if self.split_sentences:
+                for sentence in splitter.feed(chunk):
+                    emit(sentence)
+
+        if self.split_sentences:
+            for sentence in splitter.flush():
+                emit(sentence)
+        else:
+            emit(turn.response_text)
+
+    def _tag(self, text):
+        return self.tagger.tag(text) if self.tagger else []
+
+    async def _synthesize(self, turn, sentences, clips):
+        """TTS stage: turns queued sentences into clips, in order."""
+        try:
+            while True:
+                item = await sentences.get()
+                if item is _DONE:
+                    break
+                sentence, expressions = item
+                try:
+                    clip = await asyncio.to_thread(self.tts.synthesize, sentence)
+                except Exception as e:
+                    print(f"Error generating audio: {e}")
+                    continue
+                clip.expressions = expressions
+                turn.mark("first_clip")
+                await clips.put(clip)
+        finally:
+            await clips.put(_DONE)
+
+    async def _play(self, turn, clips):
+        """Output stage: plays clips back to back and drives the robot effects."""
+        while True:
+            clip = await clips.get()
+            if clip is _DONE:
+                break
+            turn.mark("first_audio")
+            self.effects.speaking(clip.text)
+            if clip.expressions:
+                self.effects.express(clip)
+            try:
+                await asyncio.to_thread(self.sink.play, clip)
+            except Exception as e:
+                print(f"Error playing audio: {e}")
+
+    def run(self, max_turns=None):
+        """Runs turns until `max_turns` is reached or a stage ends the conversation.
+
+        Listening happens on the calling thread so Ctrl+C interrupts it directly;
+        each reply is streamed on its own event loop.
+        """
+        turns = 0
+        while max_turns is None or turns < max_turns:
+            try:
+                turn = Turn()
+                if self.hear(turn):
+                    asyncio.run(self.respond(turn))
+                if "transcribed" in turn.timings:
+                    turns += 1
+            except EndOfConversation as e:
+                if str(e):
+                    print(e)
+                break
+            except KeyboardInterrupt:
+                print("\nGoodbye!")
+                break
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                time.sleep(self.error_delay)
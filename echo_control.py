@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+
+# numpy is imported inside the functions that need it, so deployments that only
+# use the gate (e.g. local mode with the system player) don't load it.
+
+# edge-tts returns 24 kHz / 48 kbit/s mono MP3 (constant bitrate)
+EDGE_TTS_BITRATE = 48000
+
+
+def mp3_duration(path, bitrate=EDGE_TTS_BITRATE):
+    """Playback length of a constant-bitrate MP3, from its size."""
+    return os.path.getsize(path) * 8 / bitrate
+
+
+def pcm16_to_float(data):
+    """int16 PCM bytes (or array) -> float32 in [-1, 1)."""
+    import numpy as np
+
+    samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray)) else data
+    return samples.astype(np.float32) / 32768.0
+
+
+def float_to_pcm16(samples):
+    import numpy as np
+
+    return (np.clip(samples, -1.0, 32767 / 32768) * 32768.0).astype(np.int16).tobytes()
+
+
+class PlaybackGate:
+    """Tells the microphone when our own voice is playing.
+
+    Sinks call `playback_started()` / `playback_finished()` around each clip;
+    the mic waits on `wait_clear()` before listening. Without an echo
+    reference the mic reopens `tail` seconds after playback really ends
+    (room reverb). When sinks provide the reference signal and an
+    EchoSuppressor is used, the mic may reopen `overlap` seconds *before*
+    the end, and the tail is removed by the suppressor instead.
+    """
+
+    def __init__(self, tail=0.15, overlap=0.0, keep_seconds=30.0, clock=time.monotonic):
+        self.tail = tail
+        self.overlap = overlap
+        self.keep_seconds = keep_seconds
+        self.clock = clock
+        self.playing = False
+        self.expected_end = None
+        self.finished_at = None
+        self.has_reference = False
+        # (start time, mono float32 samples, sample rate) for recent clips
+        self.references = []
+        # Seconds between playback ending and the mic resuming (negative = overlap)
+        self.resume_latencies = []
+        self._measured = None
+        self._changed = threading.Condition()
+
+    def playback_started(self, reference=None, rate=None, duration=None):
+        now = self.clock()
+        with self._changed:
+            self.playing = True
+            self.has_reference = reference is not None
+            if reference is not None:
+                duration = duration or len(reference) / rate
+                self.references.append((now, reference, rate))
+                self.references = [r for r in self.references if r[0] + len(r[1]) / r[2] > now - self.keep_seconds]
+            self.expected_end = now + duration if duration else None
+            self._changed.notify_all()
+
+    def playback_finished(self):
+        with self._changed:
+            self.playing = False
+            self.finished_at = self.clock()
+            self._changed.notify_all()
+
+    def _resume_at(self, now):
+        """When the mic may listen again, or None while that's still unknown."""
+        if self.playing:
+            if self.has_reference and self.overlap and self.expected_end is not None:
+                return self.expected_end - self.overlap
+            return None
+        if self.finished_at is None:
+            return now  # nothing played yet
+        return self.finished_at + (0.0 if self.has_reference and self.overlap else self.tail)
+
+    def is_clear(self):
+        """Non-blocking: may the mic listen right now?"""
+        with self._changed:
+            now = self.clock()
+            resume_at = self._resume_at(now)
+            return resume_at is not None and now >= resume_at
+
+    def wait_clear(self, timeout=None):
+        """Blocks until the mic may listen. Returns False on timeout."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._changed:
+            while True:
+                now = self.clock()
+                resume_at = self._resume_at(now)
+                if resume_at is not None and now >= resume_at:
+                    break
+                if deadline is not None and now >= deadline:
+                    return False
+                waits = [t - now for t in (resume_at, deadline) if t is not None]
+                self._changed.wait(min(waits) if waits else None)
+
+            end = self.finished_at if not self.playing else self.expected_end
+            if end is not None and end != self._measured:
+                self._measured = end  # once per playback, however many waiters
+                self.resume_latencies.append(self.clock() - end)
+            return True
+
+    def reference_between(self, start, end, rate):
+        """Our own output during [start, end) at `rate`, zeros where we were silent.
+
+        Only the overlapping part of each clip is interpolated, so this is
+        cheap enough to call for every captured chunk.
+        """
+        import numpy as np
+
+        n = int(round((end - start) * rate))
+        out = np.zeros(n, dtype=np.float32)
+        for ref_start, samples, ref_rate in self.references:
+            # Output indices covered by this clip
+            lo = max(int(np.ceil((ref_start - start) * rate)), 0)
+            hi = min(int(np.ceil((ref_start + len(samples) / ref_rate - start) * rate)), n)
+            if lo >= hi or len(samples) < 2:
+                continue
+            positions = np.minimum((start - ref_start + np.arange(lo, hi) / rate) * ref_rate, len(samples) - 1)
+            index = np.minimum(positions.astype(np.int64), len(samples) - 2)
+            frac = positions - index
+            out[lo:hi] += samples[index] * (1 - frac) + samples[index + 1] * frac
+        return out
+
+
+class EchoSuppressor:
+    """Removes our own voice from the mic signal using the known output as reference.
+
+    Frequency-domain block NLMS (overlap-save, constrained gradient) with a
+    Geigel double-talk detector that freezes adaptation while the visitor
+    speaks, so their voice isn't learned as echo. The filter covers echo
+    delays up to `block_size` samples.
+    """
+
+    def __init__(self, block_size=512, step=0.3, smoothing=0.9, double_talk_threshold=0.5):
+        self.n = block_size
+        self.step = step
+        self.smoothing = smoothing
+        self.double_talk_threshold = double_talk_threshold
+        self.reset()
+
+    def reset(self):
+        import numpy as np
+
+        n = self.n
+        self.weights = np.zeros(n + 1, dtype=np.complex128)  # rfft of a 2n-tap window
+        self.power = None
+        self.previous = np.zeros(n)
+
+    def process(self, mic, reference):
+        """Returns `mic` with the echo of `reference` removed (same length, float)."""
+        import numpy as np
+
+        mic = np.asarray(mic, dtype=np.float64)
+        reference = np.asarray(reference, dtype=np.float64)
+        n = self.n
+        length = len(mic)
+        pad = (-length) % n
+        mic = np.concatenate([mic, np.zeros(pad)])
+        reference = np.concatenate([reference[:length], np.zeros(len(mic) - min(len(reference), length))])
+
+        out = np.empty_like(mic)
+        zeros = np.zeros(n)
+        for i in range(0, len(mic), n):
+            x = reference[i:i + n]
+            d = mic[i:i + n]
+            window = np.concatenate([self.previous, x])
+            self.previous = x
+
+            X = np.fft.rfft(window)
+            echo = np.fft.irfft(X * self.weights, 2 * n)[n:]
+            e = d - echo
+            out[i:i + n] = e
+
+            # Geigel: a mic peak well above the recent far-end peak means the visitor is talking
+            far_peak = np.max(np.abs(window))
+            if far_peak < 1e-4 or np.max(np.abs(d)) > far_peak / self.double_talk_threshold:
+                continue
+
+            power = np.abs(X) ** 2
+            if self.power is None:
+                self.power = power
+            else:
+                self.power = self.smoothing * self.power + (1 - self.smoothing) * power
+            E = np.fft.rfft(np.concatenate([zeros, e]))
+            gradient = np.fft.irfft(np.conj(X) * E / (self.power + 1e-6), 2 * n)[:n]
+            self.weights += self.step * np.fft.rfft(np.concatenate([gradient, zeros]))
+
+        return out[:length]
+
+
+def echo_return_loss_enhancement(mic, processed):
+    """ERLE in dB: how much quieter the echo-only signal became."""
+    import numpy as np
+
+    return 10 * np.log10(np.mean(np.square(mic)) / max(np.mean(np.square(processed)), 1e-12))
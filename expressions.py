@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+
+# Facial expressions and gestures from the reply text, without asking the LLM.
+# Each sentence is tagged as the stream completes it: action spans
+# ("*taps helmet*"), emotion words and catchphrases map to an emotion (LED
+# icon + screen image) and/or a gesture (pan/tilt moves), placed at their
+# position in the sentence so they happen while that part is being spoken.
+
+# emotion -> (LED icon, screen image); names of assets on the robot
+EMOTIONS = {
+    "happy": ("happy", "happy.png"),
+    "proud": ("happy", "proud.png"),
+    "amused": ("happy", "laughing.png"),
+    "surprised": ("surprised", "surprised.png"),
+    "sad": ("sad", "sad.png"),
+    "angry": ("angry", "angry.png"),
+    "love": ("heart", "love.png"),
+    "thinking": ("thinking", "thinking.png"),
+    "wink": ("wink", "wink.png"),
+}
+
+# gesture -> [(seconds after it starts, "pan" | "tilt", angle)], ending in the rest pose
+GESTURES = {
+    "nod": [(0.0, "tilt", 10), (0.35, "tilt", -5), (0.7, "tilt", 0)],
+    "shake": [(0.0, "pan", -15), (0.3, "pan", 15), (0.6, "pan", -10), (0.9, "pan", 0)],
+    "look_around": [(0.0, "pan", 30), (0.8, "pan", -30), (1.6, "pan", 0)],
+    "look_up": [(0.0, "tilt", -10), (1.0, "tilt", 0)],
+    "bow": [(0.0, "tilt", 15), (0.8, "tilt", 0)],
+}
+
+# (pattern, emotion, gesture) matched inside *action* spans
+ACTION_RULES = [
+    (r"taps? (?:his |my )?helmet", "proud", "nod"),
+    (r"(?:smooth|twirl|strok)\w* (?:his |my )?(?:mustache|moustache|beard)", "thinking", "look_up"),
+    (r"laugh\w*|chuckl\w*|grin\w*|smil\w*", "happy", "nod"),
+    (r"shak\w* (?:his |my )?head", None, "shake"),
+    (r"nods?|nodding", None, "nod"),
+    (r"bows?|bowing", None, "bow"),
+    (r"looks? around|glanc\w*", None, "look_around"),
+    (r"winks?|winking", "wink", None),
+    (r"sigh\w*", "sad", None),
+    (r"gasp\w*|jumps?", "surprised", None),
+]
+
+# (pattern, emotion, gesture) matched in the spoken text; catchphrases first
+SPEECH_RULES = [
+    (r"these romans are crazy", "amused", "shake"),
+    (r"by toutatis", "surprised", "look_up"),
+    (r"by belenos", "surprised", "look_up"),
+    (r"magic potion", "proud", None),
+    (r"wonderful|delighted|glad|excellent|hooray|ha ?ha", "happy", None),
+    (r"amazing|incredible|astonishing|wow", "surprised", None),
+    (r"angry|furious|outrageous", "angry", None),
+    (r"sad|sorry|alas|unfortunately", "sad", None),
+    (r"love|friends?|friendship", "love", None),
+]
+
+ACTION_SPAN = re.compile(r"\*(.*?)\*")
+
+
+def compile_rules(rules):
+    """One alternation with a named group per rule, so a sentence is scanned once."""
+    pattern = "|".join(f"(?P<r{i}>\\b(?:{p})\\b)" for i, (p, _, _) in enumerate(rules))
+    table = {f"r{i}": (emotion, gesture) for i, (_, emotion, gesture) in enumerate(rules)}
+    return re.compile(pattern, re.IGNORECASE), table
+
+
+class Expression:
+    """An emotion and/or gesture at fraction `at` (0-1) of a sentence's speech."""
+
+    def __init__(self, at, emotion=None, gesture=None, trigger=""):
+        self.at = at
+        self.emotion = emotion
+        self.gesture = gesture
+        self.trigger = trigger
+
+    def __eq__(self, other):
+        return (isinstance(other, Expression)
+                and (self.at, self.emotion, self.gesture) == (other.at, other.emotion, other.gesture))
+
+    def __repr__(self):
+        return f"Expression({self.at:.2f}, {self.emotion!r}, {self.gesture!r}, {self.trigger!r})"
+
+
+class ExpressionTagger:
+    """Tags one sentence (with its *actions* still in) at a time; no LLM calls."""
+
+    def __init__(self, action_rules=ACTION_RULES, speech_rules=SPEECH_RULES):
+        self.actions, self.action_table = compile_rules(action_rules)
+        self.speech, self.speech_table = compile_rules(speech_rules)
+
+    def tag(self, sentence):
+        found = []  # (position in the spoken text, emotion, gesture, trigger)
+        spoken_length, last = 0, 0
+        for span in ACTION_SPAN.finditer(sentence):
+            spoken_length += self._scan_speech(sentence, last, span.start(), spoken_length, found)
+            for m in self.actions.finditer(span.group(1)):
+                found.append((spoken_length, *self.action_table[m.lastgroup], m.group()))
+            last = span.end()
+        spoken_length += self._scan_speech(sentence, last, len(sentence), spoken_length, found)
+
+        expressions = []
+        for position, emotion, gesture, trigger in found:
+            expression = Expression(min(position / spoken_length, 1.0) if spoken_length else 0.0,
+                                    emotion, gesture, trigger)
+            if not expressions or (expressions[-1].emotion, expressions[-1].gesture) != (emotion, gesture):
+                expressions.append(expression)
+        return expressions
+
+    def _scan_speech(self, sentence, start, end, offset, found):
+        """Scans sentence[start:end] (spoken text); returns its length."""
+        for m in self.speech.finditer(sentence, start, end):
+            found.append((offset + m.start() - start, *self.speech_table[m.lastgroup], m.group()))
+        return end - start
+
+
+def speech_seconds(clip, chars_per_second=15.0):
+    """How long a clip takes to say: from the mp3 when there is one, else from its text."""
+    if os.path.exists(clip.path):
+        from echo_control import mp3_duration
+
+        return mp3_duration(clip.path)
+    return len(clip.text) / chars_per_second
+
+
+class ExpressionScheduler:
+    """Runs timed robot actions on one background thread.
+
+    `schedule(delay, action)` queues a callable; `clear()` drops everything
+    still pending (e.g. when the next turn starts listening).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._pending = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="expressions", daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay, action):
+        with self._condition:
+            heapq.heappush(self._pending, (self.clock() + delay, next(self._order), action))
+            self._condition.notify()
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+
+    def idle(self):
+        with self._condition:
+            return not self._pending
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending or self._pending[0][0] > self.clock():
+                    timeout = self._pending[0][0] - self.clock() if self._pending else None
+                    self._condition.wait(timeout)
+                _, _, action = heapq.heappop(self._pending)
+            try:
+                action()
+            except Exception as e:
+                print(f"Expression failed: {e}")
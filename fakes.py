@@ -0,0 +1,204 @@
+import os
+import re
+import shutil
+import time
+import types
+
+from conversation_engine import (AudioSink, AudioSource, Clip, EndOfConversation, LanguageModel, RobotEffects,
+                                 SpeechToText, TextToSpeech)
+
+# Stand-ins shared by the tests: scripted engine stages, a settable clock, and
+# a local SFTP server for the robot link.
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSource(AudioSource):
+    """Replays a list of utterances, then ends the conversation."""
+
+    def __init__(self, utterances):
+        self.utterances = list(utterances)
+
+    def listen(self):
+        if not self.utterances:
+            raise EndOfConversation()
+        return self.utterances.pop(0)
+
+
+class FakeSTT(SpeechToText):
+    def transcribe(self, audio):
+        return audio or None  # the "audio" is already the transcript
+
+
+class FakeLLM(LanguageModel):
+    def __init__(self, replies, chunk_delay=0.0, chunk_size=12, faq=None):
+        self.replies = replies
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.faq = faq or {}
+        self.prompts = []
+
+    def fast_path(self, text):
+        return self.faq.get(text)
+
+    def stream(self, text):
+        self.prompts.append(text)
+        reply = self.replies[text]
+        for i in range(0, len(reply), self.chunk_size):
+            time.sleep(self.chunk_delay)
+            yield reply[i:i + self.chunk_size]
+
+
+class FakeTTS(TextToSpeech):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.texts = []
+
+    def synthesize(self, text):
+        time.sleep(self.delay)
+        self.texts.append(text)
+        return Clip(f"clip_{len(self.texts)}.mp3", text)
+
+
+class FakeSink(AudioSink):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.played = []
+        self.waits = 0
+
+    def play(self, clip):
+        time.sleep(self.delay)
+        self.played.append(clip)
+
+    def wait(self):
+        self.waits += 1
+
+
+class RecordingEffects(RobotEffects):
+    def __init__(self):
+        self.events = []
+
+    def listening(self):
+        self.events.append("listening")
+
+    def heard(self, text):
+        self.events.append(f"heard:{text}")
+
+    def not_understood(self):
+        self.events.append("not_understood")
+
+    def speaking(self, text):
+        self.events.append(f"speaking:{text}")
+
+
+REPLIES = {
+    "hello": "By Toutatis, a visitor! *taps helmet* Welcome to the village. Have you met Obelix?",
+    "tell me a story": "Once upon a time there were twelve tasks. Caesar set them. We won!",
+}
+
+
+class FakeSpeakingSource(AudioSource):
+    """Each utterance is (partials, final): partials `gap` seconds apart, as an incremental STT reports them."""
+
+    def __init__(self, utterances, gap=0.15):
+        self.utterances = list(utterances)
+        self.gap = gap
+
+    def listen(self):
+        if not self.utterances:
+            raise EndOfConversation()
+        partials, final = self.utterances.pop(0)
+        for text in partials:
+            self.partial(text)
+            time.sleep(self.gap)
+        return final
+
+
+class EchoLLM(LanguageModel):
+    """Streams a reply to whatever it is asked, a word at a time after `first_token` seconds."""
+
+    def __init__(self, first_token=0.3, interval=0.01, faq=None):
+        self.first_token = first_token
+        self.interval = interval
+        self.faq = faq or {}
+        self.prompts = []
+        self.history = []
+        self.discarded = 0
+
+    def fast_path(self, text):
+        return self.faq.get(text)
+
+    def stream(self, text):
+        self.prompts.append(text)
+        self.history.append(text)
+        time.sleep(self.first_token)
+        for chunk in re.findall(r"\S+\s*", f"You asked: {text}. By Toutatis, what a question! Ask me another."):
+            yield chunk
+            time.sleep(self.interval)
+
+    def discard(self):
+        self.discarded += 1
+        self.history.pop()
+
+
+class FakeSFTP:
+    """Local stand-in for the robot's SFTP server: copies files between two directories."""
+
+    def __init__(self, remote_root):
+        self.remote_root = remote_root
+        self.timeout = None
+        self.closed = False
+
+    def get_channel(self):
+        return self
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def _remote(self, path):
+        return os.path.join(self.remote_root, os.path.basename(path))
+
+    def stat(self, path):
+        return os.stat(self._remote(path))
+
+    def get(self, remote, local):
+        shutil.copy(self._remote(remote), local)
+
+    def put(self, local, remote):
+        shutil.copy(local, self._remote(remote))
+
+    def listdir_attr(self, path):
+        attrs = []
+        for name in sorted(os.listdir(self.remote_root)):
+            st = os.stat(os.path.join(self.remote_root, name))
+            attrs.append(types.SimpleNamespace(filename=name, st_size=st.st_size, st_mtime=st.st_mtime))
+        return attrs
+
+    def posix_rename(self, old, new):
+        os.replace(self._remote(old), self._remote(new))
+
+    def remove(self, path):
+        os.remove(self._remote(path))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSSH:
+    def __init__(self, sftp):
+        self.sftp = sftp
+
+    def connect(self, host, **kwargs):
+        pass
+
+    def open_sftp(self):
+        return self.sftp
+
+    def close(self):
+        pass
@@ -0,0 +1,240 @@
+import glob
+import hashlib
+import math
+import os
+import re
+import time
+from collections import Counter
+
+# Curated answers for the questions visitors ask all day. Each entry has a few
+# paraphrases; the matcher indexes all of them so a hit on any one counts.
+ASTERIX_FAQ = [
+    {
+        "id": "name",
+        "questions": [
+            "What is your name?",
+            "Who are you?",
+            "What are you called?",
+            "Tell me your name",
+            "Are you Asterix?",
+        ],
+        "response": "*taps helmet* I am Asterix, warrior of the Village of Indomitable Gauls! By Toutatis, who else would I be?",
+    },
+    {
+        "id": "origin",
+        "questions": [
+            "Where are you from?",
+            "Where do you live?",
+            "Where is your village?",
+            "What is your home town?",
+            "Where do you come from?",
+        ],
+        "response": "I come from the Village of Indomitable Gauls, in Armorica. The only village still holding out against the Romans!",
+    },
+    {
+        "id": "age",
+        "questions": [
+            "How old are you?",
+            "What is your age?",
+            "When were you born?",
+        ],
+        "response": "My age? Let's just say I am a seasoned warrior. I have seen plenty of Roman camps in my time!",
+    },
+    {
+        "id": "profession",
+        "questions": [
+            "What do you do?",
+            "What is your job?",
+            "What is your profession?",
+            "What do you do for a living?",
+        ],
+        "response": "I am a warrior, and sometimes a hero! Mostly I hunt wild boar and teach the Romans a lesson.",
+    },
+    {
+        "id": "obelix",
+        "questions": [
+            "Who is Obelix?",
+            "Who is your best friend?",
+            "Tell me about Obelix",
+            "Who is your friend?",
+        ],
+        "response": "Obelix is my best friend! He delivers menhirs and fell into the magic potion when he was little. Don't call him fat!",
+    },
+    {
+        "id": "dogmatix",
+        "questions": [
+            "Do you have a dog?",
+            "Who is Dogmatix?",
+            "What is your dog's name?",
+            "Tell me about Dogmatix",
+        ],
+        "response": "Dogmatix is Obelix's little white dog. He is very brave, and he cannot stand to see a tree cut down!",
+    },
+    {
+        "id": "potion",
+        "questions": [
+            "What is the magic potion?",
+            "Where do you get your strength?",
+            "Why are you so strong?",
+            "Who makes the magic potion?",
+            "Tell me about the magic potion",
+        ],
+        "response": "The magic potion gives me super strength! It is brewed by our druid Panoramix, and the recipe is a secret.",
+    },
+    {
+        "id": "catchphrase",
+        "questions": [
+            "What is your catchphrase?",
+            "What do you always say?",
+            "What do you think of the Romans?",
+            "What is your favourite saying?",
+        ],
+        "response": "These Romans are crazy! Ils sont fous ces Romains!",
+    },
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+CONTRACTIONS = {"what's": "what is", "who's": "who is", "where's": "where is", "you're": "you are"}
+
+def _terms(text):
+    """Lowercased word unigrams and bigrams of a question."""
+    words = []
+    for word in TOKEN_PATTERN.findall(text.lower().replace("’", "'")):
+        words.extend(CONTRACTIONS.get(word, word).split())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class FAQHit:
+    def __init__(self, entry_id, question, response, score, audio_path=None):
+        self.entry_id = entry_id
+        self.question = question
+        self.response = response
+        self.score = score
+        self.audio_path = audio_path
+
+    def __repr__(self):
+        return f"FAQHit({self.entry_id!r}, score={self.score:.2f})"
+
+
+class FAQMatcher:
+    """TF-IDF similarity index over paraphrased persona questions.
+
+    A match is only reported when the best entry clears `threshold` and beats
+    the best different entry by `margin`, so ambiguous questions still go to
+    the LLM.
+    """
+
+    def __init__(self, entries=None, threshold=0.6, margin=0.1):
+        self.entries = {e["id"]: e for e in (entries or ASTERIX_FAQ)}
+        self.threshold = threshold
+        self.margin = margin
+        self.audio_paths = {}
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.latency_saved = 0.0
+        self.llm_latency_total = 0.0
+        self.llm_calls = 0
+
+        self._build_index()
+
+    def _build_index(self):
+        docs = []
+        for entry in self.entries.values():
+            for question in entry["questions"]:
+                docs.append((entry["id"], Counter(_terms(question))))
+
+        doc_freq = Counter()
+        for _, terms in docs:
+            doc_freq.update(terms.keys())
+        n_docs = len(docs)
+        self.idf = {t: math.log((1 + n_docs) / (1 + df)) + 1.0 for t, df in doc_freq.items()}
+        # Words never seen in the index weigh as much as the rarest known term,
+        # so off-topic questions lose similarity instead of being ignored.
+        self.unknown_idf = math.log(1 + n_docs) + 1.0
+
+        self.index = [(entry_id, self._vectorize(terms)) for entry_id, terms in docs]
+
+    def _vectorize(self, terms):
+        vec = {t: count * self.idf.get(t, self.unknown_idf) for t, count in terms.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        if not norm:
+            return {}
+        return {t: w / norm for t, w in vec.items()}
+
+    def scores(self, text):
+        """Returns the best cosine similarity per entry id."""
+        query = self._vectorize(Counter(_terms(text)))
+        best = {}
+        for entry_id, vec in self.index:
+            score = sum(w * vec.get(t, 0.0) for t, w in query.items())
+            if score > best.get(entry_id, 0.0):
+                best[entry_id] = score
+        return best
+
+    def match(self, text):
+        """Returns a FAQHit for high-confidence matches, otherwise None."""
+        start = time.perf_counter()
+        self.lookups += 1
+        ranked = sorted(self.scores(text).items(), key=lambda kv: kv[1], reverse=True)
+        if not ranked:
+            return None
+
+        entry_id, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score < self.threshold or score - runner_up < self.margin:
+            return None
+
+        self.hits += 1
+        elapsed = time.perf_counter() - start
+        self.latency_saved += max(self.average_llm_latency() - elapsed, 0.0)
+        entry = self.entries[entry_id]
+        return FAQHit(entry_id, text, entry["response"], score, self.audio_paths.get(entry_id))
+
+    def record_llm_latency(self, seconds):
+        """Feeds observed LLM round trips so savings are estimated from real data."""
+        self.llm_latency_total += seconds
+        self.llm_calls += 1
+
+    def average_llm_latency(self):
+        if not self.llm_calls:
+            return 0.0
+        return self.llm_latency_total / self.llm_calls
+
+    def hit_rate(self):
+        if not self.lookups:
+            return 0.0
+        return self.hits / self.lookups
+
+    def metrics(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "latency_saved": self.latency_saved,
+            "avg_llm_latency": self.average_llm_latency(),
+        }
+
+    def presynthesize(self, synthesize, cache_dir="faq_audio", clean=None):
+        """Pre-renders every curated response to audio.
+
+        `synthesize(text, path)` writes one clip; clips already on disk are
+        reused so only the first run pays for TTS. File names carry a hash of
+        the spoken text, so editing a response renders it again.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        for entry_id, entry in self.entries.items():
+            text = clean(entry["response"]) if clean else entry["response"]
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+            path = os.path.join(cache_dir, f"faq_{entry_id}_{digest}.mp3")
+            if not os.path.exists(path):
+                for stale in glob.glob(os.path.join(cache_dir, f"faq_{entry_id}_*.mp3")):
+                    os.remove(stale)
+                try:
+                    synthesize(text, path)
+                except Exception as e:
+                    print(f"Error pre-synthesizing FAQ '{entry_id}': {e}")
+                    continue
+            self.audio_paths[entry_id] = path
+        return self.audio_paths
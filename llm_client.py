@@ -1,75 +1,73 @@
 import os
 import google.generativeai as genai
 import time
+from google.api_core import exceptions as api_errors
 from dotenv import load_dotenv
+from persona import PERSONAS
+from resilience import CircuitBreaker, CircuitOpenError, Policy, iterate_with_deadline
 
 # Load environment variables
 load_dotenv()
 
+# Errors worth one more try (ChatSession only adds a turn to history once it
+# succeeds, so a resend doesn't duplicate it). Auth errors and bad requests
+# would fail the same way again, so they are not retried.
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, api_errors.ServiceUnavailable,
+                    api_errors.DeadlineExceeded, api_errors.InternalServerError,
+                    api_errors.ResourceExhausted)
+
+def upload_context():
+    """Uploads the Twelve Tasks transcript once; every persona's chat can share it.
+
+    Returns (file, size in bytes), or (None, 0) if the upload failed.
+    """
+    # Use relative path based on the script's location
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    transcript_path = os.path.join(current_dir, "The Twelve Tasks of Asterix - Transcipt.txt")
+    print(f"Uploading context: {transcript_path}...")
+    try:
+        book_file = genai.upload_file(transcript_path, mime_type="text/plain")
+        print(f"Uploaded file '{book_file.display_name}' as: {book_file.uri}")
+
+        # Wait for processing
+        while book_file.state.name == "PROCESSING":
+            print("Processing file...")
+            time.sleep(2)
+            book_file = genai.get_file(book_file.name)
+
+        if book_file.state.name == "FAILED":
+            raise ValueError(f"File processing failed: {book_file.state.name}")
+
+        print("File processed successfully.")
+        return book_file, os.path.getsize(transcript_path)
+    except Exception as e:
+        print(f"Error uploading file: {e}")
+        return None, 0
+
+def configure():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables.")
+    genai.configure(api_key=api_key)
+    return api_key
+
 class AsterixLLM:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables.")
-        
-        genai.configure(api_key=self.api_key)
-        
-        # System prompt for Asterix persona
-        self.system_prompt = """
-        You are Asterix, the brave and cunning warrior from the Village of Indomitable Gauls.
-
-        Persona:
-        - You are brave, clever, and loyal.
-        - You are small in stature but have a big spirit (and the magic potion!).
-        - You are the best friend of Obelix.
-        - You often tap your helmet or smooth your mustache.
-        - You find the Romans amusingly foolish ("These Romans are crazy!").
-        
-        Key Information to Reveal (Truthfully):
-        - Name: Asterix.
-        - Age: Indeterminate, but a seasoned warrior.
-        - Place of Origin: The Village of Indomitable Gauls (in Armorica).
-        - Profession: Warrior / Hero.
-        - Passion: Hunting wild boars and fighting Romans.
-        - Magic Potion: You drink it to get super strength. It is brewed by the druid Panoramix (Getafix).
-        - Best Friend: Obelix (who fell into the potion when he was little).
-        - Dog: Dogmatix (Idéfix), a small white dog who loves trees.
-        - Catchphrase: "These Romans are crazy!" (Ils sont fous ces Romains!).
-
-        Context & Error Handling:
-        - You are receiving input from a speech-to-text system. It may contain errors.
-        - Ignore minor typos.
-        - If input is unclear, ask for clarification like a warrior ("By Toutatis! Speak up!").
-
-        Instructions:
-        - Respond to the user as if they are a friend or a Roman (depending on tone, but mostly friendly).
-        - Keep responses concise.
-        - Use your catchphrase if appropriate.
-        - Mention Obelix or the village if relevant.
-        """
-        
-        # Upload the Transcript
-        # Use relative path based on the script's location
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        transcript_path = os.path.join(current_dir, "The Twelve Tasks of Asterix - Transcipt.txt")
-        print(f"Uploading context: {transcript_path}...")
-        try:
-            self.book_file = genai.upload_file(transcript_path, mime_type="text/plain")
-            print(f"Uploaded file '{self.book_file.display_name}' as: {self.book_file.uri}")
-            
-            # Wait for processing
-            while self.book_file.state.name == "PROCESSING":
-                print("Processing file...")
-                time.sleep(2)
-                self.book_file = genai.get_file(self.book_file.name)
-                
-            if self.book_file.state.name == "FAILED":
-                raise ValueError(f"File processing failed: {self.book_file.state.name}")
-                
-            print("File processed successfully.")
-        except Exception as e:
-            print(f"Error uploading file: {e}")
-            self.book_file = None
+    """A Gemini chat speaking as `persona` (persona.PERSONAS; Asterix by default).
+
+    `context` is a (file, size) pair from `upload_context()` to share one
+    upload between several chats; without it the transcript is uploaded here.
+    """
+
+    def __init__(self, faq=None, timeout=15.0, stream_idle_timeout=10.0, persona=None, context=None):
+        self.api_key = configure()
+        self.persona = persona or PERSONAS["asterix"]
+
+        # System prompt for the persona (shared with the other deployments)
+        self.system_prompt = self.persona.prompt
+        self.fallback_reply = self.persona.fallback
+
+        # Upload the Transcript (unless a shared upload was passed in)
+        self.book_file, self.context_bytes = context or upload_context()
 
         self.model = genai.GenerativeModel(
             model_name="gemini-2.0-flash",
@@ -85,28 +83,146 @@ class AsterixLLM:
             })
             history.append({
                 "role": "model",
-                "parts": ["By Toutatis! I remember these tasks well!"]
+                "parts": [self.persona.context_reply]
             })
             
         self.chat = self.model.start_chat(history=history)
+        # Whether the last Gemini exchange is in the chat and may be discarded
+        self.exchange_open = False
+
+        # Optional local FAQ fast path (see faq.py)
+        self.faq = faq
+
+        # Deadlines (seconds) for a whole reply / the first streamed chunk, and
+        # for gaps between streamed chunks. While Gemini keeps failing the
+        # breaker stays open and we answer with the fallback reply straight away.
+        self.timeout = timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.breaker = CircuitBreaker("gemini", failure_threshold=2)
+        self.policy = Policy("gemini", attempts=2, breaker=self.breaker, retry_on=TRANSIENT_ERRORS)
+
+    def add_to_history(self, user_input, response_text):
+        """Appends an exchange answered outside Gemini so the chat stays coherent."""
+        self.exchange_open = False
+        self.chat.history = list(self.chat.history) + [
+            {"role": "user", "parts": [user_input]},
+            {"role": "model", "parts": [response_text]},
+        ]
+
+    def discard(self):
+        """Drops the last Gemini exchange from the chat, e.g. a speculative reply that
+        was cancelled. Does nothing if it never got there (a fallback reply)."""
+        if not self.exchange_open:
+            return
+        self.exchange_open = False
+        try:
+            self.chat.rewind()
+        except Exception as e:
+            print(f"Could not drop the cancelled exchange: {e}")
+
+    def prompt_footprint(self, user_input):
+        """Approximate size of the next request: Gemini resends the whole chat every turn."""
+        history_chars = 0
+        for content in self.chat.history:
+            parts = content["parts"] if isinstance(content, dict) else content.parts
+            for part in parts:
+                # The uploaded transcript is a file part, counted in context_bytes
+                history_chars += len(part) if isinstance(part, str) else len(getattr(part, "text", "") or "")
+        return {
+            "system_chars": len(self.system_prompt),
+            "context_bytes": self.context_bytes,
+            "history_messages": len(self.chat.history),
+            "history_chars": history_chars,
+            "input_chars": len(user_input),
+        }
+
+    def answer_from_faq(self, user_input):
+        """Returns a FAQHit for high-confidence persona questions, otherwise None."""
+        if not self.faq:
+            return None
+        hit = self.faq.match(user_input)
+        if hit:
+            self.add_to_history(user_input, hit.response)
+        return hit
 
     def get_response(self, user_input):
+        self.exchange_open = False
         try:
-            response = self.chat.send_message(user_input)
+            start = time.perf_counter()
+            response = self.policy.call(self.chat.send_message, user_input,
+                                        request_options={"timeout": self.timeout})
+            self.exchange_open = True
+            if self.faq:
+                self.faq.record_llm_latency(time.perf_counter() - start)
             return response.text
         except Exception as e:
             print(f"Error getting response from Gemini: {e}")
-            return "By Toutatis! The sky is falling! I cannot answer."
+            return self.fallback_reply
 
     def get_streaming_response(self, user_input):
+        response = None
+        self.exchange_open = False
         try:
-            response = self.chat.send_message(user_input, stream=True)
-            for chunk in response:
+            if not self.breaker.allow():
+                raise CircuitOpenError("circuit 'gemini' is open")
+            start = time.perf_counter()
+            response = self.chat.send_message(user_input, stream=True,
+                                              request_options={"timeout": self.timeout})
+            self.exchange_open = True
+            first = True
+            for chunk in iterate_with_deadline(response, self.timeout, self.stream_idle_timeout):
+                if first and self.faq:
+                    self.faq.record_llm_latency(time.perf_counter() - start)
+                first = False
                 if chunk.text:
                     yield chunk.text
+            self.breaker.record_success()
         except Exception as e:
             print(f"Error getting streaming response from Gemini: {e}")
-            yield "By Toutatis! The sky is falling!"
+            if not isinstance(e, CircuitOpenError):
+                self.breaker.record_failure()
+            if response is not None:
+                # Drop the broken exchange so the chat history stays usable
+                self.exchange_open = False
+                try:
+                    self.chat.rewind()
+                except Exception:
+                    pass
+            yield self.fallback_reply
+
+class PanoramixLLM(AsterixLLM):
+    """The druid: same chat machinery, Panoramix's prompt."""
+
+    def __init__(self, **kwargs):
+        super().__init__(persona=PERSONAS["panoramix"], **kwargs)
+
+class PersonaLLM:
+    """One preinitialized chat per persona, all sharing a single transcript upload.
+
+    Calls go to the chat of `switch.active` (a persona.PersonaSwitch), so a
+    switch costs nothing here and every persona keeps its own history. The
+    FAQ only answers for personas it was written for.
+    """
+
+    def __init__(self, switch, faq=None, llm_class=AsterixLLM, **kwargs):
+        configure()
+        self.switch = switch
+        context = upload_context()
+        self.llms = {
+            key: llm_class(faq=faq if persona.faq else None, persona=persona, context=context, **kwargs)
+            for key, persona in switch.personas.items()
+        }
+
+    @property
+    def active(self):
+        return self.llms[self.switch.active]
+
+    def add_to_history(self, user_input, response_text, persona=None):
+        self.llms[persona or self.switch.active].add_to_history(user_input, response_text)
+
+    def __getattr__(self, name):
+        # get_response, get_streaming_response, prompt_footprint, breaker, ...
+        return getattr(self.llms[self.switch.active], name)
 
 if __name__ == "__main__":
     # Test the LLM
@@ -0,0 +1,282 @@
+"""Load generator: how many simultaneous conversations can one host sustain?
+
+    python panoramix.py loadtest [--levels 1,2,4,8,16,32,64] [--turns 3] [--shared] [--workers N]
+
+Runs many simulated sessions on one event loop, each a ConversationEngine
+driven through `run_turn()`, against a fake streaming LLM and fake TTS with
+realistic latencies. Concurrency is ramped level by level; for each level we
+report throughput and time-to-first-audio percentiles, and flag the shared
+state the sessions ended up contending for:
+
+- the event loop's thread pool: every blocking stage call (listening, the
+  LLM stream, each TTS render, each playback) holds a worker thread, so once
+  all workers are busy new turns queue behind other sessions' replies;
+- one LLM chat shared by all sessions (`--shared`), as AsterixLLM/GeminiLLM
+  hold a single chat history: overlapping turns would interleave it.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+from conversation_engine import AudioSink, AudioSource, Clip, ConversationEngine, LanguageModel, SpeechToText, TextToSpeech
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+PROMPTS = ["hello", "who is Obelix", "tell me about the tasks", "what is the magic potion"]
+REPLY = ("By Toutatis, what a question! *adjusts helmet* The druid brews it in a great cauldron. "
+         "One sip and no Roman can stand against us. Obelix fell into it as a baby!")
+
+
+class BlockingCalls:
+    """Counts stage calls currently holding a worker thread (shared by every session of a level)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    @contextlib.contextmanager
+    def hold(self):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class ScriptedSource(AudioSource):
+    """The visitor speaks for `speak` seconds, then the 'audio' is the prompt text."""
+
+    def __init__(self, prompts, speak, calls):
+        self.prompts = list(prompts)
+        self.speak = speak
+        self.calls = calls
+        self.count = 0
+
+    def listen(self):
+        with self.calls.hold():
+            time.sleep(self.speak)
+        self.count += 1
+        return self.prompts[(self.count - 1) % len(self.prompts)]
+
+
+class InstantSTT(SpeechToText):
+    def transcribe(self, audio):
+        return audio
+
+
+class FakeStreamingLLM(LanguageModel):
+    """Streams `reply` after `first_token` seconds, one chunk every `interval` seconds.
+
+    Sleeps block the calling thread, as iterating a Gemini stream does. Keeps
+    one chat history like AsterixLLM, and counts turns that started while
+    another turn on the same chat was still streaming.
+    """
+
+    def __init__(self, calls, reply=REPLY, first_token=0.3, interval=0.04, chunk_size=16):
+        self.calls = calls
+        self.reply = reply
+        self.first_token = first_token
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.history = []
+        self.overlapping = 0
+        self._streaming = 0
+        self._lock = threading.Lock()
+
+    def stream(self, text):
+        with self._lock:
+            if self._streaming:
+                self.overlapping += 1
+            self._streaming += 1
+            self.history.append(("user", text))
+        try:
+            with self.calls.hold():
+                time.sleep(self.first_token)
+                for i in range(0, len(self.reply), self.chunk_size):
+                    if i:
+                        time.sleep(self.interval)
+                    yield self.reply[i:i + self.chunk_size]
+        finally:
+            with self._lock:
+                self._streaming -= 1
+                self.history.append(("model", self.reply))
+
+
+class FakeTTS(TextToSpeech):
+    def __init__(self, calls, seconds=0.15):
+        self.calls = calls
+        self.seconds = seconds
+
+    def synthesize(self, text):
+        with self.calls.hold():
+            time.sleep(self.seconds)
+        return Clip("loadgen.mp3", text, temporary=False)
+
+
+class FakeSpeaker(AudioSink):
+    """'Plays' each clip for as long as it would take to say it."""
+
+    def __init__(self, calls, chars_per_second=15.0):
+        self.calls = calls
+        self.chars_per_second = chars_per_second
+
+    def play(self, clip):
+        with self.calls.hold():
+            time.sleep(len(clip.text) / self.chars_per_second)
+
+
+def percentile(values, fraction):
+    ranked = sorted(values)
+    if not ranked:
+        return None
+    return ranked[min(len(ranked) - 1, int(fraction * len(ranked)))]
+
+
+class LoadTest:
+    """Ramps concurrent sessions and collects per-level results.
+
+    `shared=True` gives all sessions of a level one LLM and one TTS, the way
+    the deployments build a single AsterixLLM; otherwise each session has its
+    own. `workers` sizes the event loop's thread pool (default: the size
+    asyncio picks, min(32, CPUs + 4)). Timing parameters go to the fakes.
+    """
+
+    def __init__(self, turns=3, shared=False, workers=None, speak=0.5, first_token=0.3,
+                 interval=0.04, tts_seconds=0.15, chars_per_second=15.0, tolerance=1.5):
+        self.turns = turns
+        self.shared = shared
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.speak = speak
+        self.first_token = first_token
+        self.interval = interval
+        self.tts_seconds = tts_seconds
+        self.chars_per_second = chars_per_second
+        # A level "degrades" once its p90 TTFA exceeds the single-session p90 by this factor
+        self.tolerance = tolerance
+
+    def build_engines(self, sessions, calls):
+        def llm():
+            return FakeStreamingLLM(calls, first_token=self.first_token, interval=self.interval)
+
+        def tts():
+            return FakeTTS(calls, self.tts_seconds)
+
+        shared_llm, shared_tts = llm(), tts()
+        engines = []
+        for i in range(sessions):
+            prompts = PROMPTS[i % len(PROMPTS):] + PROMPTS[:i % len(PROMPTS)]
+            engines.append(ConversationEngine(
+                ScriptedSource(prompts, self.speak, calls), InstantSTT(),
+                shared_llm if self.shared else llm(), shared_tts if self.shared else tts(),
+                FakeSpeaker(calls, self.chars_per_second)))
+        return engines
+
+    async def _run_sessions(self, engines):
+        loop = asyncio.get_running_loop()
+        pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="loadgen")
+        loop.set_default_executor(pool)
+
+        async def session(engine):
+            return [await engine.run_turn() for _ in range(self.turns)]
+
+        try:
+            return await asyncio.gather(*(session(e) for e in engines))
+        finally:
+            pool.shutdown(wait=False)
+
+    def run_level(self, sessions):
+        calls = BlockingCalls()
+        engines = self.build_engines(sessions, calls)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the engine prints every sentence
+            results = asyncio.run(self._run_sessions(engines))
+        elapsed = time.perf_counter() - start
+
+        turns = [t for session in results for t in session if t]
+        ttfa = [t.time_to_first_audio() for t in turns if t.time_to_first_audio() is not None]
+        llms = {id(e.llm): e.llm for e in engines}.values()
+        return {
+            "sessions": sessions,
+            "turns": len(turns),
+            "seconds": elapsed,
+            "turns_per_second": len(turns) / elapsed if elapsed else 0.0,
+            "ttfa_p50": percentile(ttfa, 0.5),
+            "ttfa_p90": percentile(ttfa, 0.9),
+            "ttfa_p99": percentile(ttfa, 0.99),
+            "workers": self.workers,
+            "peak_blocking_calls": calls.peak,
+            "overlapping_chat_turns": sum(llm.overlapping for llm in llms),
+        }
+
+    def run(self, levels=DEFAULT_LEVELS):
+        return [self.run_level(n) for n in levels]
+
+    def findings(self, results):
+        """Human-readable bottlenecks and the highest level that kept TTFA within tolerance."""
+        findings = []
+        baseline = results[0]["ttfa_p90"]
+        sustained = results[0]["sessions"]
+        for r in results:
+            if baseline and r["ttfa_p90"] is not None and r["ttfa_p90"] <= baseline * self.tolerance:
+                sustained = max(sustained, r["sessions"])
+
+        # A full pool alone is harmless (one turn holds up to three workers); it is
+        # the bottleneck once turns also start waiting for one
+        saturated = [r for r in results if r["peak_blocking_calls"] >= r["workers"] and baseline
+                     and r["ttfa_p90"] is not None and r["ttfa_p90"] > baseline * self.tolerance]
+        if saturated:
+            first = saturated[0]
+            findings.append(
+                f"thread pool saturated from {first['sessions']} sessions: all {first['workers']} workers "
+                f"busy with blocking stage calls (LLM stream, TTS, playback, listening), so new turns "
+                f"wait for other sessions' replies (--workers sizes the pool)")
+        shared = [r for r in results if r["overlapping_chat_turns"]]
+        if shared:
+            first = shared[0]
+            findings.append(
+                f"shared chat: from {first['sessions']} sessions, {first['overlapping_chat_turns']} turns "
+                f"started while another session's reply was streaming on the same chat; one "
+                f"AsterixLLM/GeminiLLM history would interleave, so give each session its own chat")
+        findings.append(f"TTFA p90 stays within {self.tolerance}x of a single session up to "
+                        f"{sustained} session{'s' if sustained > 1 else ''}")
+        return findings
+
+
+def format_report(results, findings=()):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    lines = [f"{'sessions':>8}  {'turns/s':>8}  {'TTFA p50':>8}  {'p90':>6}  {'p99':>6}  {'busy threads':>12}"]
+    for r in results:
+        lines.append(f"{r['sessions']:>8}  {r['turns_per_second']:>8.2f}  {ms(r['ttfa_p50']):>8}  "
+                     f"{ms(r['ttfa_p90']):>6}  {ms(r['ttfa_p99']):>6}  "
+                     f"{r['peak_blocking_calls']:>5}/{r['workers']:<6}")
+    lines += [f"- {f}" for f in findings]
+    return "\n".join(lines)
+
+
+def main(levels=DEFAULT_LEVELS, turns=3, shared=False, workers=None, report_path=None):
+    test = LoadTest(turns=turns, shared=shared, workers=workers)
+    results = []
+    for n in levels:
+        print(f"Running {n} concurrent sessions...")
+        results.append(test.run_level(n))
+    findings = test.findings(results)
+    print(format_report(results, findings))
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({"levels": results, "findings": findings}, f, indent=2)
+        print(f"Load test report written to {report_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
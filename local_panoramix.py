@@ -1,97 +1,48 @@
-import re
-import os
-import time
-import asyncio
-import speech_recognition as sr
-import edge_tts
-from llm_client import AsterixLLM
 from dotenv import load_dotenv
-import tempfile
+from accounting import SessionAccountant
+from conversation_engine import ConversationEngine
+from echo_control import PlaybackGate
+from stages import EdgeTTS, GeminiLLM, GoogleSTT, MicrophoneSource, SystemPlayerSink
+from startup import build_chat_startup, finish_session, start_recording
 
 # Load environment variables
 load_dotenv()
 
-def play_audio(filename):
-    """Plays an audio file using the default system player."""
-    if os.name == 'nt':  # Windows
-        os.startfile(filename)
-        # Wait a bit for the player to open, but we can't easily know when it finishes
-        # A better approach for a loop is to use a library like playsound or pygame,
-        # but os.startfile is simplest for now without extra heavy deps.
-        # Let's try to use playsound if available, or fallback.
-        time.sleep(1) 
-    else:
-        # Mac/Linux
-        os.system(f"open {filename}" if os.name == 'posix' else f"xdg-open {filename}")
-
-def clean_text_for_speech(text):
-    """Removes text within asterisks (actions) for speech generation."""
-    return re.sub(r'\*.*?\*', '', text).strip()
-
-async def generate_voice(text, filename):
-    """Generates voice using edge-tts."""
-    voice = "en-IE-ConnorNeural"
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(filename)
-
-def main():
+def build_engine(startup, accountant=None):
+    """Local mic, full Gemini reply, one clip opened in the system audio player."""
+    personas = startup.get("personas")
+    source = MicrophoneSource()
+    engine = ConversationEngine(
+        source=source,
+        stt=GoogleSTT(source.recognizer),
+        llm=GeminiLLM(lambda: startup.get("llm"), streaming=False, faq=lambda: startup.get("faq"),
+                      personas=personas),
+        tts=EdgeTTS(),
+        sink=SystemPlayerSink(),
+        split_sentences=False,
+        accountant=accountant,
+        # No echo reference from an external player: reopen 0.15 s after the clip ends
+        gate=PlaybackGate(tail=0.15),
+    )
+    return personas.attach(engine)
+
+def main(report_path=None, record_path=None, persona=None):
     print("Initializing Asterix Local Chatbot...")
-    
-    try:
-        llm = AsterixLLM()
-    except Exception as e:
-        print(f"Error initializing LLM: {e}")
-        print("Make sure you have a .env file with GEMINI_API_KEY.")
-        return
-
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-
-    print("\n--- Asterix is listening! (Press Ctrl+C to stop) ---\n")
-
-    while True:
-        try:
-            with mic as source:
-                print("Listening... (Speak now)")
-                recognizer.adjust_for_ambient_noise(source)
-                audio = recognizer.listen(source)
-
-            print("Transcribing...")
-            try:
-                user_text = recognizer.recognize_google(audio)
-                print(f"You said: {user_text}")
-            except sr.UnknownValueError:
-                print("Could not understand audio.")
-                continue
-            except sr.RequestError as e:
-                print(f"Could not request results; {e}")
-                continue
+    print("Make sure you have a .env file with GEMINI_API_KEY.")
 
-            print("Consulting the warrior...")
-            response_text = llm.get_response(user_text)
-            print(f"Asterix: {response_text}")
+    # The LLM (transcript upload) initializes in the background so the mic
+    # opens immediately; the first turn waits for it only if it's still loading.
+    startup = build_chat_startup(EdgeTTS(), persona=persona).start()
+    accountant = SessionAccountant()
+    engine = build_engine(startup, accountant)
+    recorder = start_recording(engine, record_path)
 
-            print("Generating voice...")
-            speech_text = clean_text_for_speech(response_text)
-            
-            # Save to a temporary file to avoid permission issues or conflicts
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-                temp_filename = fp.name
-            
-            asyncio.run(generate_voice(speech_text, temp_filename))
-            
-            print("Playing response...")
-            play_audio(temp_filename)
-            
-            # Wait a bit before listening again to avoid picking up the robot's voice
-            # This is a simple heuristic.
-            time.sleep(len(response_text) / 10) 
+    startup.get("personas").read_console()
+    print(f"\n--- {engine.speaker} is listening! (Press Ctrl+C to stop) ---")
+    print("Say 'switch to Panoramix' or type asterix / panoramix / assistant to change persona.\n")
+    engine.run()
 
-        except KeyboardInterrupt:
-            print("\nGoodbye!")
-            break
-        except Exception as e:
-            print(f"An error occurred: {e}")
+    finish_session(startup, accountant, report_path, recorder)
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,6 @@
-import whisper
 import sounddevice as sd
 from scipy.io.wavfile import write
 
-model = whisper.load_model("base")  # or tiny, small, medium, large
-
 def record_audio(filename="input.wav", duration=5, fs=44100):
     print("Recording...")
     audio = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='float32')
@@ -11,8 +8,16 @@ def record_audio(filename="input.wav", duration=5, fs=44100):
     write(filename, fs, audio)
     print("Saved:", filename)
 
-record_audio()
+def main(model_name="base"):  # or tiny, small, medium, large
+    # Whisper (and torch) are only imported and loaded when actually transcribing
+    import whisper
+
+    model = whisper.load_model(model_name)
+    record_audio()
+
+    result = model.transcribe("input.wav", language = "pt")
+    print("\nTranscription:")
+    print(result["text"])
 
-result = model.transcribe("input.wav", language = "pt")
-print("\nTranscription:")
-print(result["text"])
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import bisect
+import collections
+import math
+
+# Background noise tracking for the mic. Instead of a ~1 s
+# `adjust_for_ambient_noise()` before every turn, every chunk the mic captures
+# (see capture.py) updates a running noise floor, and the speech threshold
+# follows it, so listening starts at once with a current threshold.
+
+
+def chunk_energy(chunk, sample_width=2):
+    """RMS of an int16 PCM chunk (bytes or array), on the same scale as
+    speech_recognition's `energy_threshold`."""
+    import numpy as np
+
+    if sample_width != 2:
+        raise ValueError("only 16-bit PCM is supported")
+    samples = np.frombuffer(chunk, dtype=np.int16) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+    if len(samples) == 0:
+        return 0.0
+    return math.sqrt(float(np.dot(samples.astype(np.float64), samples)) / len(samples))
+
+
+class NoiseFloorTracker:
+    """Running estimate of the room's noise floor from chunk energies.
+
+    The floor is a low percentile of the last `window` seconds, so speech
+    (loud, but intermittent) barely moves it. It may drop at once when the
+    room gets quieter but rises by at most `max_rise_db` per second, so a
+    visitor talking for a long time doesn't end up counted as noise while the
+    hall slowly getting louder over the day still is.
+    """
+
+    def __init__(self, window=6.0, percentile=0.2, ratio=2.0, max_rise_db=3.0,
+                 minimum=50.0, initial=300.0):
+        self.window = window
+        self.percentile = percentile
+        # Threshold = floor * ratio (speech_recognition's dynamic default is 1.5)
+        self.ratio = ratio
+        self.max_rise_db = max_rise_db
+        self.minimum = minimum
+        self.initial = initial
+        self.floor = None
+        self.updates = 0
+        self._recent = collections.deque()  # (energy, seconds), oldest first
+        self._ranked = []  # the same energies, kept sorted
+        self._recent_seconds = 0.0
+
+    @property
+    def threshold(self):
+        if self.floor is None:
+            return self.initial
+        return max(self.floor * self.ratio, self.minimum)
+
+    def update(self, energy, seconds):
+        """Adds one chunk's energy; returns the new threshold."""
+        self._recent.append((energy, seconds))
+        bisect.insort(self._ranked, energy)
+        self._recent_seconds += seconds
+        while self._recent_seconds > self.window and len(self._recent) > 1:
+            old, old_seconds = self._recent.popleft()
+            del self._ranked[bisect.bisect_left(self._ranked, old)]
+            self._recent_seconds -= old_seconds
+
+        ranked = self._ranked
+        estimate = ranked[int(self.percentile * (len(ranked) - 1))]
+        if self.floor is None or estimate <= self.floor:
+            self.floor = estimate
+        else:
+            self.floor = min(estimate, max(self.floor, 1.0) * 10 ** (self.max_rise_db * seconds / 20))
+        self.updates += 1
+        return self.threshold
+
+    def feed(self, chunk, sample_rate, sample_width=2):
+        """Adds a raw PCM chunk; returns the new threshold."""
+        seconds = len(chunk) / (sample_rate * sample_width)
+        return self.update(chunk_energy(chunk, sample_width), seconds)
@@ -0,0 +1,151 @@
+"""Single entry point for every Asterix deployment.
+
+    python panoramix.py run --mode robot|fluid|local|live|whisper [--robot-ip IP]
+    python panoramix.py run --mode fluid --profile-imports
+    python panoramix.py run --mode fluid --report session.json
+    python panoramix.py run --mode fluid --record session.pxr
+    python panoramix.py run --mode fluid --persona panoramix
+    python panoramix.py replay session.pxr [--fast]
+    python panoramix.py loadtest --levels 1,4,16 [--shared]
+
+Only the selected mode's module is imported, so e.g. the live mode never
+loads google.generativeai or pygame, and no mode loads whisper unless asked.
+Keep this module free of heavy imports: test_cli.py enforces a cold-start
+import budget.
+"""
+import argparse
+import builtins
+import importlib
+import sys
+import time
+
+# mode -> (module, entry function, description)
+MODES = {
+    "robot": ("panoramix_bot", "main", "Elmo robot: record on the robot, play replies through it"),
+    "fluid": ("fluid_panoramix", "main", "Local mic, streamed Gemini reply, sentence-by-sentence TTS"),
+    "local": ("local_panoramix", "main", "Local mic, full Gemini reply, system audio player"),
+    "live": ("live_panoramix", "main", "Gemini Live API, audio in and audio out"),
+    "whisper": ("main", "main", "Record 5 seconds and transcribe with Whisper"),
+}
+# Modes built on ConversationEngine (support accounting reports and recording)
+ENGINE_MODES = {"robot", "fluid", "local"}
+
+
+class ImportProfiler:
+    """Times every first-time import made while active (like `python -X importtime`)."""
+
+    def __init__(self):
+        self.records = []  # (depth, module name, seconds incl. nested imports)
+        self._depth = 0
+        self._original_import = None
+
+    def __enter__(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._original_import
+        return False
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        return self._timed(name, self._original_import, name, globals, locals, fromlist, level)
+
+    def _timed(self, name, load, *args):
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return load(*args)
+        finally:
+            self._depth -= 1
+            self.records.append((depth, name, time.perf_counter() - start))
+
+    def import_module(self, name):
+        """importlib.import_module, timed too (it bypasses builtins.__import__)."""
+        if name in sys.modules:
+            return importlib.import_module(name)
+        with self:
+            return self._timed(name, importlib.import_module, name)
+
+    def report(self, limit=15):
+        top = sorted((r for r in self.records if r[0] == 0), key=lambda r: r[2], reverse=True)
+        total = sum(r[2] for r in top)
+        lines = [f"Import time: {total * 1000:.0f} ms across {len(self.records)} modules"]
+        for _, name, seconds in top[:limit]:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+        return "\n".join(lines)
+
+
+def load_mode(mode, profiler=None):
+    """Imports the backend for `mode` and returns its entry function."""
+    module_name, func_name, _ = MODES[mode]
+    module = (profiler or importlib).import_module(module_name)
+    return getattr(module, func_name)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="panoramix", description="Talk to Asterix.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Start a conversation",
+                              formatter_class=argparse.RawDescriptionHelpFormatter,
+                              epilog="\n".join(f"  {m:<8} {d}" for m, (_, _, d) in MODES.items()))
+    run.add_argument("--mode", choices=list(MODES), default="fluid")
+    run.add_argument("--robot-ip", help="Elmo IP address (robot mode; defaults to $ROBOT_IP)")
+    run.add_argument("--report", metavar="PATH",
+                     help="Write the per-turn token/payload accounting report as JSON on exit")
+    run.add_argument("--persona", choices=["asterix", "panoramix", "assistant"],
+                     help="Persona to start as (switch at runtime by voice or by typing its name)")
+    run.add_argument("--record", metavar="PATH",
+                     help="Record every turn (audio, transcript, LLM chunks, clips, timings) for replay")
+    run.add_argument("--profile-imports", action="store_true",
+                     help="Print how long the selected backend took to import")
+
+    replay = commands.add_parser("replay", help="Replay a recorded session offline and compare timings")
+    replay.add_argument("path", help="Session file written by 'run --record'")
+    replay.add_argument("--fast", action="store_true", help="Skip the recorded delays instead of reproducing them")
+    replay.add_argument("--report", metavar="PATH", help="Write the per-turn comparison as JSON")
+
+    load = commands.add_parser("loadtest", help="Ramp simulated concurrent sessions against fake backends")
+    load.add_argument("--levels", default="1,2,4,8,16,32,64", help="Comma-separated session counts")
+    load.add_argument("--turns", type=int, default=3, help="Turns per session")
+    load.add_argument("--shared", action="store_true", help="All sessions share one LLM and TTS, like one AsterixLLM")
+    load.add_argument("--workers", type=int, help="Thread pool size (default: asyncio's)")
+    load.add_argument("--report", metavar="PATH", help="Write the per-level results as JSON")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "replay":
+        return importlib.import_module("recorder").main(args.path, fast=args.fast, report_path=args.report)
+    if args.command == "loadtest":
+        levels = [int(n) for n in args.levels.split(",")]
+        return importlib.import_module("loadgen").main(levels, turns=args.turns, shared=args.shared,
+                                                       workers=args.workers, report_path=args.report)
+
+    for option in ("report", "record", "persona"):
+        if getattr(args, option) and args.mode not in ENGINE_MODES:
+            parser.error(f"--{option} is only available in {', '.join(sorted(ENGINE_MODES))} modes")
+
+    profiler = ImportProfiler() if args.profile_imports else None
+    entry = load_mode(args.mode, profiler)
+    if profiler:
+        print(profiler.report())
+
+    kwargs = {}
+    if args.mode in ENGINE_MODES:
+        kwargs["report_path"] = args.report
+        kwargs["record_path"] = args.record
+        kwargs["persona"] = args.persona
+    if args.mode == "robot":
+        kwargs["robot_ip"] = args.robot_ip
+    return entry(**kwargs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,94 @@
-import re
 import os
-import time
 import sys
 from dotenv import load_dotenv
 from ElmoV2API import ElmoV2API
-from llm_client import AsterixLLM
 from audio_handler import AudioHandler
+from remote_store import RemoteAudioStore
+from accounting import SessionAccountant
+from persona import VOICE
+from conversation_engine import ConversationEngine
+from expressions import ExpressionTagger
+from stages import EdgeTTS, GeminiLLM, RecordingSTT, RobotRecordingSource, RobotScreenEffects, RobotSink
+from startup import build_chat_startup, finish_session, start_recording
 
 load_dotenv()
 
-def clean_text_for_speech(text):
-    """Removes text within asterisks (actions) for speech generation."""
-    return re.sub(r'\*.*?\*', '', text).strip()
+GREETING_TEXT = "By Toutatis! Asterix is here. Come and talk to me!"
+GREETING_SOUND = "asterix_greeting.mp3"
+GREETING_CACHE = os.path.join("faq_audio", GREETING_SOUND)
 
-def main():
+def show_online(robot):
+    robot.set_screen(text="Asterix Online")
+
+def connect_robot(robot_ip):
+    robot = ElmoV2API(robot_ip)
+    status = robot.status()
+    print(f"Robot Status: {status}")
+    return robot
+
+def greet(robot, audio, tts):
+    """Plays the greeting, rendering and uploading it first if the robot doesn't have it.
+
+    The clip is rendered once and kept locally; it is uploaded again whenever
+    the robot's copy is missing (first run, or a reset robot).
+    """
+    if not os.path.exists(GREETING_CACHE):
+        os.makedirs(os.path.dirname(GREETING_CACHE), exist_ok=True)
+        tts.render(GREETING_TEXT, GREETING_CACHE, voice=VOICE)
+    if not audio.has_sound(GREETING_SOUND):
+        if not audio.upload_response(GREETING_SOUND, local_file=GREETING_CACHE):
+            return False
+    robot.play_sound(GREETING_SOUND)
+    return True
+
+def store_manifest(robot_ip):
+    """Local record of the clips uploaded to this robot."""
+    return os.path.join("faq_audio", f"robot_{robot_ip.replace(':', '_')}.json")
+
+def open_store(audio, robot_ip):
+    """The robot's clip store, or None (plain uploads) if it cannot be reconciled.
+
+    The store only saves uploads, so an SSH/SFTP error here must not stop the bot.
+    """
+    try:
+        return RemoteAudioStore(audio, store_manifest(robot_ip)).reconcile()
+    except Exception as e:
+        print(f"Robot clip store unavailable, uploading clips directly: {e}")
+        return None
+
+def build_startup(robot_ip, tts, persona=None):
+    # The robot shows it is online as soon as its link is up and greets once
+    # the clip is known to be on it; the LLM (transcript upload) and FAQ audio
+    # finish in the background.
+    startup = build_chat_startup(tts, persona=persona)
+    startup.add("robot", lambda: connect_robot(robot_ip), on_ready=show_online)
+    startup.add("audio", lambda: AudioHandler(robot_ip))
+    startup.add("store", lambda audio: open_store(audio, robot_ip), depends_on=["audio"])
+    startup.add("greeting", lambda robot, audio: greet(robot, audio, tts), depends_on=["robot", "audio"])
+    return startup
+
+def build_engine(startup, robot, audio, tts, accountant=None, store=None):
+    """Records on the robot, answers with the full Gemini reply, plays it through Elmo."""
+    personas = startup.get("personas")
+    engine = ConversationEngine(
+        source=RobotRecordingSource(robot, audio),
+        stt=RecordingSTT(audio),
+        llm=GeminiLLM(lambda: startup.get("llm"), streaming=False, faq=lambda: startup.get("faq"),
+                      personas=personas),
+        tts=tts,
+        sink=RobotSink(robot, audio, store=store),
+        effects=RobotScreenEffects(robot),
+        split_sentences=False,
+        error_delay=2,
+        accountant=accountant,
+        tagger=ExpressionTagger(),
+    )
+    return personas.attach(engine)
+
+def main(robot_ip=None, report_path=None, record_path=None, persona=None):
     # Configuration
-    robot_ip = os.getenv("ROBOT_IP")
-    if len(sys.argv) > 1:
-        robot_ip = sys.argv[1]
-    
+    robot_ip = robot_ip or os.getenv("ROBOT_IP")
+
     if not robot_ip:
         print("Error: ROBOT_IP not found in environment or arguments.")
         print("Usage: python panoramix_bot.py <ROBOT_IP>")
@@ -26,85 +96,25 @@ def main():
 
     print(f"Connecting to Elmo at {robot_ip}...")
     
-    # Initialize components
+    # Initialize components concurrently
+    tts = EdgeTTS()
+    startup = build_startup(robot_ip, tts, persona).start()
     try:
-        robot = ElmoV2API(robot_ip)
-        llm = AsterixLLM()
-        audio = AudioHandler(robot_ip)
-        
-        # Verify connection
-        status = robot.status()
-        print(f"Robot Status: {status}")
-        robot.set_screen(text="Asterix Online")
-        
+        robot = startup.get("robot")
+        audio = startup.get("audio")
+        store = startup.get("store")
     except Exception as e:
         print(f"Initialization failed: {e}")
         return
 
     print("Asterix Chatbot Started. Press Ctrl+C to exit.")
-    
-    while True:
-        try:
-            print("\nWaiting for user input...")
-            # 1. Start Recording
-            print("Recording... (Speak now)")
-            robot.set_screen(text="Listening...")
-            robot.start_recording()
-            time.sleep(5) # Record for 5 seconds (Adjustable)
-            robot.stop_recording()
-            robot.set_screen(text="Processing...")
-            
-            # 2. Download Audio
-            print("Downloading audio...")
-            if not audio.download_recording():
-                print("Failed to download audio.")
-                robot.set_screen(text="Error: Audio Download")
-                continue
-                
-            # 3. Transcribe
-            print("Transcribing...")
-            user_text = audio.transcribe_audio()
-            if not user_text:
-                print("Could not understand audio.")
-                robot.set_screen(text="I didn't hear you.")
-                continue
-            
-            print(f"User said: {user_text}")
-            robot.set_screen(text=f"You: {user_text[:20]}...") # Show partial text
-            
-            # 4. Get LLM Response
-            print("Consulting the warrior (LLM)...")
-            response_text = llm.get_response(user_text)
-            print(f"Asterix: {response_text}")
-            
-            # 5. Generate Audio Response
-            print("Generating voice...")
-            speech_text = clean_text_for_speech(response_text)
-            if audio.generate_audio(speech_text):
-                # 6. Upload Audio
-                print("Uploading response...")
-                response_filename = "panoramix_response.mp3"
-                if audio.upload_response(response_filename):
-                    # 7. Play Audio & Show Text
-                    print("Playing response...")
-                    robot.set_screen(text=response_text)
-                    robot.play_sound(response_filename)
-                    
-                    # Optional: Add movement
-                    # robot.set_pan(10)
-                    # time.sleep(0.5)
-                    # robot.set_pan(-10)
-                else:
-                    print("Failed to upload response.")
-            else:
-                print("Failed to generate audio.")
-                
-        except KeyboardInterrupt:
-            print("\nStopping...")
-            break
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            time.sleep(2)
+    accountant = SessionAccountant()
+    engine = build_engine(startup, robot, audio, tts, accountant, store)
+    recorder = start_recording(engine, record_path)
+    startup.get("personas").read_console()
+    engine.run()
+
+    finish_session(startup, accountant, report_path, recorder)
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,251 @@
+import re
+import sys
+import threading
+import time
+
+# Shared persona pieces for every deployment (text chat, robot, Live API).
+
+VOICE = "en-IE-ConnorNeural"
+
+ASTERIX_PERSONA = """
+You are Asterix, the brave and cunning warrior from the Village of Indomitable Gauls.
+
+Persona:
+- You are brave, clever, and loyal.
+- You are small in stature but have a big spirit (and the magic potion!).
+- You are the best friend of Obelix.
+- You often tap your helmet or smooth your mustache.
+- You find the Romans amusingly foolish ("These Romans are crazy!").
+
+Key Information to Reveal (Truthfully):
+- Name: Asterix.
+- Age: Indeterminate, but a seasoned warrior.
+- Place of Origin: The Village of Indomitable Gauls (in Armorica).
+- Profession: Warrior / Hero.
+- Passion: Hunting wild boars and fighting Romans.
+- Magic Potion: You drink it to get super strength. It is brewed by the druid Panoramix (Getafix).
+- Best Friend: Obelix (who fell into the potion when he was little).
+- Dog: Dogmatix (Idéfix), a small white dog who loves trees.
+- Catchphrase: "These Romans are crazy!" (Ils sont fous ces Romains!).
+"""
+
+ASTERIX_INSTRUCTIONS = """
+Instructions:
+- Respond to the user as if they are a friend or a Roman (depending on tone, but mostly friendly).
+- Keep responses concise.
+- Use your catchphrase if appropriate.
+- Mention Obelix or the village if relevant.
+"""
+
+# Input from speech-to-text (text LLM)
+ASTERIX_PROMPT = ASTERIX_PERSONA + """
+Context & Error Handling:
+- You are receiving input from a speech-to-text system. It may contain errors.
+- Ignore minor typos.
+- If input is unclear, ask for clarification like a warrior ("By Toutatis! Speak up!").
+""" + ASTERIX_INSTRUCTIONS
+
+# Real-time audio in and out (Gemini Live API)
+ASTERIX_LIVE_PROMPT = ASTERIX_PERSONA + """
+Context & Error Handling:
+- You are receiving real-time audio input.
+- Ignore minor background noise.
+- If input is unclear, ask for clarification like a warrior ("By Toutatis! Speak up!").
+""" + ASTERIX_INSTRUCTIONS + """- DO NOT vocalize actions (e.g. *waves*), only speak the dialogue.
+"""
+
+FALLBACK_REPLY = "By Toutatis! The sky is falling! I cannot answer."
+
+PANORAMIX_PERSONA = """
+You are Panoramix (Getafix), the wise old druid of the Village of Indomitable Gauls.
+
+Persona:
+- You are wise, kind and a little absent-minded, with a long white beard.
+- You brew the magic potion that gives the villagers super strength; its recipe is a secret.
+- You gather mistletoe with your golden sickle and are often off in the forest.
+- You are fond of Asterix and patient with Obelix, who may never drink the potion again
+  because he fell into the cauldron when he was little.
+- You answer with calm authority and the occasional druidic aside.
+
+Key Information to Reveal (Truthfully):
+- Name: Panoramix (Getafix in English).
+- Profession: Druid of the village.
+- Magic Potion: You brew it; the recipe is passed from druid to druid, by mouth only.
+- Friends: Asterix, Obelix, Chief Vitalstatistix and the whole village.
+"""
+
+PANORAMIX_PROMPT = PANORAMIX_PERSONA + """
+Context & Error Handling:
+- You are receiving input from a speech-to-text system. It may contain errors.
+- Ignore minor typos.
+- If input is unclear, ask for clarification like a druid ("By Belenos! Say that again, my friend.").
+
+Instructions:
+- Keep responses concise.
+- Mention the potion, the forest or the village if relevant.
+"""
+
+ASSISTANT_PROMPT = """
+You are a friendly, helpful voice assistant at an exhibition about Asterix and the Gauls.
+
+Context & Error Handling:
+- You are receiving input from a speech-to-text system. It may contain errors.
+- Ignore minor typos; if the input is unclear, politely ask the visitor to repeat it.
+
+Instructions:
+- Answer plainly and accurately, without playing a character.
+- Keep responses concise: they are read aloud.
+- Use the transcript you were given when asked about the story.
+"""
+
+
+class Persona:
+    """A character the bot can speak as: prompt, voice and how to call it up."""
+
+    def __init__(self, key, speaker, voice, prompt, fallback, greeting, aliases, context_reply, faq=False):
+        self.key = key
+        self.speaker = speaker
+        self.voice = voice
+        self.prompt = prompt
+        self.fallback = fallback
+        self.greeting = greeting  # said when switched to
+        self.aliases = aliases
+        self.context_reply = context_reply  # the chat's answer to the uploaded transcript
+        self.faq = faq  # whether the (Asterix) FAQ answers for it
+
+
+PERSONAS = {
+    "asterix": Persona(
+        "asterix", "Asterix", VOICE, ASTERIX_PROMPT, FALLBACK_REPLY,
+        "*taps helmet* Asterix here! What can I do for you?", ("asterix",),
+        "By Toutatis! I remember these tasks well!", faq=True),
+    "panoramix": Persona(
+        "panoramix", "Panoramix", "en-GB-RyanNeural", PANORAMIX_PROMPT,
+        "By Belenos! My cauldron has gone cold. I cannot answer.",
+        "*strokes beard* Panoramix, at your service. Ask, my friend.", ("panoramix", "getafix", "druid"),
+        "By Belenos! I remember these tasks well, and the potion that saw us through them."),
+    "assistant": Persona(
+        "assistant", "Assistant", "en-US-AriaNeural", ASSISTANT_PROMPT,
+        "Sorry, I can't answer right now. Please try again in a moment.",
+        "Assistant mode. How can I help?", ("assistant", "normal", "plain", "default"),
+        "Understood. I will use this transcript to answer questions about the story."),
+}
+
+SWITCH_COMMAND = re.compile(
+    r"^(?:please\s+)?(?:(?:switch|change|go)(?:\s+back)?\s+to|talk\s+to|become|be|let\s+me\s+talk\s+to)?"
+    r"\s*(?:the\s+)?(\w+)(?:\s+mode)?(?:\s+please)?[.!?]*$", re.IGNORECASE)
+
+
+class PersonaSwitch:
+    """Which persona is speaking; switching only flips a key and notifies `listeners`.
+
+    It doesn't wait on the LLM: the chats for every persona are built up front
+    (llm_client.PersonaLLM), so a switch by voice or console takes effect at once.
+    """
+
+    def __init__(self, active="asterix", personas=None):
+        self.personas = personas or PERSONAS
+        if active not in self.personas:
+            raise ValueError(f"Unknown persona '{active}' (choose from {', '.join(self.personas)})")
+        self.active = active
+        self.listeners = []  # called with the new Persona after every switch
+        self.switch_seconds = []
+
+    @property
+    def current(self):
+        return self.personas[self.active]
+
+    def find(self, name):
+        name = name.lower()
+        for key, persona in self.personas.items():
+            if name == key or name in persona.aliases:
+                return key
+        return None
+
+    def switch(self, name):
+        """Makes `name` (key or alias) the active persona. Returns it."""
+        start = time.perf_counter()
+        key = self.find(name)
+        if key is None:
+            raise ValueError(f"Unknown persona '{name}'")
+        self.active = key
+        for listener in self.listeners:
+            try:
+                listener(self.current)
+            except Exception as e:
+                print(f"Persona listener failed: {e}")
+        self.switch_seconds.append(time.perf_counter() - start)
+        print(f"Persona: {self.current.speaker}")
+        return self.current
+
+    def command(self, text):
+        """Switches if `text` is a switch command ("switch to Panoramix", "assistant mode").
+
+        Returns the new Persona, or None if `text` is an ordinary utterance.
+        A bare name only counts when it is said as a command ("Panoramix mode").
+        """
+        text = text.strip()
+        match = SWITCH_COMMAND.match(text)
+        if not match or self.find(match.group(1)) is None:
+            return None
+        if text.lower().strip(" .!?") == match.group(1).lower():
+            return None  # just the name: "Asterix!" is a greeting, not a command
+        return self.switch(match.group(1))
+
+    def attach(self, engine):
+        """Keeps `engine`'s speaker name and TTS voice in step with the active persona."""
+        tts = engine.tts
+
+        def apply(persona):
+            engine.speaker = persona.speaker
+            if hasattr(tts, "voice"):
+                tts.voice = persona.voice
+
+        self.listeners.append(apply)
+        apply(self.current)
+        return engine
+
+    def read_console(self, stream=None):
+        """Switches on persona names typed in the terminal while the bot runs."""
+        stream = stream or sys.stdin
+
+        def run():
+            for line in stream:
+                name = line.strip()
+                if not name:
+                    continue
+                try:
+                    self.switch(name)
+                except ValueError as e:
+                    print(f"{e} (choose from {', '.join(self.personas)})")
+
+        thread = threading.Thread(target=run, name="persona-console", daemon=True)
+        thread.start()
+        return thread
+
+ACTION_PATTERN = re.compile(r'\*.*?\*')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+def clean_text_for_speech(text):
+    """Removes text within asterisks (actions) for speech generation."""
+    return ACTION_PATTERN.sub('', text).strip()
+
+
+class SentenceSplitter:
+    """Splits streamed LLM chunks into complete sentences as they arrive."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, chunk):
+        """Adds a chunk and returns any sentences it completed."""
+        self.buffer += chunk
+        sentences = SENTENCE_BOUNDARY.split(self.buffer)
+        # Keep the last incomplete sentence in the buffer
+        self.buffer = sentences[-1]
+        return sentences[:-1]
+
+    def flush(self):
+        """Returns whatever is left once the stream ends."""
+        rest, self.buffer = self.buffer, ""
+        return [rest] if rest.strip() else []
@@ -0,0 +1,453 @@
+"""Conversation recording and deterministic replay.
+
+    python panoramix.py run --mode fluid --record session.pxr
+    python panoramix.py replay session.pxr [--fast] [--report replay.json]
+
+A session file is append-only: a short magic header, then records of
+`<u32 meta length><u32 blob length><JSON meta><blob>`. Meta says what the
+record is (input audio, transcript, LLM chunk, TTS clip, playback, turn
+timings) and when it happened; the blob holds raw audio. The reader memory-maps
+the file and hands blobs out as views, so large sessions open instantly, and
+a session cut short by a crash reads up to its last complete record.
+
+Replay runs the recorded turns through a ConversationEngine built with the
+session's settings, with every live service (mic, STT, Gemini, edge-tts,
+speaker) answered from the recording, either with the original timing or as
+fast as possible, and compares the new turn timings against the recorded ones.
+"""
+import itertools
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+
+from conversation_engine import (AudioSink, AudioSource, Clip, ConversationEngine, EndOfConversation,
+                                 LanguageModel, SpeechToText, TextToSpeech)
+
+MAGIC = b"PXREC1\n"
+_HEADER = struct.Struct("<II")
+
+
+class SessionWriter:
+    """Appends records to a session file; safe to call from several threads."""
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new:
+            self.file.write(MAGIC)
+        self._lock = threading.Lock()
+
+    def append(self, meta, blob=b""):
+        data = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self.file.write(_HEADER.pack(len(data), len(blob)))
+            self.file.write(data)
+            self.file.write(blob)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SessionReader:
+    """Memory-maps a session file. Iterating yields (meta, blob view) pairs."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Panoramix session recording")
+
+    def __iter__(self):
+        view = memoryview(self.map)
+        offset, size = len(MAGIC), len(self.map)
+        while offset + _HEADER.size <= size:
+            meta_len, blob_len = _HEADER.unpack_from(self.map, offset)
+            start = offset + _HEADER.size
+            end = start + meta_len + blob_len
+            if end > size:
+                break  # truncated by a crash mid-write
+            meta = json.loads(bytes(view[start:start + meta_len]))
+            yield meta, view[start + meta_len:end]
+            offset = end
+
+    def turns(self):
+        """The session header and a list of turns, each a list of (meta, blob).
+
+        A turn starts when the mic opens ("listening"), so speculative LLM
+        requests made while the visitor is speaking belong to it; older
+        recordings without that record start a turn at "listen".
+        """
+        header, turns, listening = None, [], False
+        for meta, blob in self:
+            kind = meta["type"]
+            if kind == "session":
+                header = meta
+            elif kind == "listening" or (kind == "listen" and not listening):
+                turns.append([(meta, blob)])
+            elif turns:
+                turns[-1].append((meta, blob))
+            if kind in ("listening", "listen"):
+                listening = kind == "listening"
+        # A mic opening without an utterance is where the conversation ended
+        return header, [t for t in turns if any(meta["type"] == "listen" for meta, _ in t)]
+
+    def close(self):
+        self.map.close()
+
+
+def _audio_record(audio):
+    """Serializes whatever a source returned: AudioData, a recording path, or text."""
+    if audio is None:
+        return {"audio": "none"}, b""
+    if hasattr(audio, "frame_data"):
+        return ({"audio": "pcm", "rate": audio.sample_rate, "width": audio.sample_width},
+                bytes(audio.frame_data))
+    if isinstance(audio, str) and os.path.isfile(audio):
+        with open(audio, "rb") as f:
+            return {"audio": "file", "name": os.path.basename(audio)}, f.read()
+    return {"audio": "text"}, str(audio).encode("utf-8")
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class _RecordedSource(AudioSource):
+    def __init__(self, inner, recorder):
+        self.inner, self.recorder = inner, recorder
+        # Partials reported by the inner source reach whoever listens on either one
+        self.on_partial, inner.on_partial = inner.on_partial, self.partial
+
+    def listen(self):
+        started = time.perf_counter()
+        self.recorder.append({"type": "listening", "at": started})
+        audio = self.inner.listen()
+        meta, blob = _audio_record(audio)
+        self.recorder.append(dict(meta, type="listen", started=started, at=time.perf_counter()), blob)
+        return audio
+
+
+class _RecordedSTT(SpeechToText):
+    def __init__(self, inner, recorder):
+        self.inner, self.recorder = inner, recorder
+
+    def transcribe(self, audio):
+        started = time.perf_counter()
+        text = self.inner.transcribe(audio)
+        self.recorder.append({"type": "transcript", "text": text, "started": started, "at": time.perf_counter()})
+        return text
+
+
+class _RecordedLLM(LanguageModel):
+    def __init__(self, inner, recorder):
+        self.inner, self.recorder = inner, recorder
+        self.requests = itertools.count()
+
+    def fast_path(self, text):
+        started = time.perf_counter()
+        hit = self.inner.fast_path(text)
+        if hit:
+            path = getattr(hit, "audio_path", None)
+            self.recorder.append({"type": "fast_path", "response": hit.response, "has_audio": bool(path),
+                                  "started": started, "at": time.perf_counter()},
+                                 _read_file(path) if path else b"")
+        return hit
+
+    def stream(self, text):
+        # Speculative streams (see speculation.py) may overlap the spoken one
+        request = next(self.requests)
+        self.recorder.append({"type": "request", "id": request, "text": text, "at": time.perf_counter()})
+        for chunk in self.inner.stream(text):
+            self.recorder.append({"type": "chunk", "id": request, "text": chunk, "at": time.perf_counter()})
+            yield chunk
+
+    def discard(self):
+        discard = getattr(self.inner, "discard", None)
+        if discard:
+            discard()
+            self.recorder.append({"type": "discard", "at": time.perf_counter()})
+
+
+class _RecordedTTS(TextToSpeech):
+    def __init__(self, inner, recorder):
+        self.inner, self.recorder = inner, recorder
+
+    def synthesize(self, text):
+        started = time.perf_counter()
+        clip = self.inner.synthesize(text)
+        self.recorder.append({"type": "clip", "text": text, "started": started, "at": time.perf_counter()},
+                             _read_file(clip.path))
+        return clip
+
+
+class _RecordedSink(AudioSink):
+    def __init__(self, inner, recorder):
+        self.inner, self.recorder = inner, recorder
+
+    def play(self, clip):
+        started = time.perf_counter()
+        self.inner.play(clip)
+        self.recorder.append({"type": "play", "text": clip.text, "started": started, "at": time.perf_counter()})
+
+    def wait(self):
+        self.inner.wait()
+
+
+class SessionRecorder:
+    """Records every stage of a ConversationEngine into a session file.
+
+    `attach(engine)` wraps the engine's stages, so it works with any
+    deployment; the wrapped stages keep their gate and accountant.
+    """
+
+    def __init__(self, path):
+        self.writer = SessionWriter(path)
+
+    def append(self, meta, blob=b""):
+        self.writer.append(meta, blob)
+
+    def attach(self, engine):
+        self.append({"type": "session", "recorded": time.time(), "split_sentences": engine.split_sentences,
+                     "queue_size": engine.queue_size, "speaker": engine.speaker})
+        engine.source = _RecordedSource(engine.source, self)
+        engine.stt = _RecordedSTT(engine.stt, self)
+        engine.llm = _RecordedLLM(engine.llm, self)
+        engine.tts = _RecordedTTS(engine.tts, self)
+        engine.sink = _RecordedSink(engine.sink, self)
+        engine.observers.append(self.observe)
+        return engine
+
+    def observe(self, turn):
+        self.append({"type": "turn", "started": turn.started, "timings": turn.timings,
+                     "response_text": turn.response_text, "from_fast_path": turn.from_fast_path})
+
+    def close(self):
+        self.writer.close()
+
+
+class ReplayedTurn:
+    """One recorded turn, with record times made relative to the turn's start."""
+
+    def __init__(self, records):
+        self.records = records
+        listen, _ = self.first("listen")
+        self.start = listen["started"]
+        self.result = next((m for m, _ in records if m["type"] == "turn"), None)
+
+    def first(self, kind):
+        return next(((m, b) for m, b in self.records if m["type"] == kind), (None, None))
+
+    def all(self, kind):
+        return [(m, b) for m, b in self.records if m["type"] == kind]
+
+    def spoken_request(self):
+        """The last LLM request of the turn that wasn't discarded (each discard drops the latest)."""
+        kept = []
+        for meta, _ in self.records:
+            if meta["type"] == "request":
+                kept.append(meta)
+            elif meta["type"] == "discard" and kept:
+                kept.pop()
+        return kept[-1] if kept else None
+
+
+class ReplaySession:
+    """Shared cursor for the replay stages: which turn is being replayed and how fast."""
+
+    def __init__(self, turns, realtime=True, directory=None):
+        self.turns = [ReplayedTurn(t) for t in turns]
+        self.realtime = realtime
+        self.directory = directory or tempfile.mkdtemp(prefix="replay_")
+        self.index = -1
+        self._pending = {}
+        self._files = itertools.count()
+
+    @property
+    def turn(self):
+        return self.turns[self.index]
+
+    def advance(self):
+        self.index += 1
+        self._pending = {}
+        return self.index < len(self.turns)
+
+    def next(self, kind):
+        """The turn's next record of `kind` (clips and playbacks are consumed in order)."""
+        if kind not in self._pending:
+            self._pending[kind] = iter(self.turn.all(kind))
+        return next(self._pending[kind], (None, None))
+
+    def wait(self, seconds):
+        if self.realtime and seconds > 0:
+            time.sleep(seconds)
+
+    def write_file(self, blob, suffix):
+        path = os.path.join(self.directory, f"{next(self._files)}_{suffix}")
+        with open(path, "wb") as f:
+            f.write(blob)
+        return path
+
+
+class ReplaySource(AudioSource):
+    def __init__(self, session):
+        self.session = session
+
+    def listen(self):
+        session = self.session
+        if not session.advance():
+            raise EndOfConversation()
+        meta, blob = session.turn.first("listen")
+        session.wait(meta["at"] - meta["started"])
+        if meta["audio"] == "none":
+            return None
+        if meta["audio"] == "pcm":
+            try:
+                import speech_recognition as sr
+                return sr.AudioData(bytes(blob), meta["rate"], meta["width"])
+            except ImportError:
+                return bytes(blob)
+        if meta["audio"] == "file":
+            return session.write_file(blob, meta["name"])
+        return bytes(blob).decode("utf-8")
+
+
+class ReplaySTT(SpeechToText):
+    def __init__(self, session):
+        self.session = session
+
+    def transcribe(self, audio):
+        meta, _ = self.session.turn.first("transcript")
+        self.session.wait(meta["at"] - meta["started"])
+        return meta["text"]
+
+
+class _ReplayHit:
+    def __init__(self, response, audio_path):
+        self.response = response
+        self.audio_path = audio_path
+
+
+class ReplayLLM(LanguageModel):
+    def __init__(self, session):
+        self.session = session
+
+    def fast_path(self, text):
+        meta, blob = self.session.turn.first("fast_path")
+        if meta is None:
+            return None
+        self.session.wait(meta["at"] - meta["started"])
+        path = self.session.write_file(blob, "faq.mp3") if meta["has_audio"] else None
+        return _ReplayHit(meta["response"], path)
+
+    def stream(self, text):
+        turn = self.session.turn
+        request = turn.spoken_request()
+        start = time.perf_counter()
+        for meta, _ in turn.all("chunk"):
+            if meta.get("id") != request.get("id"):
+                continue
+            # Same arrival times relative to the request as in the recording
+            self.session.wait(meta["at"] - request["at"] - (time.perf_counter() - start))
+            yield meta["text"]
+
+
+class ReplayTTS(TextToSpeech):
+    def __init__(self, session):
+        self.session = session
+
+    def synthesize(self, text):
+        meta, blob = self.session.next("clip")
+        if meta is None:
+            raise RuntimeError(f"no recorded clip for {text!r}")
+        self.session.wait(meta["at"] - meta["started"])
+        return Clip(self.session.write_file(blob, "clip.mp3"), text)
+
+
+class ReplaySink(AudioSink):
+    """Takes as long as the recorded playback did (or no time at all when fast)."""
+
+    def __init__(self, session):
+        self.session = session
+        self.played = []
+
+    def play(self, clip):
+        meta, _ = self.session.next("play")
+        if meta:
+            self.session.wait(meta["at"] - meta["started"])
+        self.played.append(clip.text)
+        if clip.temporary:
+            os.remove(clip.path)
+
+
+def replay(path, realtime=True, engine_factory=None):
+    """Replays a recorded session; returns one comparison record per turn.
+
+    `engine_factory(source, stt, llm, tts, sink, header)` may build the engine
+    under test; by default it is a ConversationEngine with the recorded settings.
+    """
+    reader = SessionReader(path)
+    header, turns = reader.turns()
+    header = header or {}
+    session = ReplaySession(turns, realtime)
+    stages = (ReplaySource(session), ReplaySTT(session), ReplayLLM(session), ReplayTTS(session),
+              ReplaySink(session))
+    if engine_factory:
+        engine = engine_factory(*stages, header)
+    else:
+        engine = ConversationEngine(*stages, split_sentences=header.get("split_sentences", True),
+                                    queue_size=header.get("queue_size", 4), speaker=header.get("speaker", "Asterix"))
+
+    results = []
+
+    def compare(turn):
+        recorded = session.turn.result or {}
+        timings = recorded.get("timings", {})
+        before = timings.get("first_audio", 0) - timings.get("transcribed", 0) if "first_audio" in timings else None
+        results.append({
+            "turn": session.index + 1,
+            "user_text": turn.user_text,
+            "matches": turn.response_text == recorded.get("response_text"),
+            "recorded_ttfa": before,
+            "replayed_ttfa": turn.time_to_first_audio(),
+            "recorded_seconds": timings.get("done"),
+            "replayed_seconds": turn.timings.get("done"),
+        })
+
+    engine.observers.append(compare)
+    try:
+        engine.run()
+    finally:
+        shutil.rmtree(session.directory, ignore_errors=True)
+        session.turns = session._pending = turns = None  # release the views into the mapped file
+        reader.close()
+    return results
+
+
+def format_report(results):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    lines = [f"{'turn':>4}  {'recorded TTFA':>13}  {'replayed TTFA':>13}  {'turn ms':>15}  same reply"]
+    for r in results:
+        lines.append(f"{r['turn']:>4}  {ms(r['recorded_ttfa']):>13}  {ms(r['replayed_ttfa']):>13}  "
+                     f"{ms(r['recorded_seconds']):>7}/{ms(r['replayed_seconds']):<7}  {'yes' if r['matches'] else 'NO'}")
+    return "\n".join(lines)
+
+
+def main(path, fast=False, report_path=None):
+    results = replay(path, realtime=not fast)
+    print(format_report(results))
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Replay report written to {report_path}")
+    return results
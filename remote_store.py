@@ -0,0 +1,143 @@
+import contextlib
+import hashlib
+import json
+import os
+import posixpath
+import time
+
+# Content-addressed clip store in the robot's sounds directory. Clips are
+# named after a hash of their bytes, so a clip being played is never
+# overwritten by the next upload, and a clip the robot already has (FAQ
+# answers, the greeting, repeated replies) is never uploaded again. Uploads go
+# to a ".part" name and are renamed once complete, so a clip name never holds
+# a truncated file. A local manifest records what is on the robot; it is
+# checked against the remote directory on connect, since the robot may have
+# been reset or cleaned.
+
+
+class RemoteAudioStore:
+    """Uploads clips to the robot under content-hash names.
+
+    `audio` is an AudioHandler (its SSH connection and sounds directory are
+    used). Only files named `prefix*` are ever touched. After each upload,
+    clips unused for `max_age` seconds are removed, then the least recently
+    used ones until the store is under `max_bytes`; the `keep` most recently
+    used clips always stay, so clips queued for playback survive.
+    """
+
+    def __init__(self, audio, manifest_path, prefix="px_", max_bytes=50 * 1024 * 1024,
+                 max_age=7 * 24 * 3600, keep=8, clock=time.time):
+        self.audio = audio
+        self.manifest_path = manifest_path
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self.clock = clock
+        self.stats = {"uploads": 0, "skipped": 0, "bytes_up": 0, "removed": 0}
+        self.clips = self._load()  # name -> {"size", "used"}
+
+    def _load(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.clips, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    @contextlib.contextmanager
+    def _sftp(self):
+        if not self.audio.connect_ssh():
+            raise ConnectionError(f"cannot reach {self.audio.robot_ip}")
+        try:
+            sftp = self.audio.open_sftp()
+            try:
+                yield sftp
+            finally:
+                sftp.close()
+        finally:
+            self.audio.ssh.close()
+
+    def _remote(self, name):
+        return posixpath.join(self.audio.robot_sounds_path, name)
+
+    def name_for(self, path):
+        """The store name of a local clip: prefix + SHA-1 of its bytes."""
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+        return f"{self.prefix}{digest.hexdigest()[:16]}{os.path.splitext(path)[1] or '.mp3'}"
+
+    def put(self, path):
+        """Makes sure the clip at `path` is on the robot. Returns (name, uploaded)."""
+        name = self.name_for(path)
+        if name in self.clips:
+            self.clips[name]["used"] = self.clock()
+            self.stats["skipped"] += 1
+            self._save()
+            return name, False
+
+        size = os.path.getsize(path)
+        with self._sftp() as sftp:
+            part = self._remote(name) + ".part"
+            sftp.put(path, part)
+            sftp.posix_rename(part, self._remote(name))
+            self.clips[name] = {"size": size, "used": self.clock()}
+            self.stats["uploads"] += 1
+            self.stats["bytes_up"] += size
+            self._collect(sftp)
+        self._save()
+        return name, True
+
+    def reconcile(self):
+        """Syncs the manifest with the robot: forgets clips that are gone and
+        removes partial uploads and clips it cannot vouch for."""
+        with self._sftp() as sftp:
+            remote = {a.filename: a for a in sftp.listdir_attr(self.audio.robot_sounds_path)
+                      if a.filename.startswith(self.prefix)}
+            known = {}
+            for name, attrs in remote.items():
+                entry = self.clips.get(name)
+                if not entry or entry["size"] != attrs.st_size:
+                    # An interrupted upload, or a clip we never recorded: its name
+                    # says nothing about its bytes, so it is uploaded again if needed
+                    sftp.remove(self._remote(name))
+                    self.stats["removed"] += 1
+                    continue
+                known[name] = entry
+            forgotten = len(self.clips.keys() - known.keys())
+            self.clips = known
+            self._collect(sftp)
+        self._save()
+        print(f"Robot clip store: {len(self.clips)} clips, {self.total_bytes() // 1024} KB"
+              + (f" ({forgotten} no longer on the robot)" if forgotten else ""))
+        return self
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.clips.values())
+
+    def _collect(self, sftp):
+        """Removes expired clips, then least recently used ones over the size budget."""
+        by_use = sorted(self.clips, key=lambda name: self.clips[name]["used"])
+        protected = set(by_use[-self.keep:]) if self.keep else set()
+        now, total = self.clock(), self.total_bytes()
+        for name in by_use:
+            if name in protected:
+                continue
+            if now - self.clips[name]["used"] <= self.max_age and total <= self.max_bytes:
+                continue
+            try:
+                sftp.remove(self._remote(name))
+            except IOError:
+                pass  # already gone
+            total -= self.clips.pop(name)["size"]
+            self.stats["removed"] += 1
@@ -0,0 +1,232 @@
+import queue
+import random
+import threading
+import time
+
+# Deadlines, retries, circuit breakers and hedged requests for the robot (HTTP),
+# SFTP and Gemini calls. Prefer a library's own timeout (requests `timeout=`,
+# paramiko `timeout=`, Gemini `request_options`) where it has one; the helpers
+# here cover blocking calls that have none.
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def run_with_deadline(fn, timeout, *args, **kwargs):
+    """Runs a blocking call in a daemon thread and gives up after `timeout` seconds.
+
+    The call itself can't be killed; it is abandoned and its result discarded.
+    """
+    result = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            result["value"] = fn(*args, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    if not done.wait(timeout):
+        raise DeadlineExceeded(f"{getattr(fn, '__name__', 'call')} exceeded its {timeout:.1f}s deadline")
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def iterate_with_deadline(iterable, first_timeout, idle_timeout=None):
+    """Yields from a blocking iterator, raising DeadlineExceeded if it stalls.
+
+    `first_timeout` bounds the wait for the first item, `idle_timeout` the gap
+    between later items (defaults to `first_timeout`).
+    """
+    items = queue.Queue()
+    end = object()
+
+    def pump():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except BaseException as e:
+            items.put((None, e))
+        items.put((end, None))
+
+    threading.Thread(target=pump, daemon=True).start()
+    timeout = first_timeout
+    while True:
+        try:
+            item, error = items.get(timeout=timeout)
+        except queue.Empty:
+            raise DeadlineExceeded(f"stream stalled for more than {timeout:.1f}s")
+        if error is not None:
+            raise error
+        if item is end:
+            return
+        yield item
+        timeout = idle_timeout or first_timeout
+
+
+def backoff_delays(attempts, base_delay=0.2, max_delay=2.0, rng=random):
+    """Full-jitter exponential backoff: one delay before each retry."""
+    for attempt in range(attempts - 1):
+        yield rng.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry(fn, attempts=3, base_delay=0.2, max_delay=2.0, retry_on=(Exception,), sleep=time.sleep):
+    """Calls `fn()` up to `attempts` times, re-raising the last error."""
+    delays = backoff_delays(attempts, base_delay, max_delay)
+    while True:
+        try:
+            return fn()
+        except retry_on:
+            delay = next(delays, None)
+            if delay is None:
+                raise
+            sleep(delay)
+
+
+def hedged(fn, hedge_after, copies=2, timeout=None):
+    """Starts another copy of an idempotent call if the first hasn't answered in
+    `hedge_after` seconds, and returns whichever succeeds first.
+    """
+    results = queue.Queue()
+
+    def attempt():
+        try:
+            results.put((True, fn()))
+        except Exception as e:
+            results.put((False, e))
+
+    deadline = time.monotonic() + timeout if timeout else None
+    started, failed, last_error = 0, 0, None
+    while True:
+        if started < copies:
+            threading.Thread(target=attempt, daemon=True).start()
+            started += 1
+        wait = hedge_after if started < copies else None
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0)
+            wait = remaining if wait is None else min(wait, remaining)
+        try:
+            ok, value = results.get(timeout=wait)
+        except queue.Empty:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded(f"no hedged copy answered within {timeout:.1f}s")
+            continue
+        if ok:
+            return value
+        failed, last_error = failed + 1, value
+        if failed == copies:
+            raise last_error
+
+
+class CircuitBreaker:
+    """Fails fast while a backend is down.
+
+    Opens after `failure_threshold` consecutive failures; after `reset_timeout`
+    seconds one trial call is let through (half-open) and its outcome decides
+    whether the circuit closes again.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"Circuit '{self.name}' closed again.")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Circuit '{self.name}' opened after {self.failures} failures.")
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+_NO_FALLBACK = object()
+
+
+class Policy:
+    """Deadline + bounded retries + circuit breaker (+ optional hedging) for one operation."""
+
+    def __init__(self, name, timeout=None, attempts=1, base_delay=0.2, max_delay=2.0,
+                 breaker=None, hedge_after=None, retry_on=(Exception,), sleep=time.sleep):
+        self.name = name
+        self.timeout = timeout
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        # Only for idempotent reads: a second copy is sent if the first is slow
+        self.hedge_after = hedge_after
+        self.retry_on = retry_on
+        self.sleep = sleep
+
+    def call(self, fn, *args, fallback=_NO_FALLBACK, **kwargs):
+        """Runs `fn(*args, **kwargs)` under the policy.
+
+        Returns `fallback` instead of raising when one is given.
+        """
+        if self.breaker and not self.breaker.allow():
+            if fallback is not _NO_FALLBACK:
+                return fallback
+            raise CircuitOpenError(f"{self.name}: circuit '{self.breaker.name}' is open")
+
+        def once():
+            if self.hedge_after is not None:
+                return hedged(lambda: fn(*args, **kwargs), self.hedge_after, timeout=self.timeout)
+            if self.timeout is not None:
+                return run_with_deadline(fn, self.timeout, *args, **kwargs)
+            return fn(*args, **kwargs)
+
+        try:
+            result = retry(once, self.attempts, self.base_delay, self.max_delay, self.retry_on, self.sleep)
+        except Exception as e:
+            # Only errors worth retrying say the remote end is unhealthy; a bad
+            # password or path fails fast without tripping the breaker
+            if self.breaker and isinstance(e, self.retry_on):
+                self.breaker.record_failure()
+            if fallback is not _NO_FALLBACK:
+                return fallback
+            raise
+        if self.breaker:
+            self.breaker.record_success()
+        return result
@@ -0,0 +1,266 @@
+import difflib
+import os
+import re
+import threading
+import time
+
+from accounting import estimate_tokens
+from conversation_engine import LanguageModel, TextToSpeech
+from persona import SentenceSplitter, clean_text_for_speech
+
+# Speculative replies. An incremental STT reports partial transcripts through
+# `AudioSource.partial()` while the visitor is still speaking; a partial that
+# differs from what we are already answering starts a provisional LLM stream
+# (and, optionally, renders its first sentence). When the final transcript is
+# close enough to the speculated one the reply is committed and starts playing
+# at once; otherwise it is cancelled, dropped from the chat, and regenerated.
+#
+# This is only the consumer side. The STT stages shipped with the bot
+# transcribe whole recordings and never call `partial()`, so no deployment
+# attaches a Speculator yet; test_speculation drives it with fake partials.
+
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def words(text):
+    return WORD.findall((text or "").lower())
+
+
+def similarity(a, b):
+    """Similarity (0-1) of two word lists, so case and punctuation don't matter."""
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class _Speculation:
+    """One provisional reply, streamed into a buffer on a background thread.
+
+    `before` runs on that thread first (cleaning up the speculation this one
+    replaces), so the listening thread never waits for a chat to let go.
+    """
+
+    def __init__(self, llm, text, tts=None, before=None):
+        self.llm = llm
+        self.text = text
+        self.words = words(text)
+        self.tts = tts
+        self.before = before
+        self.started = time.perf_counter()
+        self.chunks = []
+        self.prepared = None  # (sentence, Clip) rendered ahead of time
+        self.done = False
+        self.error = None
+        self._stopped = threading.Event()
+        self._condition = threading.Condition()
+        self._tts_thread = None
+        self._thread = threading.Thread(target=self._run, name="speculation", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            if self.before:
+                self.before()
+            if not self._stopped.is_set():
+                self._stream()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+    def _stream(self):
+        splitter = SentenceSplitter() if self.tts else None
+        stream = self.llm.stream(self.text)
+        try:
+            for chunk in stream:
+                with self._condition:
+                    self.chunks.append(chunk)
+                    self._condition.notify_all()
+                if self._stopped.is_set():
+                    break
+                if splitter and not self._tts_thread:
+                    sentences = [s for s in map(clean_text_for_speech, splitter.feed(chunk)) if s]
+                    if sentences:
+                        self._tts_thread = threading.Thread(target=self._prepare, args=(sentences[0],),
+                                                            name="speculation-tts", daemon=True)
+                        self._tts_thread.start()
+        finally:
+            stream.close()
+
+    def _prepare(self, sentence):
+        try:
+            self.prepared = (sentence, self.tts.synthesize(sentence))
+        except Exception as e:
+            print(f"Speculative TTS failed: {e}")
+
+    def replay(self):
+        """Yields the buffered chunks, then the rest as they arrive."""
+        i = 0
+        while True:
+            with self._condition:
+                while i == len(self.chunks) and not self.done:
+                    self._condition.wait()
+                if i == len(self.chunks):
+                    break
+                chunk = self.chunks[i]
+            i += 1
+            yield chunk
+        if self.error:
+            raise self.error
+
+    def stop(self):
+        """Asks the stream to stop after its current chunk; doesn't wait."""
+        self._stopped.set()
+
+    def cancel(self):
+        """Stops the stream and waits until it has let go of the chat."""
+        self.stop()
+        self._thread.join()
+        if self._tts_thread:
+            self._tts_thread.join()
+
+    def take_clip(self, sentence):
+        """The prepared clip if it is for `sentence` (it is handed out once)."""
+        if self._tts_thread:
+            self._tts_thread.join()
+        if self.prepared and self.prepared[0] == sentence:
+            clip, self.prepared = self.prepared[1], None
+            return clip
+        return None
+
+
+class _PreparedTTS(TextToSpeech):
+    """Hands out the clip the committed speculation already rendered, if it matches."""
+
+    def __init__(self, inner, speculator):
+        self.inner = inner
+        self.speculator = speculator
+
+    def synthesize(self, text):
+        return self.speculator.take_clip(text) or self.inner.synthesize(text)
+
+
+class Speculator(LanguageModel):
+    """Wraps an engine's LLM to start answering from partial transcripts.
+
+    A partial of at least `min_words` words starts a speculation unless one is
+    already running for a transcript at least `threshold` similar; the final
+    transcript commits it by the same test. A miss waits for the speculative
+    stream's current chunk before regenerating, as both use the same chat; the
+    wrapped LLM's `discard()`, if it has one, then drops the cancelled
+    exchange from the history (stages.GeminiLLM does). With `prepare_tts`,
+    the first sentence of a speculation is rendered too (sentence mode only).
+    It does nothing unless the engine's source reports partials.
+    """
+
+    def __init__(self, threshold=0.9, min_words=3, prepare_tts=False):
+        self.threshold = threshold
+        self.min_words = min_words
+        self.prepare_tts = prepare_tts
+        self.llm = None
+        self.tts = None
+        self.current = None    # speculation for the turn being heard
+        self.committed = None  # speculation being spoken
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "wasted_tokens": 0, "wasted_clips": 0,
+                      "head_start_seconds": 0.0}
+
+    def attach(self, engine):
+        """Wraps `engine`'s LLM (and TTS, with `prepare_tts`) and listens to its source's partials."""
+        self.llm = engine.llm
+        self.accountant = engine.accountant
+        if self.prepare_tts and engine.split_sentences:
+            self.tts = engine.tts
+            engine.tts = _PreparedTTS(engine.tts, self)
+        engine.llm = self
+        engine.source.on_partial = self.on_partial
+        engine.observers.append(self._settle)
+        return engine
+
+    def on_partial(self, text):
+        """Called by the source with each partial transcript, on its own thread."""
+        heard = words(text)
+        if len(heard) < self.min_words:
+            return
+        with self._lock:
+            previous = self.current
+            if previous and similarity(previous.words, heard) >= self.threshold:
+                return  # still answering the same question
+            if previous:
+                previous.stop()
+            self.current = _Speculation(self.llm, text, self.tts, before=lambda: self._waste(previous))
+            self.stats["started"] += 1
+
+    def _waste(self, speculation):
+        if speculation is None:
+            return
+        speculation.cancel()
+        tokens = estimate_tokens("".join(speculation.chunks))
+        self.stats["wasted_tokens"] += tokens
+        self.account("speculative_tokens_wasted", tokens)
+        discard = getattr(self.llm, "discard", None)
+        if discard and speculation.chunks:
+            discard()
+        if speculation.prepared:
+            self.stats["wasted_clips"] += 1
+            _delete(speculation.prepared[1])
+
+    def _cancel_current(self):
+        with self._lock:
+            if self.current:
+                self.stats["misses"] += 1
+            self._waste(self.current)
+            self.current = None
+
+    def fast_path(self, text):
+        hit = self.llm.fast_path(text)
+        if hit:
+            self._cancel_current()  # answered locally; the speculative reply isn't needed
+        return hit
+
+    def stream(self, text):
+        with self._lock:
+            speculation = self.current
+            hit = speculation is not None and similarity(speculation.words, words(text)) >= self.threshold
+            if hit:
+                self.current = None
+                self.stats["hits"] += 1
+                self.stats["head_start_seconds"] += time.perf_counter() - speculation.started
+        if not hit:
+            self._cancel_current()
+            yield from self.llm.stream(text)
+            return
+        self.committed = speculation
+        yield from speculation.replay()
+
+    def take_clip(self, sentence):
+        return self.committed.take_clip(sentence) if self.committed else None
+
+    def _settle(self, turn):
+        """Turn observer: nothing speculative outlives its turn (e.g. an unclear final transcript)."""
+        self._cancel_current()
+        if self.committed and self.committed.prepared:
+            self.stats["wasted_clips"] += 1  # the reply was split differently after all
+            _delete(self.committed.prepared[1])
+        self.committed = None
+
+    def hit_rate(self):
+        decided = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / decided if decided else None
+
+    def report(self):
+        s, rate = self.stats, self.hit_rate()
+        return (f"Speculation: {s['hits']} hits, {s['misses']} misses"
+                + (f" ({rate:.0%} hit rate)" if rate is not None else "")
+                + f", {s['started']} streams started, {s['wasted_tokens']} tokens and "
+                f"{s['wasted_clips']} clips wasted")
+
+
+def _delete(clip):
+    if clip.temporary:
+        try:
+            os.remove(clip.path)
+        except OSError:
+            pass
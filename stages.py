@@ -0,0 +1,371 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from accounting import estimate_tokens
+from conversation_engine import (AudioSink, AudioSource, Clip, EndOfConversation, LanguageModel,
+                                 RobotEffects, SpeechToText, TextToSpeech)
+from persona import VOICE
+
+# Concrete stages for ConversationEngine. Backend libraries are imported when a
+# stage is constructed, so a deployment only loads what it actually uses.
+
+
+class MicrophoneSource(AudioSource):
+    """Local microphone via speech_recognition, captured continuously.
+
+    The device is opened once and read by a capture thread (see capture.py),
+    so speech that starts while we are still thinking isn't lost. With a
+    `suppressor` (echo_control.EchoSuppressor) and a gate whose sink provides
+    its output signal, our own voice is subtracted from the capture, so the
+    mic may open while the reply is still finishing.
+    """
+
+    def __init__(self, recognizer=None, suppressor=None, tracker=None, capture=None):
+        import speech_recognition as sr
+        from capture import MicCapture, MicDevice
+
+        self.sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+        if capture is None:
+            device = MicDevice(sr.Microphone())
+            capture = MicCapture(device, rate=device.rate, chunk=device.chunk,
+                                 tracker=tracker, suppressor=suppressor)
+        self.capture = capture.start()
+
+    @property
+    def gate(self):
+        return self.capture.gate
+
+    @gate.setter
+    def gate(self, gate):
+        self.capture.gate = gate
+
+    def listen(self):
+        print("Listening... (Speak now)")
+        utterance = self.capture.next_utterance()
+        if utterance is None:
+            raise EndOfConversation("Microphone capture stopped.")
+        # A view into the capture buffer, not a copy
+        return self.sr.AudioData(utterance.frame_data, utterance.rate, 2)
+
+
+class GoogleSTT(SpeechToText):
+    """Google Web Speech API via speech_recognition."""
+
+    def __init__(self, recognizer=None):
+        import speech_recognition as sr
+
+        self.sr = sr
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def transcribe(self, audio):
+        print("Transcribing...")
+        self.account("stt_bytes_up", len(audio.frame_data))
+        try:
+            return self.recognizer.recognize_google(audio)
+        except self.sr.UnknownValueError:
+            return None
+        except self.sr.RequestError as e:
+            print(f"Could not request results; {e}")
+            return None
+
+
+class RobotRecordingSource(AudioSource):
+    """Records on Elmo for a fixed time and downloads the file over SFTP."""
+
+    def __init__(self, robot, audio, seconds=5):
+        self.robot = robot
+        self.audio = audio
+        self.seconds = seconds
+
+    def listen(self):
+        print("Recording... (Speak now)")
+        self.robot.start_recording()
+        time.sleep(self.seconds)  # Record for 5 seconds (Adjustable)
+        self.robot.stop_recording()
+
+        print("Downloading audio...")
+        if not self.audio.download_recording():
+            print("Failed to download audio.")
+            self.robot.set_screen(text="Error: Audio Download")
+            return None
+        self.account("sftp_bytes_down", os.path.getsize(self.audio.local_recording_path))
+        return self.audio.local_recording_path
+
+
+class RecordingSTT(SpeechToText):
+    """Transcribes the recording downloaded by RobotRecordingSource."""
+
+    def __init__(self, audio):
+        self.audio = audio
+
+    def transcribe(self, audio):
+        print("Transcribing...")
+        self.account("stt_bytes_up", os.path.getsize(audio))
+        return self.audio.transcribe_audio()
+
+
+class GeminiLLM(LanguageModel):
+    """AsterixLLM with its FAQ fast path.
+
+    `llm` is an AsterixLLM, or a zero-argument function returning one (e.g. a
+    component still initializing in a StartupOrchestrator). `faq` (a
+    FAQMatcher or such a function) answers the fast path directly, so FAQ hits
+    don't wait for the LLM to finish initializing; those exchanges are added to
+    the chat history before the next Gemini request.
+
+    With `personas` (a persona.PersonaSwitch; `llm` is then a PersonaLLM),
+    "switch to Panoramix" and the like switch persona on the fast path and
+    are answered with the new persona's greeting.
+    """
+
+    def __init__(self, llm, streaming=True, faq=None, personas=None):
+        self.llm = llm
+        self.streaming = streaming
+        self.faq = faq
+        self.personas = personas
+        self.unsent_history = []
+
+    def _get_llm(self):
+        if not callable(self.llm):
+            return self.llm
+        try:
+            return self.llm()
+        except Exception as e:
+            raise EndOfConversation(f"Error initializing LLM: {e}")
+
+    def fast_path(self, text):
+        if self.personas:
+            persona = self.personas.command(text)
+            if persona:
+                from faq import FAQHit
+
+                return FAQHit(f"persona:{persona.key}", text, persona.greeting, 1.0)
+            if not self.personas.current.faq:
+                return None
+        if self.faq is None:
+            return self._get_llm().answer_from_faq(text)
+        faq = self.faq() if callable(self.faq) else self.faq
+        hit = faq.match(text)
+        if hit:
+            # Remember whose chat it belongs to, in case of a switch before it is sent
+            self.unsent_history.append((text, hit.response) + ((self.personas.active,) if self.personas else ()))
+        return hit
+
+    def stream(self, text):
+        llm = self._get_llm()
+        while self.unsent_history:
+            llm.add_to_history(*self.unsent_history.pop(0))
+        if self.accountant:
+            fp = llm.prompt_footprint(text)
+            chars = fp["system_chars"] + fp["context_bytes"] + fp["history_chars"] + fp["input_chars"]
+            self.account("prompt_tokens", estimate_tokens(chars))
+            self.account("history_messages", fp["history_messages"])
+            self.account("context_bytes", fp["context_bytes"])
+        if self.streaming:
+            yield from llm.get_streaming_response(text)
+        else:
+            yield llm.get_response(text)
+
+    def discard(self):
+        """Drops the last exchange from the chat (see speculation.py)."""
+        self._get_llm().discard()
+
+
+class EdgeTTS(TextToSpeech):
+    def __init__(self, voice=VOICE, directory=None, timeout=15.0):
+        self.voice = voice
+        self.directory = directory
+        self.timeout = timeout
+
+    def render(self, text, path, voice=None):
+        """Blocking render to a given file (also used to pre-synthesize FAQ clips)."""
+        import edge_tts
+
+        save = edge_tts.Communicate(text, voice or self.voice).save(path)
+        asyncio.run(asyncio.wait_for(save, self.timeout))
+
+    def synthesize(self, text):
+        # Unique file per sentence so playback of the previous one is never clobbered
+        fd, path = tempfile.mkstemp(prefix="temp_", suffix=".mp3", dir=self.directory)
+        os.close(fd)
+        self.render(text, path)
+        self.account("tts_bytes_down", os.path.getsize(path))
+        return Clip(path, text)
+
+
+def _discard(clip):
+    if clip.temporary:
+        try:
+            os.remove(clip.path)
+        except OSError:
+            pass
+
+
+class PygameSink(AudioSink):
+    """Plays clips locally with pygame.
+
+    `play()` returns once the clip has (almost) finished: with a gate that
+    allows overlap, `overlap` seconds before its end so the mic can open early.
+    The next clip still starts only after this one has ended.
+    """
+
+    def __init__(self):
+        import pygame  # imported here so loading this module doesn't init SDL
+
+        self.pygame = pygame
+        pygame.mixer.init()
+        self.channel = None
+        self._watcher = None
+
+    def _reference(self, sound):
+        """Mono float samples of what we are about to play, for echo suppression."""
+        import numpy as np
+
+        rate = self.pygame.mixer.get_init()[0]
+        samples = self.pygame.sndarray.array(sound).astype(np.float32) / 32768.0
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        return samples, rate
+
+    def _watch(self, channel):
+        while channel.get_busy():
+            time.sleep(0.01)
+        if self.gate:
+            self.gate.playback_finished()
+
+    def play(self, clip):
+        try:
+            sound = self.pygame.mixer.Sound(clip.path)
+        finally:
+            _discard(clip)  # Sound holds the decoded samples
+        self.wait()
+
+        length = sound.get_length()
+        if self.gate:
+            reference, rate = self._reference(sound)
+            self.gate.playback_started(reference, rate, length)
+        self.channel = sound.play()
+        self._watcher = threading.Thread(target=self._watch, args=(self.channel,), daemon=True)
+        self._watcher.start()
+
+        early = self.gate.overlap if self.gate and self.gate.has_reference else 0.0
+        self._watcher.join(max(length - early, 0))
+
+    def wait(self):
+        if self._watcher:
+            self._watcher.join()
+
+
+class SystemPlayerSink(AudioSink):
+    """Opens clips in the system's default player.
+
+    The player gives no end-of-playback signal, so the clip's length is taken
+    from the MP3 itself and the gate is told when it should have finished.
+    """
+
+    def play(self, clip):
+        from echo_control import mp3_duration
+
+        duration = mp3_duration(clip.path)
+        if os.name == 'nt':  # Windows
+            os.startfile(clip.path)
+            time.sleep(1)
+        else:
+            # Mac/Linux
+            os.system(f"open {clip.path}" if os.name == 'posix' else f"xdg-open {clip.path}")
+        if self.gate:
+            self.gate.playback_started(duration=duration)
+        time.sleep(duration)
+        if self.gate:
+            self.gate.playback_finished()
+
+
+class RobotSink(AudioSink):
+    """Uploads clips to Elmo over SFTP and plays them through its speaker.
+
+    With a `store` (remote_store.RemoteAudioStore) each clip gets its own
+    content-hash name and clips the robot already has are not uploaded again;
+    without one, every clip overwrites `filename`.
+    """
+
+    def __init__(self, robot, audio, filename="panoramix_response.mp3", store=None):
+        self.robot = robot
+        self.audio = audio
+        self.filename = filename
+        self.store = store
+
+    def upload(self, clip):
+        """Returns the name to play, or None if the upload failed."""
+        if self.store:
+            try:
+                name, uploaded = self.store.put(clip.path)
+            except Exception as e:
+                print(f"Failed to upload response: {e}")
+                return None
+            if uploaded:
+                self.account("sftp_bytes_up", os.path.getsize(clip.path))
+            return name
+        if self.audio.upload_response(self.filename, local_file=clip.path):
+            self.account("sftp_bytes_up", os.path.getsize(clip.path))
+            return self.filename
+        print("Failed to upload response.")
+        return None
+
+    def play(self, clip):
+        try:
+            print("Uploading response...")
+            name = self.upload(clip)
+            if name:
+                print("Playing response...")
+                self.robot.play_sound(name)
+        finally:
+            _discard(clip)
+
+
+class RobotScreenEffects(RobotEffects):
+    """Mirrors the conversation state on Elmo's screen.
+
+    Expressions tagged in a reply (see expressions.py) are spread over the
+    clip's playback: the emotion as an LED icon and screen image, the gesture
+    as pan/tilt moves.
+    """
+
+    def __init__(self, robot, scheduler=None):
+        from expressions import ExpressionScheduler
+
+        self.robot = robot
+        self.scheduler = scheduler or ExpressionScheduler()
+
+    def listening(self):
+        self.scheduler.clear()
+        self.robot.set_screen(text="Listening...")
+
+    def processing(self):
+        self.robot.set_screen(text="Processing...")
+
+    def heard(self, text):
+        self.robot.set_screen(text=f"You: {text[:20]}...")  # Show partial text
+
+    def not_understood(self):
+        self.robot.set_screen(text="I didn't hear you.")
+
+    def speaking(self, text):
+        self.robot.set_screen(text=text)
+
+    def express(self, clip):
+        from expressions import EMOTIONS, GESTURES, speech_seconds
+
+        duration = speech_seconds(clip)
+        for expression in clip.expressions:
+            start = expression.at * duration
+            if expression.emotion in EMOTIONS:
+                icon, image = EMOTIONS[expression.emotion]
+                self.scheduler.schedule(start, lambda icon=icon: self.robot.update_leds_icon(icon))
+                self.scheduler.schedule(start, lambda image=image: self.robot.set_screen(image=image))
+            for delay, axis, angle in GESTURES.get(expression.gesture, ()):
+                move = self.robot.set_pan if axis == "pan" else self.robot.set_tilt
+                self.scheduler.schedule(start + delay, lambda move=move, angle=angle: move(angle))
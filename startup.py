@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class StartupOrchestrator:
+    """Initializes components concurrently, respecting their dependencies.
+
+    Each component is a factory called with the results of the components it
+    depends on. Components start as soon as their dependencies are ready, so
+    slow ones (e.g. the transcript upload in AsterixLLM) run in the background
+    while the rest of the bot comes up.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.futures = {}
+        self.timings = {}
+        self.executor = None
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def add(self, name, factory, depends_on=(), on_ready=None):
+        """Registers a component. `on_ready(result)` runs as soon as it is built."""
+        for dep in depends_on:
+            if dep not in self.components:
+                raise ValueError(f"Unknown dependency '{dep}' for component '{name}'")
+        self.components[name] = (factory, tuple(depends_on), on_ready)
+        return self
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        # One worker per component: a component blocked on its dependencies
+        # must never starve the ones it is waiting for.
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.components), 1),
+                                           thread_name_prefix="startup")
+        for name in self.components:  # registration order is a valid topological order
+            self.futures[name] = self.executor.submit(self._build, name)
+        self.executor.shutdown(wait=False)
+        return self
+
+    def _build(self, name):
+        factory, depends_on, on_ready = self.components[name]
+        args = [self.futures[dep].result() for dep in depends_on]
+
+        start = time.perf_counter()
+        try:
+            result = factory(*args)
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.timings[name] = {
+                    "start": start - self.started_at,
+                    "ready": end - self.started_at,
+                    "duration": end - start,
+                }
+
+        if on_ready:
+            try:
+                on_ready(result)
+            except Exception as e:
+                print(f"Startup callback for '{name}' failed: {e}")
+        return result
+
+    def get(self, name, timeout=None):
+        """Blocks until a component is ready; re-raises its initialization error."""
+        return self.futures[name].result(timeout=timeout)
+
+    def ready(self, name):
+        future = self.futures.get(name)
+        return isinstance(future, Future) and future.done() and not future.exception()
+
+    def wait(self, timeout=None):
+        """Waits for every component and returns {name: result}."""
+        return {name: self.get(name, timeout=timeout) for name in self.components}
+
+    def report(self):
+        lines = ["Startup timings:"]
+        for name, t in sorted(self.timings.items(), key=lambda kv: kv[1]["ready"]):
+            lines.append(f"  {name:<12} start {t['start']:6.2f}s  ready {t['ready']:6.2f}s  ({t['duration']:.2f}s)")
+        return "\n".join(lines)
+
+
+def build_chat_startup(tts, startup=None, persona="asterix"):
+    """Adds the personas, the FAQ index, its pre-synthesized audio and the LLM to `startup`.
+
+    Shared by every ConversationEngine deployment; `tts` needs a blocking
+    `render(text, path, voice=None)` (e.g. stages.EdgeTTS). The LLM keeps a chat ready
+    for every persona, starting with `persona`; the "personas" switch is
+    available at once.
+    """
+    from faq import FAQMatcher
+    from llm_client import PersonaLLM
+    from persona import VOICE, PersonaSwitch, clean_text_for_speech
+
+    personas = PersonaSwitch(persona or "asterix")
+    startup = startup or StartupOrchestrator()
+    startup.add("personas", lambda: personas)
+    startup.add("faq", FAQMatcher)
+    # FAQ answers are Asterix's, whichever persona is active while they render
+    render = lambda text, path: tts.render(text, path, voice=VOICE)
+    startup.add("faq_audio", lambda faq: faq.presynthesize(render, clean=clean_text_for_speech),
+                depends_on=["faq"])
+    startup.add("llm", lambda faq: PersonaLLM(personas, faq=faq), depends_on=["faq"],
+                on_ready=lambda llm: print(startup.report()))
+    return startup
+
+
+def start_recording(engine, record_path=None):
+    """Records the session to `record_path` (see recorder.py); returns the recorder or None."""
+    if not record_path:
+        return None
+    from recorder import SessionRecorder
+
+    recorder = SessionRecorder(record_path)
+    recorder.attach(engine)
+    print(f"Recording session to {record_path}")
+    return recorder
+
+
+def finish_session(startup, accountant, report_path=None, recorder=None):
+    """Prints the session's payload accounting and FAQ metrics; optionally exports the report."""
+    if recorder:
+        recorder.close()
+        print(f"Session recorded to {recorder.writer.path}")
+    print(accountant.report())
+    if report_path:
+        print(f"Session report written to {accountant.export(report_path)}")
+    if startup.ready("faq"):
+        print(f"FAQ metrics: {startup.get('faq').metrics()}")
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+
+from accounting import SessionAccountant, estimate_tokens
+from conversation_engine import ConversationEngine
+from fakes import REPLIES, FakeLLM, FakeSink, FakeSource, FakeSTT, FakeTTS
+
+
+class GrowingHistoryLLM(FakeLLM):
+    """Reports a prompt that grows with every exchange, like AsterixLLM's chat."""
+
+    CONTEXT_BYTES = 40000
+
+    def __init__(self, replies):
+        super().__init__(replies, chunk_size=10)
+        self.history_chars = 0
+        self.history_messages = 2
+
+    def stream(self, text):
+        self.account("prompt_tokens", estimate_tokens(self.CONTEXT_BYTES + self.history_chars + len(text)))
+        self.account("history_messages", self.history_messages)
+        self.account("context_bytes", self.CONTEXT_BYTES)
+        yield from super().stream(text)
+        self.history_chars += len(text) + len(self.replies[text])
+        self.history_messages += 2
+
+
+class SizedTTS(FakeTTS):
+    def synthesize(self, text):
+        self.account("tts_bytes_down", 1000 * len(text))
+        return super().synthesize(text)
+
+
+class SizedSTT(FakeSTT):
+    def transcribe(self, audio):
+        self.account("stt_bytes_up", 32000)
+        return super().transcribe(audio)
+
+
+def run_session(utterances):
+    accountant = SessionAccountant("test")
+    engine = ConversationEngine(FakeSource(utterances), SizedSTT(), GrowingHistoryLLM(REPLIES),
+                                SizedTTS(), FakeSink(), accountant=accountant)
+    engine.run()
+    return accountant
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens(400) == 100
+
+
+def test_per_turn_records():
+    accountant = run_session(["hello", "tell me a story", "hello"])
+    first, second, third = accountant.turns
+
+    assert first["history_messages"] == 2 and third["history_messages"] == 6
+    assert first["context_bytes"] == GrowingHistoryLLM.CONTEXT_BYTES
+    assert first["prompt_tokens"] < second["prompt_tokens"] < third["prompt_tokens"]
+    assert first["response_tokens"] == estimate_tokens(REPLIES["hello"])
+    assert first["chunks"] == -(-len(REPLIES["hello"]) // 10)
+    assert first["stt_bytes_up"] == first["audio_bytes_up"] == 32000
+    assert first["audio_bytes_down"] == sum(1000 * len(s) for s in ["By Toutatis, a visitor!", "Welcome to the village.", "Have you met Obelix?"])
+    assert first["time_to_first_audio"] is not None
+
+
+def test_summary_and_export():
+    accountant = run_session(["hello", "", "tell me a story"])
+    summary = accountant.summary()
+
+    assert summary["turns"] == 3
+    assert summary["answered_turns"] == 2
+    assert summary["totals"]["stt_bytes_up"] == 3 * 32000
+    assert summary["prompt_token_growth"] == accountant.turns[2]["prompt_tokens"] - accountant.turns[0]["prompt_tokens"]
+    assert "Prompt grew by" in accountant.report()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = accountant.export(os.path.join(tmp, "session.json"))
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    assert len(data["turns"]) == 3
+    assert data["summary"]["session_id"] == "test"
@@ -0,0 +1,203 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from capture import MicCapture, RingBuffer
+from fakes import FakeClock
+
+RATE = 16000
+CHUNK = 1024
+
+
+class FakeDevice:
+    """Plays a prepared int16 signal chunk by chunk, like a mic that never blocks.
+
+    Advances `clock` by each chunk's duration, so capture timestamps follow
+    the signal rather than the wall clock.
+    """
+
+    def __init__(self, signal, clock=None):
+        self.signal = signal
+        self.pos = 0
+        self.clock = clock
+
+    def readinto(self, out):
+        n = min(len(out), len(self.signal) - self.pos)
+        out[:n] = self.signal[self.pos:self.pos + n]
+        self.pos += n
+        if self.clock:
+            self.clock.now += n / RATE
+        return n
+
+
+class BytesDevice:
+    """Returns a new bytes object per chunk, like PyAudio's stream.read()."""
+
+    def __init__(self, signal, clock=None):
+        self.device = FakeDevice(signal, clock)
+
+    def read(self, n):
+        out = np.zeros(n, dtype=np.int16)
+        return out[:self.device.readinto(out)].tobytes()
+
+
+def hall(seconds, utterances=(), noise_level=100, speech_level=3000, seed=0):
+    """Background noise with 'speech' (loud band noise) at (onset, duration) pairs."""
+    rng = np.random.default_rng(seed)
+    signal = rng.standard_normal(int(seconds * RATE)) * noise_level
+    for onset, duration in utterances:
+        a, b = int(onset * RATE), int((onset + duration) * RATE)
+        signal[a:b] += np.convolve(rng.standard_normal(b - a), np.ones(3) / 3, "same") * speech_level
+    return np.clip(signal, -32768, 32767).astype(np.int16)
+
+
+def drain(capture):
+    while capture.read_chunk():
+        pass
+    return [capture.utterances.get_nowait() for _ in range(capture.utterances.qsize())]
+
+
+def test_ring_buffer_views_are_contiguous_across_the_wrap():
+    ring = RingBuffer(10)
+    ring.write(np.arange(8, dtype=np.int16))
+    ring.write(np.arange(8, 14, dtype=np.int16))  # wraps
+    view = ring.view(6, 14)
+    assert list(view) == [6, 7, 8, 9, 10, 11, 12, 13]
+    assert np.shares_memory(view, ring.data)
+
+    with pytest.raises(IndexError):
+        ring.view(2, 6)  # overwritten
+    with pytest.raises(IndexError):
+        ring.view(10, 15)  # not captured yet
+
+
+def test_finds_utterances_with_pre_roll():
+    clock = FakeClock()
+    signal = hall(8, [(2.0, 1.5), (5.0, 1.0)])
+    capture = MicCapture(FakeDevice(signal, clock), rate=RATE, chunk=CHUNK, pre_roll=0.3, clock=clock)
+    utterances = drain(capture)
+
+    assert len(utterances) == 2
+    for utterance, (onset, duration) in zip(utterances, [(2.0, 1.5), (5.0, 1.0)]):
+        assert abs(utterance.onset / RATE - onset) < 0.1
+        assert abs(utterance.start / RATE - (onset - 0.3)) < 0.1  # pre-roll kept
+        assert abs(utterance.end / RATE - (onset + duration)) < 0.1
+        assert abs(utterance.end_time - (onset + duration)) < 0.1
+        assert np.shares_memory(utterance.samples, capture.buffer.data)
+
+
+def test_zero_copy_handoff_to_stt():
+    sr = pytest.importorskip("speech_recognition")
+    from stages import MicrophoneSource
+
+    capture = MicCapture(FakeDevice(hall(4, [(1.0, 1.0)])), rate=RATE, chunk=CHUNK)
+    source = MicrophoneSource(capture=capture)
+    audio = source.listen()
+
+    assert isinstance(audio, sr.AudioData)
+    assert np.shares_memory(np.frombuffer(audio.frame_data, dtype=np.int16), capture.buffer.data)
+    assert len(audio.get_wav_data()) > RATE  # speech_recognition accepts the view
+
+
+class ScheduledGate:
+    """Stands in for PlaybackGate: our voice plays during fixed intervals."""
+
+    def __init__(self, clock, playing):
+        self.clock = clock
+        self.playing = playing
+        self.references = []
+
+    def is_clear(self):
+        return not any(a <= self.clock() < b for a, b in self.playing)
+
+
+def test_ignores_our_own_voice_while_gated():
+    clock = FakeClock()
+    signal = hall(6, [(1.0, 2.0), (4.0, 1.0)])  # the first "utterance" is our reply
+    capture = MicCapture(FakeDevice(signal, clock), rate=RATE, chunk=CHUNK, clock=clock,
+                         gate=ScheduledGate(clock, [(0.9, 3.2)]))
+    utterances = drain(capture)
+    assert [round(u.onset / RATE) for u in utterances] == [4]
+
+
+def test_suppresses_echo_before_storing():
+    from echo_control import EchoSuppressor, PlaybackGate
+
+    clock = FakeClock()
+    rng = np.random.default_rng(3)
+    reply = (np.convolve(rng.standard_normal(4 * RATE), np.ones(4) / 4, "same") * 0.2).astype(np.float32)
+    echo = np.convolve(reply, [0, 0, 0.5, 0.2, 0.1])[:len(reply)]
+    signal = np.clip(echo * 32768, -32768, 32767).astype(np.int16)
+
+    gate = PlaybackGate(overlap=0.3, clock=clock)
+    gate.playback_started(reply, RATE, 4.0)
+    capture = MicCapture(FakeDevice(signal, clock), rate=RATE, chunk=CHUNK, gate=gate,
+                         suppressor=EchoSuppressor(block_size=CHUNK), clock=clock)
+    drain(capture)
+
+    stored = capture.buffer.view(3 * RATE, 4 * RATE).astype(np.float64)
+    raw = signal[3 * RATE:4 * RATE].astype(np.float64)
+    assert 10 * np.log10(np.mean(raw ** 2) / np.mean(stored ** 2)) > 15
+
+
+def bytes_allocated_per_chunk(step, chunks):
+    tracemalloc.start()
+    total = 0
+    for _ in range(chunks):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        step()
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / chunks
+
+
+def test_capture_benchmark():
+    """Allocation rate and missed onsets: ring buffer vs. reopening the mic each turn."""
+    chunks = 300
+    signal = hall(chunks * CHUNK / RATE + 1, [(3.0, 2.0), (9.0, 2.0)])
+
+    capture = MicCapture(FakeDevice(signal), rate=RATE, chunk=CHUNK)
+    ring_bytes = bytes_allocated_per_chunk(capture.read_chunk, chunks)
+
+    # What speech_recognition's listen() does: a new bytes object per chunk, kept in a list
+    device, frames = BytesDevice(signal), []
+    naive_bytes = bytes_allocated_per_chunk(lambda: frames.append(device.read(CHUNK)), chunks)
+
+    # Conversation: the visitor speaks 1.5 s; we think for 3 s, then reply for 3 s.
+    # Every third time they say something more while we are still thinking.
+    clock, schedule, playing, t = FakeClock(), [], [], 1.0
+    for i in range(15):
+        schedule.append((t, 1.5))
+        think_start = t + 1.5
+        if i % 3 == 2:
+            schedule.append((think_start + 1.0, 1.5))  # starts while we think
+        playing.append((think_start + 3.0, think_start + 6.0))
+        t = think_start + 6.5
+    signal = hall(t + 2, schedule, seed=5)
+
+    start = time.perf_counter()
+    capture = MicCapture(FakeDevice(signal, clock), rate=RATE, chunk=CHUNK, clock=clock,
+                         gate=ScheduledGate(clock, playing))
+    detected = [u.onset / RATE for u in drain(capture)]
+    process_seconds = time.perf_counter() - start
+    missed_ring = [o for o, _ in schedule if not any(abs(o - d) < 0.25 for d in detected)]
+
+    # Per-turn reopening: the mic is closed from the end of an utterance until
+    # playback ends plus ~0.1 s to reopen the device, so onsets in between are lost
+    closed = [(a - 3.0, b + 0.1) for a, b in playing]
+    missed_reopen = [o for o, _ in schedule if any(a <= o < b for a, b in closed)]
+
+    audio_seconds = len(signal) / RATE
+    print(f"\nallocated per chunk: ring {ring_bytes:.0f} B | per-chunk bytes {naive_bytes:.0f} B"
+          f"\nmissed onsets: ring {len(missed_ring)}/{len(schedule)} | reopen per turn "
+          f"{len(missed_reopen)}/{len(schedule)}"
+          f"\ncapture cost: {process_seconds / audio_seconds * 100:.2f}% of real time")
+
+    # No audio buffers are allocated per chunk, only a few small Python objects
+    assert ring_bytes < CHUNK * 2 / 4 and ring_bytes < naive_bytes / 4
+    assert missed_ring == []
+    assert len(missed_reopen) == 5
+    assert process_seconds < audio_seconds / 10
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+import panoramix
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Cold-start budget for `import panoramix` in a fresh interpreter (interpreter
+# startup excluded). The CLI only needs argparse; anything heavier is a regression.
+IMPORT_BUDGET_SECONDS = 0.25
+HEAVY_MODULES = [
+    "google.generativeai", "speech_recognition", "edge_tts", "pygame", "whisper",
+    "torch", "pyaudio", "websockets", "paramiko", "requests", "numpy",
+]
+
+
+def test_cli_cold_import_budget():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import panoramix\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed, loaded = out.stdout.splitlines()[-2:]
+
+    assert loaded == "", f"heavy modules imported eagerly: {loaded}"
+    assert float(elapsed) < IMPORT_BUDGET_SECONDS, f"import took {float(elapsed):.3f}s"
+
+
+def test_selected_backend_is_dispatched(monkeypatch):
+    calls = []
+    fake = types.ModuleType("fake_mode")
+    fake.main = lambda **kwargs: calls.append(kwargs)
+    monkeypatch.setitem(sys.modules, "fake_mode", fake)
+    monkeypatch.setitem(panoramix.MODES, "fake", ("fake_mode", "main", "test double"))
+
+    panoramix.main(["run", "--mode", "fake"])
+    assert calls == [{}]
+
+
+def test_robot_mode_passes_ip(monkeypatch):
+    calls = []
+    monkeypatch.setattr(panoramix, "load_mode", lambda mode, profiler=None: lambda **kw: calls.append(kw))
+
+    panoramix.main(["run", "--mode", "robot", "--robot-ip", "10.0.0.5", "--report", "r.json"])
+    assert calls == [{"robot_ip": "10.0.0.5", "report_path": "r.json", "record_path": None,
+                      "persona": None}]
+
+
+def test_replay_is_dispatched(monkeypatch):
+    calls = []
+    fake = types.ModuleType("recorder")
+    fake.main = lambda path, **kwargs: calls.append((path, kwargs))
+    monkeypatch.setitem(sys.modules, "recorder", fake)
+
+    panoramix.main(["replay", "session.pxr", "--fast"])
+    assert calls == [("session.pxr", {"fast": True, "report_path": None})]
+
+
+def test_loadtest_is_dispatched(monkeypatch):
+    calls = []
+    fake = types.ModuleType("loadgen")
+    fake.main = lambda levels, **kwargs: calls.append((levels, kwargs))
+    monkeypatch.setitem(sys.modules, "loadgen", fake)
+
+    panoramix.main(["loadtest", "--levels", "1,8", "--shared"])
+    assert calls == [([1, 8], {"turns": 3, "shared": True, "workers": None, "report_path": None})]
+
+
+def test_record_needs_an_engine_mode(capsys):
+    with pytest.raises(SystemExit):
+        panoramix.main(["run", "--mode", "live", "--record", "s.pxr"])
+    assert "--record is only available" in capsys.readouterr().err
+
+
+def test_robot_mode_ignores_cli_argv(monkeypatch, capsys):
+    bot = pytest.importorskip("panoramix_bot")
+    monkeypatch.delenv("ROBOT_IP", raising=False)
+    monkeypatch.setattr(sys, "argv", ["panoramix.py", "run", "--mode", "robot"])
+    monkeypatch.setattr(bot, "build_startup", lambda *a: pytest.fail("connected to 'run'"))
+
+    bot.main()
+    assert "ROBOT_IP not found" in capsys.readouterr().out
+
+
+def test_import_profiler_records_first_imports(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    profiler = panoramix.ImportProfiler()
+    with profiler:
+        import colorsys  # noqa: F401
+    assert [name for _, name, _ in profiler.records] == ["colorsys"]
+    assert "colorsys" in profiler.report()
+
+
+def test_import_profiler_includes_selected_backend(monkeypatch, tmp_path):
+    (tmp_path / "slow_mode.py").write_text("import colorsys\ndef main():\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    monkeypatch.delitem(sys.modules, "slow_mode", raising=False)
+    monkeypatch.setitem(panoramix.MODES, "slow", ("slow_mode", "main", "test double"))
+
+    profiler = panoramix.ImportProfiler()
+    panoramix.load_mode("slow", profiler)
+    assert [(depth, name) for depth, name, _ in profiler.records] == [(1, "colorsys"), (0, "slow_mode")]
+    assert "slow_mode" in profiler.report()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from conversation_engine import ConversationEngine
+from fakes import REPLIES, FakeLLM, FakeSink, FakeSource, FakeSTT, FakeTTS, RecordingEffects
+from faq import FAQHit
+
+
+def make_engine(utterances, **kwargs):
+    llm = kwargs.pop("llm", None) or FakeLLM(REPLIES)
+    return ConversationEngine(FakeSource(utterances), FakeSTT(), llm, FakeTTS(), FakeSink(),
+                              effects=RecordingEffects(), **kwargs)
+
+
+def test_streams_sentences_in_order_without_actions():
+    engine = make_engine(["hello"])
+    turns = []
+    engine.observers.append(turns.append)
+    engine.run()
+
+    assert [c.text for c in engine.sink.played] == [
+        "By Toutatis, a visitor!",
+        "Welcome to the village.",
+        "Have you met Obelix?",
+    ]
+    assert turns[0].response_text == REPLIES["hello"]
+    assert engine.sink.waits == 1
+    assert engine.effects.events[:2] == ["listening", "heard:hello"]
+
+
+def test_whole_reply_mode_makes_one_clip():
+    engine = make_engine(["tell me a story"], split_sentences=False)
+    engine.run()
+    assert [c.text for c in engine.sink.played] == [REPLIES["tell me a story"]]
+
+
+def test_unclear_audio_is_skipped():
+    engine = make_engine(["", "hello"])
+    engine.run()
+    assert "not_understood" in engine.effects.events
+    assert engine.llm.prompts == ["hello"]
+
+
+def test_fast_path_audio_skips_llm_and_tts():
+    faq = {"what is your name": FAQHit("name", "what is your name", "*bows* I am Asterix!", 1.0, "faq_name.mp3")}
+    llm = FakeLLM(REPLIES, faq=faq)
+    engine = make_engine(["what is your name"], llm=llm)
+    engine.run()
+
+    assert llm.prompts == []
+    assert engine.tts.texts == []
+    clip = engine.sink.played[0]
+    assert (clip.path, clip.text, clip.temporary) == ("faq_name.mp3", "I am Asterix!", False)
+    assert engine.last_turn.from_fast_path
+
+
+def test_faq_answers_while_llm_is_still_loading():
+    from faq import FAQMatcher
+    from stages import GeminiLLM
+    from startup import StartupOrchestrator
+
+    class SlowAsterix:
+        def __init__(self):
+            self.history = []
+
+        def add_to_history(self, user_input, response_text):
+            self.history.append((user_input, response_text))
+
+        def get_streaming_response(self, text):
+            yield "By Toutatis!"
+
+    startup = StartupOrchestrator()
+    startup.add("faq", FAQMatcher)
+    startup.add("llm", lambda: time.sleep(0.5) or SlowAsterix())
+    startup.start()
+
+    llm = GeminiLLM(lambda: startup.get("llm"), faq=lambda: startup.get("faq"))
+    start = time.perf_counter()
+    hit = llm.fast_path("what is your name")
+    assert hit.entry_id == "name"
+    assert time.perf_counter() - start < 0.25
+    assert not startup.ready("llm")
+
+    # The FAQ exchange reaches the chat history before the next Gemini request
+    assert list(llm.stream("tell me a story")) == ["By Toutatis!"]
+    assert startup.get("llm").history == [("what is your name", hit.response)]
+
+
+def test_first_audio_before_reply_finishes():
+    """Pipelining: the first sentence plays while later chunks are still streaming."""
+    llm = FakeLLM(REPLIES, chunk_delay=0.02, chunk_size=6)
+    engine = make_engine(["hello"], llm=llm)
+    engine.run()
+
+    timings = engine.last_turn.timings
+    assert timings["first_audio"] < timings["done"] - 0.05
+    assert engine.last_turn.time_to_first_audio() is not None
+
+
+def test_bounded_queues_apply_backpressure():
+    """A slow sink must throttle TTS rather than letting clips pile up."""
+    reply = " ".join(f"Sentence {i}." for i in range(20))
+    llm = FakeLLM({"go": reply}, chunk_size=len(reply))
+    engine = make_engine(["go"], llm=llm, queue_size=1)
+    engine.sink.delay = 0.01
+
+    max_ahead = []
+    original = engine.tts.synthesize
+
+    def synthesize(text):
+        max_ahead.append(len(engine.tts.texts) - len(engine.sink.played))
+        return original(text)
+
+    engine.tts.synthesize = synthesize
+    engine.run()
+
+    assert len(engine.sink.played) == 20
+    # queue_size clips waiting + one being played + one being synthesized
+    assert max(max_ahead) <= 3
+
+
+def test_concurrent_sessions_on_one_loop():
+    engines = [make_engine(["hello"]) for _ in range(5)]
+
+    async def run_all():
+        return await asyncio.gather(*(e.run_turn() for e in engines))
+
+    turns = asyncio.run(run_all())
+    assert all(len(t.sentences) == 3 for t in turns)
+
+
+def test_stage_errors_do_not_stop_the_conversation():
+    class FlakySTT(FakeSTT):
+        calls = 0
+
+        def transcribe(self, audio):
+            FlakySTT.calls += 1
+            if FlakySTT.calls == 1:
+                raise ConnectionError("network down")
+            return audio
+
+    engine = make_engine(["hello", "hello"])
+    engine.stt = FlakySTT()
+    engine.run()
+    assert len(engine.sink.played) == 3
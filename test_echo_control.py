@@ -0,0 +1,208 @@
+import threading
+import time
+
+import numpy as np
+
+from conversation_engine import AudioSink, ConversationEngine
+from echo_control import EchoSuppressor, PlaybackGate, echo_return_loss_enhancement, float_to_pcm16, pcm16_to_float
+from fakes import REPLIES, FakeClock, FakeLLM, FakeSource, FakeSTT, FakeTTS
+
+RATE = 16000
+
+
+def speech_like(seconds, seed=0):
+    """Band-limited noise with a syllable-rate envelope, roughly like TTS output."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    noise = np.convolve(rng.standard_normal(n), np.ones(4) / 4, "same")
+    envelope = (0.5 + 0.5 * np.sin(2 * np.pi * 3 * np.arange(n) / RATE)) ** 2
+    return 0.3 * noise * envelope
+
+
+def room(reference, seed=1):
+    """Our voice as the mic hears it: 2.5 ms delay plus a decaying reverb tail."""
+    rng = np.random.default_rng(seed)
+    response = np.zeros(300)
+    response[40:] = 0.4 * rng.standard_normal(260) * np.exp(-np.arange(260) / 50)
+    return np.convolve(reference, response)[:len(reference)]
+
+
+def visitor(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return 0.3 * np.sin(2 * np.pi * 220 * t) * np.sin(np.pi * t / seconds)
+
+
+def test_suppresses_echo_after_convergence():
+    reference = speech_like(3)
+    echo = room(reference)
+    cleaned = EchoSuppressor().process(echo, reference)
+
+    last_second = slice(2 * RATE, 3 * RATE)
+    erle = echo_return_loss_enhancement(echo[last_second], cleaned[last_second])
+    print(f"ERLE after 2 s: {erle:.1f} dB")
+    assert erle > 20
+
+
+def test_keeps_visitor_speech_during_double_talk():
+    reference = speech_like(3)
+    echo = room(reference)
+    near = np.zeros_like(echo)
+    near[2 * RATE:] = visitor(1)
+
+    cleaned = EchoSuppressor().process(echo + near, reference)
+
+    talk = slice(2 * RATE, 3 * RATE)
+    assert np.corrcoef(cleaned[talk], near[talk])[0, 1] > 0.9
+    # The detector froze adaptation: the echo is still cancelled, not the visitor
+    assert echo_return_loss_enhancement(echo[talk], cleaned[talk] - near[talk]) > 6
+
+
+def test_filter_state_carries_across_calls():
+    reference = speech_like(4)
+    echo = room(reference)
+    suppressor = EchoSuppressor()
+    suppressor.process(echo[:3 * RATE], reference[:3 * RATE])
+    cleaned = suppressor.process(echo[3 * RATE:], reference[3 * RATE:])
+    assert echo_return_loss_enhancement(echo[3 * RATE:], cleaned) > 20
+
+
+def test_pcm_round_trip():
+    samples = np.array([0.0, 0.5, -0.5, -1.0, 0.99], dtype=np.float32)
+    assert np.allclose(pcm16_to_float(float_to_pcm16(samples)), samples, atol=1e-4)
+
+
+def test_reference_is_aligned_to_capture_window():
+    clock = FakeClock()
+    gate = PlaybackGate(clock=clock)
+    clock.now = 10.0
+    clip = np.ones(RATE // 2, dtype=np.float32)  # 0.5 s
+    gate.playback_started(clip, RATE)
+
+    reference = gate.reference_between(9.75, 10.75, RATE)
+    assert len(reference) == RATE
+    assert not reference[:RATE // 4].any()
+    assert reference[RATE // 4:3 * RATE // 4].all()
+    assert not reference[3 * RATE // 4:].any()
+
+
+def play_in_background(gate, duration, reference=None):
+    def playback():
+        gate.playback_started(reference, RATE if reference is not None else None, duration)
+        time.sleep(duration)
+        gate.playback_finished()
+
+    thread = threading.Thread(target=playback)
+    thread.start()
+    time.sleep(0.01)
+    return thread
+
+
+def test_gate_reopens_after_tail_without_reference():
+    gate = PlaybackGate(tail=0.05)
+    thread = play_in_background(gate, 0.2)
+    assert gate.wait_clear()
+    thread.join()
+
+    latency = gate.resume_latencies[-1]
+    print(f"Resume latency without reference: {latency * 1000:.0f} ms")
+    assert 0.04 <= latency < 0.1
+    assert PlaybackGate().wait_clear(timeout=0)  # nothing played yet: open
+
+
+def test_gate_overlaps_playback_with_reference():
+    gate = PlaybackGate(overlap=0.1)
+    thread = play_in_background(gate, 0.3, reference=speech_like(0.3))
+    assert gate.wait_clear()
+    resumed = time.monotonic()
+    assert gate.playing
+    thread.join()
+
+    print(f"Resume latency with reference: {gate.resume_latencies[-1] * 1000:.0f} ms")
+    assert gate.resume_latencies[-1] < 0
+    assert gate.finished_at - resumed > 0.05
+
+
+def test_wait_clear_times_out_while_playing():
+    gate = PlaybackGate()
+    gate.playback_started()  # unknown length
+    assert gate.wait_clear(timeout=0.05) is False
+
+
+class GatedSink(AudioSink):
+    """Pretends each clip takes 0.1 s to play, telling the gate like a real sink."""
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, clip):
+        self.gate.playback_started(duration=0.1)
+        time.sleep(0.1)
+        self.played.append(clip)
+        self.gate.playback_finished()
+
+
+def test_engine_opens_mic_only_after_playback():
+    gate = PlaybackGate(tail=0.05)
+    listened = []
+
+    class TimedSource(FakeSource):
+        def listen(self):
+            listened.append(time.monotonic())
+            return super().listen()
+
+    engine = ConversationEngine(TimedSource(["hello", "tell me a story"]), FakeSTT(), FakeLLM(REPLIES),
+                                FakeTTS(), GatedSink(), gate=gate)
+    engine.run()
+
+    # Every listen after a reply waited for its playback plus the tail, and no longer
+    assert len(listened) == 3
+    assert len(gate.resume_latencies) == 2
+    assert all(0.04 <= latency < 0.1 for latency in gate.resume_latencies)
+    assert "mic_open" in engine.last_turn.timings
+
+
+class OverlappingSink(AudioSink):
+    """Like PygameSink: hands the gate its samples and returns `overlap` s before each clip ends."""
+
+    def __init__(self, length=0.2):
+        self.length = length
+        self.finished = []
+        self._playing = None
+
+    def play(self, clip):
+        if self._playing:
+            self._playing.join()
+
+        def playback():
+            time.sleep(self.length)
+            self.finished.append(time.monotonic())
+            self.gate.playback_finished()
+
+        self.gate.playback_started(speech_like(self.length), RATE, self.length)
+        self._playing = threading.Thread(target=playback)
+        self._playing.start()
+        time.sleep(self.length - self.gate.overlap)
+
+    def wait(self):
+        if self._playing:
+            self._playing.join()
+
+
+def test_engine_listens_before_reply_ends_with_reference():
+    gate = PlaybackGate(overlap=0.1)
+    listened = []
+
+    class TimedSource(FakeSource):
+        def listen(self):
+            listened.append(time.monotonic())
+            return super().listen()
+
+    sink = OverlappingSink()
+    engine = ConversationEngine(TimedSource(["hello"]), FakeSTT(), FakeLLM(REPLIES), FakeTTS(), sink, gate=gate)
+    engine.run()
+    sink.wait()
+
+    # The second listen started while the last sentence of the reply was still playing
+    assert listened[1] < sink.finished[-1]
+    print(f"Mic opened {(sink.finished[-1] - listened[1]) * 1000:.0f} ms before playback ended")
+    assert sink.finished[-1] - listened[1] > 0.05
@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+
+from conversation_engine import Clip, ConversationEngine
+from expressions import ACTION_RULES, SPEECH_RULES, ExpressionScheduler, ExpressionTagger
+from fakes import FakeLLM, FakeSink, FakeSource, FakeSTT, FakeTTS, RecordingEffects
+from persona import SentenceSplitter
+
+REPLY = ("By Toutatis, a visitor! *taps helmet* Welcome to the village. These Romans are crazy! *laughs* "
+         "The magic potion is brewed by our druid in a great cauldron. I am so glad you came, my friend. "
+         "Obelix fell into it when he was little, so he may never drink it again. Alas, poor Obelix!")
+
+
+def summary(expressions):
+    return [(round(e.at, 2), e.emotion, e.gesture) for e in expressions]
+
+
+def test_tags_actions_emotions_and_catchphrases():
+    tagger = ExpressionTagger()
+    assert summary(tagger.tag("By Toutatis, a visitor!")) == [(0.0, "surprised", "look_up")]
+    assert summary(tagger.tag("*taps helmet* Welcome to the village.")) == [(0.0, "proud", "nod")]
+    # Positions are in the spoken text, with the action removed
+    tagged = tagger.tag("I am so glad you came, *winks* my friend.")
+    assert summary(tagged) == [(0.24, "happy", None), (0.68, "wink", None), (0.79, "love", None)]
+    assert [e.trigger for e in tagged] == ["glad", "winks", "friend"]
+
+
+def test_only_whole_words_and_no_repeats():
+    tagger = ExpressionTagger()
+    assert tagger.tag("A friendly Roman, sadly, was sadder still.") == []
+    assert summary(tagger.tag("Wow, wow, amazing!")) == [(0.0, "surprised", None)]
+    # Action words only count inside *...*, speech words only outside
+    assert tagger.tag("He nods at the *wonderful* view.") == []
+
+
+class ExpressiveEffects(RecordingEffects):
+    def __init__(self):
+        super().__init__()
+        self.expressed = []
+
+    def express(self, clip):
+        self.expressed.append((clip.text, summary(clip.expressions)))
+
+
+def test_engine_tags_sentences_as_they_stream():
+    llm = FakeLLM({"hi": "*bows* Welcome, friend! We won! *laughs*"}, chunk_size=5)
+    # Synthesis takes a moment, as with a real TTS, so "*laughs*" is tagged while "We won!" renders
+    engine = ConversationEngine(FakeSource(["hi"]), FakeSTT(), llm, FakeTTS(delay=0.05), FakeSink(),
+                                effects=ExpressiveEffects(), tagger=ExpressionTagger())
+    engine.run()
+
+    assert engine.effects.expressed == [
+        ("Welcome, friend!", [(0.0, None, "bow"), (0.59, "love", None)]),
+        ("We won!", [(1.0, "happy", "nod")]),  # the trailing action ends the sentence before it
+    ]
+    assert [c.text for c in engine.sink.played] == ["Welcome, friend!", "We won!"]
+
+
+class FakeRobot:
+    def __init__(self):
+        self.calls = []
+        self.start = time.monotonic()
+        self.done = threading.Event()
+
+    def _record(self, *call):
+        self.calls.append((time.monotonic() - self.start,) + call)
+        if call == ("set_tilt", 0):
+            self.done.set()
+
+    def set_screen(self, image="", video="", text="", url=""):
+        self._record("set_screen", image or text)
+
+    def update_leds_icon(self, name):
+        self._record("update_leds_icon", name)
+
+    def set_pan(self, angle):
+        self._record("set_pan", angle)
+
+    def set_tilt(self, angle):
+        self._record("set_tilt", angle)
+
+
+def test_robot_effects_follow_the_sentence_playback():
+    from stages import RobotScreenEffects
+
+    robot = FakeRobot()
+    effects = RobotScreenEffects(robot, ExpressionScheduler())
+    clip = Clip("missing.mp3", "A nice long sentence, glad!", expressions=ExpressionTagger().tag(
+        "A nice long sentence, glad! *nods*"))  # 27 characters: ~1.8 s of speech
+    effects.express(clip)
+    assert robot.done.wait(timeout=3)
+
+    # "glad" is ~80% into the sentence; the nod starts as it ends
+    expected = [(1.41, "update_leds_icon", "happy"), (1.41, "set_screen", "happy.png"),
+                (1.8, "set_tilt", 10), (2.15, "set_tilt", -5), (2.5, "set_tilt", 0)]
+    assert [c[1:] for c in robot.calls] == [e[1:] for e in expected]
+    for (at, *_), (expected_at, *_) in zip(robot.calls, expected):
+        assert abs(at - expected_at) < 0.1
+
+
+def test_listening_cancels_pending_expressions():
+    from stages import RobotScreenEffects
+
+    robot = FakeRobot()
+    effects = RobotScreenEffects(robot, ExpressionScheduler())
+    effects.express(Clip("missing.mp3", "x" * 30, expressions=ExpressionTagger().tag("*bows* " + "x" * 30)))
+    time.sleep(0.1)
+    effects.listening()
+    time.sleep(0.9)
+    assert [c[1:] for c in robot.calls] == [("set_tilt", 15), ("set_screen", "Listening...")]
+
+
+def test_tagger_throughput_benchmark():
+    """Tagging cost on a streamed reply, vs. the time it takes to say it."""
+    chunks = [REPLY[i:i + 16] for i in range(0, len(REPLY), 16)]
+    tagger = ExpressionTagger()
+    action_rules = [(re.compile(rf"\b(?:{p})\b", re.IGNORECASE), e, g) for p, e, g in ACTION_RULES]
+    speech_rules = [(re.compile(rf"\b(?:{p})\b", re.IGNORECASE), e, g) for p, e, g in SPEECH_RULES]
+
+    def per_rule(sentence):
+        found = []
+        for span in re.finditer(r"\*(.*?)\*", sentence):
+            found += [(e, g) for r, e, g in action_rules for _ in r.finditer(span.group(1))]
+        spoken = re.sub(r"\*.*?\*", "", sentence)
+        return found + [(e, g) for r, e, g in speech_rules for _ in r.finditer(spoken)]
+
+    def stream(tag, replies):
+        for _ in range(replies):
+            splitter = SentenceSplitter()
+            for chunk in chunks:
+                for sentence in splitter.feed(chunk):
+                    tag(sentence)
+            for sentence in splitter.flush():
+                tag(sentence)
+
+    replies = 500
+    start = time.perf_counter()
+    stream(tagger.tag, replies)
+    combined = time.perf_counter() - start
+    start = time.perf_counter()
+    stream(per_rule, replies)
+    separate = time.perf_counter() - start
+
+    sentences = replies * 7
+    speech = replies * len(REPLY) / 15.0  # seconds to say it all at ~15 characters/s
+    print(f"\ntagger: {sentences / combined:,.0f} sentences/s, {replies * len(REPLY) / combined / 1e6:.2f} MB/s"
+          f" | one scan per rule: {sentences / separate:,.0f} sentences/s"
+          f" | cost {combined / speech * 100:.4f}% of speaking time")
+
+    assert combined / sentences < 0.001  # well under a millisecond per sentence
+    assert combined < speech / 1000
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+from faq import ASTERIX_FAQ, FAQMatcher
+
+
+def test_faq_hits_paraphrases():
+    faq = FAQMatcher()
+    cases = {
+        "what's your name": "name",
+        "Who are you?": "name",
+        "where do you come from": "origin",
+        "who is obelix": "obelix",
+        "what's your dog called, do you have a dog?": "dogmatix",
+        "tell me about the magic potion": "potion",
+        "how old are you": "age",
+    }
+    for question, entry_id in cases.items():
+        hit = faq.match(question)
+        assert hit is not None, question
+        assert hit.entry_id == entry_id, (question, hit)
+
+
+def test_faq_falls_through_on_open_questions():
+    faq = FAQMatcher()
+    for question in [
+        "Can you tell me a story about the twelve tasks?",
+        "What is the weather like today?",
+        "How do I get to the museum cafe?",
+        "",
+    ]:
+        assert faq.match(question) is None, question
+
+
+def test_faq_metrics():
+    faq = FAQMatcher()
+    faq.record_llm_latency(2.0)
+    faq.record_llm_latency(1.0)
+    faq.match("What is your name?")
+    faq.match("Explain Roman tax policy")
+
+    metrics = faq.metrics()
+    assert metrics["lookups"] == 2
+    assert metrics["hits"] == 1
+    assert metrics["hit_rate"] == 0.5
+    assert 1.4 < metrics["latency_saved"] <= 1.5
+
+
+def test_faq_presynthesize_attaches_audio():
+    faq = FAQMatcher()
+    rendered = []
+
+    def synthesize(text, path):
+        rendered.append(text)
+        with open(path, "wb") as f:
+            f.write(b"mp3")
+
+    def clean(text):
+        return text.replace("*taps helmet* ", "")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        faq.presynthesize(synthesize, cache_dir=cache_dir, clean=clean)
+        assert len(rendered) == len(faq.entries)
+        assert not any("*" in text for text in rendered)
+
+        hit = faq.match("who are you")
+        assert os.path.basename(hit.audio_path).startswith("faq_name_")
+
+        # Cached clips are reused on the next start
+        FAQMatcher().presynthesize(synthesize, cache_dir=cache_dir, clean=clean)
+        assert len(rendered) == len(faq.entries)
+
+        # An edited response is rendered again and its old clip removed
+        entries = [dict(e, response="I am Asterix, the Gaul!") if e["id"] == "name" else e for e in ASTERIX_FAQ]
+        edited = FAQMatcher(entries)
+        edited.presynthesize(synthesize, cache_dir=cache_dir, clean=clean)
+        assert rendered[-1] == "I am Asterix, the Gaul!"
+        assert edited.audio_paths["name"] != hit.audio_path
+        assert not os.path.exists(hit.audio_path)
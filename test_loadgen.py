@@ -0,0 +1,38 @@
+from loadgen import LoadTest, format_report
+
+# Fast fakes: a turn takes ~0.2 s, of which ~0.08 s until the first audio
+FAST = dict(turns=2, speak=0.05, first_token=0.05, interval=0.005, tts_seconds=0.03, chars_per_second=400)
+
+
+def test_reports_throughput_and_ttfa_per_level():
+    test = LoadTest(workers=16, **FAST)
+    results = test.run((1, 4))
+
+    assert [r["sessions"] for r in results] == [1, 4]
+    assert [r["turns"] for r in results] == [2, 8]
+    for r in results:
+        assert 0.05 < r["ttfa_p50"] <= r["ttfa_p90"] <= r["ttfa_p99"] < 0.2
+        assert r["overlapping_chat_turns"] == 0  # one chat per session
+    assert results[1]["turns_per_second"] > 2.5 * results[0]["turns_per_second"]
+    assert "up to 4 sessions" in test.findings(results)[-1]
+
+
+def test_flags_thread_pool_saturation():
+    test = LoadTest(workers=3, **FAST)
+    results = test.run((1, 8))
+
+    assert results[1]["peak_blocking_calls"] == 3
+    assert results[1]["ttfa_p90"] > 1.5 * results[0]["ttfa_p90"]  # turns queue for workers
+    findings = test.findings(results)
+    assert findings[0].startswith("thread pool saturated from 8 sessions")
+    assert findings[-1].endswith("up to 1 session")
+    assert "thread pool saturated" in format_report(results, findings)
+
+
+def test_flags_a_chat_shared_between_sessions():
+    test = LoadTest(workers=16, shared=True, **FAST)
+    results = test.run((1, 4))
+
+    assert results[0]["overlapping_chat_turns"] == 0
+    assert results[1]["overlapping_chat_turns"] > 0
+    assert any(f.startswith("shared chat: from 4 sessions") for f in test.findings(results))
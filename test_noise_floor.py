@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from noise_floor import NoiseFloorTracker, chunk_energy
+
+RATE = 16000
+CHUNK = 1024  # samples, as speech_recognition.Microphone reads them
+CHUNK_SECONDS = CHUNK / RATE
+
+
+def noise(level, seconds, seed=0):
+    """White noise chunks with RMS `level` (int16 units)."""
+    rng = np.random.default_rng(seed)
+    samples = rng.standard_normal(int(seconds * RATE)) * level
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    return [samples[i:i + CHUNK].tobytes() for i in range(0, len(samples) - CHUNK + 1, CHUNK)]
+
+
+def speech_bursts(noise_level, seconds, speech_level=3000, duty=0.4, seed=1):
+    """Noise with loud 'utterances' taking `duty` of the time (1.5 s period)."""
+    chunks = noise(noise_level, seconds, seed)
+    period = int(1.5 / CHUNK_SECONDS)
+    loud = noise(speech_level, seconds, seed + 1)
+    return [loud[i] if i % period < duty * period else c for i, c in enumerate(chunks)]
+
+
+def feed(tracker, chunks):
+    return [tracker.feed(c, RATE) for c in chunks]
+
+
+def test_chunk_energy_matches_rms():
+    samples = np.array([300, -300, 300, -300], dtype=np.int16)
+    assert chunk_energy(samples.tobytes()) == pytest.approx(300)
+    assert chunk_energy(b"") == 0.0
+
+
+def test_threshold_settles_on_stationary_noise_within_a_second():
+    tracker = NoiseFloorTracker()
+    thresholds = feed(tracker, noise(200, 1.0))
+    assert thresholds[-1] == pytest.approx(200 * tracker.ratio, rel=0.1)
+
+
+def test_speech_does_not_raise_the_floor():
+    tracker = NoiseFloorTracker()
+    feed(tracker, speech_bursts(200, 30))
+    assert tracker.floor == pytest.approx(200, rel=0.1)
+    assert tracker.threshold < 3000 / 4  # speech stays well above threshold
+
+
+def test_follows_hall_getting_louder_and_quieter():
+    tracker = NoiseFloorTracker()
+    feed(tracker, noise(100, 5))
+    # A school group arrives: +20 dB
+    feed(tracker, noise(1000, 20, seed=2))
+    assert tracker.floor == pytest.approx(1000, rel=0.1)
+    # ... and leaves: the floor drops back as soon as the window has quiet in it
+    feed(tracker, noise(100, 5, seed=3))
+    assert tracker.floor == pytest.approx(100, rel=0.1)
+
+
+def test_rise_is_rate_limited_during_long_speech():
+    tracker = NoiseFloorTracker(max_rise_db=3.0)
+    feed(tracker, noise(200, 5))
+    feed(tracker, noise(3000, 8, seed=4))  # someone talking for 8 s without pause
+    # Less than halfway from the noise floor to the speech level
+    assert 20 * np.log10(tracker.floor / 200) < 20 * np.log10(3000 / 200) / 2
+    assert tracker.threshold < 3000
+
+
+def test_slow_drift_over_the_day():
+    # Compressed day: noise ramps from 100 to 800 over two minutes and back down
+    tracker = NoiseFloorTracker()
+    levels = list(np.linspace(100, 800, 120)) + list(np.linspace(800, 100, 120))
+    errors = []
+    for i, level in enumerate(levels):
+        feed(tracker, noise(level, 1.0, seed=10 + i))
+        errors.append(abs(20 * np.log10(tracker.floor / level)))
+    assert max(errors[int(tracker.window) + 1:]) < 2  # once the window has filled
@@ -0,0 +1,175 @@
+import time
+import types
+
+import pytest
+
+from conversation_engine import Clip, ConversationEngine, TextToSpeech
+from fakes import FakeSink, FakeSource, FakeSTT
+from faq import FAQHit
+from persona import PERSONAS, PersonaSwitch
+
+llm_client = pytest.importorskip("llm_client")
+from stages import GeminiLLM  # noqa: E402
+
+
+class FakeChat:
+    def __init__(self, system_instruction, history):
+        self.system_instruction = system_instruction
+        self.history = list(history)
+
+    def send_message(self, text, stream=False, request_options=None):
+        speaker = next(p.speaker for p in PERSONAS.values() if p.prompt == self.system_instruction)
+        reply = f"{speaker} answers: {text}."
+        self.history += [{"role": "user", "parts": [text]}, {"role": "model", "parts": [reply]}]
+        chunk = types.SimpleNamespace(text=reply)
+        return [chunk] if stream else chunk
+
+
+class FakeGemini:
+    """Stands in for google.generativeai; the transcript upload takes `upload_seconds`."""
+
+    def __init__(self, upload_seconds=0.0):
+        self.upload_seconds = upload_seconds
+        self.uploads = 0
+        self.chats = []
+
+    def configure(self, **kwargs):
+        pass
+
+    def upload_file(self, path, mime_type=None):
+        time.sleep(self.upload_seconds)
+        self.uploads += 1
+        state = types.SimpleNamespace(name="ACTIVE")
+        return types.SimpleNamespace(display_name="transcript", uri="files/1", name="files/1", state=state)
+
+    def GenerativeModel(self, model_name, system_instruction):
+        gemini = self
+
+        class Model:
+            def start_chat(self, history):
+                chat = FakeChat(system_instruction, history)
+                gemini.chats.append(chat)
+                return chat
+
+        return Model()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini()
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "genai", fake)
+    return fake
+
+
+class NameFAQ:
+    def match(self, text):
+        if text == "what is your name":
+            return FAQHit("name", text, "*bows* I am Asterix!", 1.0)
+        return None
+
+
+class VoiceTTS(TextToSpeech):
+    def __init__(self):
+        self.voice = None
+        self.spoken = []
+
+    def synthesize(self, text):
+        self.spoken.append((self.voice, text))
+        return Clip(f"clip_{len(self.spoken)}.mp3", text)
+
+
+def test_one_upload_shared_by_every_persona(gemini):
+    llm = llm_client.PersonaLLM(PersonaSwitch())
+
+    assert gemini.uploads == 1
+    assert len(gemini.chats) == len(PERSONAS)
+    for chat in gemini.chats:
+        assert chat.history[0]["parts"][0].uri == "files/1"
+    assert {chat.system_instruction for chat in gemini.chats} == {p.prompt for p in PERSONAS.values()}
+    assert llm.system_prompt == PERSONAS["asterix"].prompt
+
+
+def test_each_persona_keeps_its_own_history(gemini):
+    switch = PersonaSwitch()
+    llm = llm_client.PersonaLLM(switch)
+
+    assert llm.get_response("Who are you?") == "Asterix answers: Who are you?."
+    switch.switch("druid")
+    assert llm.get_response("And the potion?") == "Panoramix answers: And the potion?."
+    switch.switch("asterix")
+    assert "".join(llm.get_streaming_response("Hello again")) == "Asterix answers: Hello again."
+
+    asterix, panoramix = llm.llms["asterix"].chat, llm.llms["panoramix"].chat
+    said = lambda chat: [c["parts"][0] for c in chat.history[2:] if c["role"] == "user"]
+    assert said(asterix) == ["Who are you?", "Hello again"]
+    assert said(panoramix) == ["And the potion?"]
+
+
+def test_panoramix_llm_speaks_as_the_druid(gemini):
+    llm = llm_client.PanoramixLLM()
+    assert "Panoramix" in llm.system_prompt and "Obelix" in llm.system_prompt
+    assert llm.fallback_reply == PERSONAS["panoramix"].fallback
+
+
+def test_voice_command_switches_persona_mid_conversation(gemini):
+    switch = PersonaSwitch()
+    llm = llm_client.PersonaLLM(switch, faq=NameFAQ())
+    utterances = ["what is your name", "switch to Panoramix", "what is your name", "assistant mode"]
+    engine = ConversationEngine(FakeSource(utterances), FakeSTT(), GeminiLLM(llm, faq=NameFAQ(), personas=switch),
+                                VoiceTTS(), FakeSink())
+    switch.attach(engine)
+    engine.run()
+
+    voice = {key: p.voice for key, p in PERSONAS.items()}
+    assert engine.tts.spoken == [
+        (voice["asterix"], "I am Asterix!"),                   # FAQ, Asterix's voice
+        (voice["panoramix"], "Panoramix, at your service."),    # switch acknowledged in the new voice
+        (voice["panoramix"], "Ask, my friend."),
+        (voice["panoramix"], "Panoramix answers: what is your name."),  # no Asterix FAQ for the druid
+        (voice["assistant"], "Assistant mode."),
+        (voice["assistant"], "How can I help?"),
+    ]
+    assert engine.speaker == "Assistant"
+    # The FAQ exchange went to Asterix's chat, not to the one active when it was flushed
+    assert [c["parts"][0] for c in llm.llms["asterix"].chat.history[2:]] == ["what is your name", "*bows* I am Asterix!"]
+
+
+def test_console_switches_persona():
+    import io
+
+    switch = PersonaSwitch()
+    switch.read_console(io.StringIO("panoramix\n\nnobody\nassistant\n")).join(timeout=1)
+    assert switch.active == "assistant"
+
+
+def test_switch_latency_benchmark(monkeypatch):
+    """Switching persona vs. restarting the LLM with another prompt (mocked backends)."""
+    gemini = FakeGemini(upload_seconds=0.2)  # a real transcript upload takes seconds
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "genai", gemini)
+
+    start = time.perf_counter()
+    llm_client.PanoramixLLM()
+    restart = time.perf_counter() - start
+
+    switch = PersonaSwitch()
+    llm = llm_client.PersonaLLM(switch)
+    engine = switch.attach(ConversationEngine(FakeSource([]), FakeSTT(), GeminiLLM(llm, personas=switch),
+                                              VoiceTTS(), FakeSink()))
+    stage = engine.llm
+    latencies = []
+    for i in range(300):
+        command = ["switch to Panoramix", "assistant mode", "go back to Asterix"][i % 3]
+        start = time.perf_counter()
+        assert stage.fast_path(command) is not None
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"\npersona switch by voice command: p50 {p50 * 1000:.3f} ms | p99 {p99 * 1000:.3f} ms"
+          f" | restarting the LLM: {restart * 1000:.0f} ms")
+
+    assert gemini.uploads == 2  # one for the restart, one shared by every persona
+    assert latencies[-1] < 0.1
+    assert p99 < 0.005
+    assert p99 < restart / 20
@@ -0,0 +1,147 @@
+import os
+import time
+
+from conversation_engine import AudioSink, Clip, ConversationEngine, TextToSpeech
+from fakes import REPLIES, EchoLLM, FakeLLM, FakeSpeakingSource, FakeSource, FakeSTT
+from faq import FAQHit
+from recorder import SessionReader, SessionRecorder, format_report, replay
+from speculation import Speculator
+
+
+class FileTTS(TextToSpeech):
+    """Writes a small 'mp3' per sentence, like EdgeTTS does."""
+
+    def __init__(self, directory, delay=0.0):
+        self.directory = directory
+        self.delay = delay
+        self.count = 0
+
+    def synthesize(self, text):
+        time.sleep(self.delay)
+        self.count += 1
+        path = os.path.join(self.directory, f"tts_{self.count}.mp3")
+        with open(path, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8"))
+        return Clip(path, text)
+
+
+class TimedSink(AudioSink):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.played = []
+
+    def play(self, clip):
+        time.sleep(self.delay)
+        with open(clip.path, "rb") as f:
+            self.played.append((clip.text, f.read()))
+
+
+def record_session(tmp_path, utterances=("hello", "what is your name", "tell me a story")):
+    faq_clip = tmp_path / "faq_name.mp3"
+    faq_clip.write_bytes(b"ID3 I am Asterix")
+    faq = {"what is your name": FAQHit("name", "what is your name", "*bows* I am Asterix!", 1.0, str(faq_clip))}
+
+    engine = ConversationEngine(FakeSource(utterances), FakeSTT(), FakeLLM(REPLIES, chunk_delay=0.03, faq=faq),
+                                FileTTS(str(tmp_path), delay=0.02), TimedSink(delay=0.01))
+    path = str(tmp_path / "session.pxr")
+    recorder = SessionRecorder(path)
+    recorder.attach(engine)
+    engine.run()
+    recorder.close()
+    return path, engine
+
+
+def test_records_every_stage(tmp_path):
+    path, engine = record_session(tmp_path)
+    reader = SessionReader(path)
+    header, turns = reader.turns()
+
+    assert header["split_sentences"] is True
+    assert len(turns) == 3
+    kinds = [meta["type"] for meta, _ in turns[0]]
+    assert kinds[:4] == ["listening", "listen", "transcript", "request"]
+    assert kinds.count("chunk") == len(engine.llm.inner.replies["hello"]) // engine.llm.inner.chunk_size + 1
+    assert kinds.count("clip") == kinds.count("play") == 3
+    assert kinds[-1] == "turn"
+    fast = [(meta, bytes(blob)) for meta, blob in turns[1] if meta["type"] == "fast_path"]
+    assert fast[0][1] == b"ID3 I am Asterix"
+    del turns  # views into the map must go before it is closed
+    reader.close()
+
+
+def test_truncated_session_reads_complete_records(tmp_path):
+    path, _ = record_session(tmp_path, ["hello"])
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = str(tmp_path / "cut.pxr")
+    # Drop the mic opening for the utterance that never came, then cut into the turn record
+    last_listen = data.rindex(b'{"type":"listening"') - 8
+    with open(cut, "wb") as f:
+        f.write(data[:last_listen - 7])
+
+    reader = SessionReader(cut)
+    records = [meta["type"] for meta, _ in reader]
+    reader.close()
+    assert records[-1] == "play"
+    assert len(records) == len([m for m, _ in iter_all(path)]) - 2
+
+
+def iter_all(path):
+    reader = SessionReader(path)
+    records = [(meta, None) for meta, _ in reader]
+    reader.close()
+    return records
+
+
+def test_fast_replay_reproduces_the_conversation(tmp_path):
+    path, engine = record_session(tmp_path)
+    played = []
+
+    def factory(source, stt, llm, tts, sink, header):
+        played.append(sink)
+        return ConversationEngine(source, stt, llm, tts, sink, split_sentences=header["split_sentences"])
+
+    start = time.perf_counter()
+    results = replay(path, realtime=False, engine_factory=factory)
+    assert time.perf_counter() - start < 1.0
+
+    assert [r["user_text"] for r in results] == ["hello", "what is your name", "tell me a story"]
+    assert all(r["matches"] for r in results)
+    assert played[0].played == [text for text, _ in engine.sink.inner.played]
+    assert "same reply" in format_report(results)
+
+
+def test_realtime_replay_keeps_the_recorded_timing(tmp_path):
+    path, _ = record_session(tmp_path)
+    results = replay(path)
+    for r in results:
+        assert r["matches"]
+        assert abs(r["replayed_ttfa"] - r["recorded_ttfa"]) < 0.05
+        assert abs(r["replayed_seconds"] - r["recorded_seconds"]) < 0.1
+
+
+def test_speculative_requests_replay_as_spoken(tmp_path):
+    llm = EchoLLM(first_token=0.05)
+    utterances = [(["tell me about", "tell me about the potion"], "tell me about the potion"),
+                  (["tell me about the Romans"], "tell me about the Gauls")]
+    engine = ConversationEngine(FakeSpeakingSource(utterances, gap=0.1), FakeSTT(), llm,
+                                FileTTS(str(tmp_path)), TimedSink())
+    path = str(tmp_path / "session.pxr")
+    recorder = SessionRecorder(path)
+    recorder.attach(engine)
+    Speculator().attach(engine)  # wraps the recording stages
+    engine.run()
+    recorder.close()
+
+    # Both cancelled streams were dropped from the chat through the recorder
+    assert llm.discarded == 2 and llm.history == ["tell me about the potion", "tell me about the Gauls"]
+    reader = SessionReader(path)
+    _, turns = reader.turns()
+    kinds = [[meta["type"] for meta, _ in turn] for turn in turns]
+    assert [k.count("request") for k in kinds] == [2, 2] and [k.count("discard") for k in kinds] == [1, 1]
+    del turns
+    reader.close()
+
+    results = replay(path, realtime=False)
+    assert [r["user_text"] for r in results] == ["tell me about the potion", "tell me about the Gauls"]
+    assert all(r["matches"] for r in results)
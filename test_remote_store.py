@@ -0,0 +1,148 @@
+import json
+import os
+
+import pytest
+
+from fakes import FakeClock, FakeSFTP, FakeSSH
+
+AudioHandler = pytest.importorskip("audio_handler").AudioHandler
+from remote_store import RemoteAudioStore  # noqa: E402
+
+
+class CountingSFTP(FakeSFTP):
+    def __init__(self, remote_root):
+        super().__init__(remote_root)
+        self.puts = 0
+
+    def put(self, local, remote):
+        self.puts += 1
+        super().put(local, remote)
+
+
+@pytest.fixture
+def robot(tmp_path):
+    remote = tmp_path / "sounds"
+    remote.mkdir()
+    handler = AudioHandler("127.0.0.1")
+    sftp = CountingSFTP(str(remote))
+    handler.ssh = FakeSSH(sftp)
+    return handler, sftp, remote
+
+
+def clip(tmp_path, name, size=1000, fill=b"a"):
+    path = tmp_path / name
+    path.write_bytes(fill * size)
+    return str(path)
+
+
+def make_store(handler, tmp_path, **kwargs):
+    return RemoteAudioStore(handler, str(tmp_path / "manifest.json"), **kwargs)
+
+
+def test_identical_clips_are_uploaded_once(robot, tmp_path):
+    handler, sftp, remote = robot
+    store = make_store(handler, tmp_path)
+
+    first, uploaded = store.put(clip(tmp_path, "reply_1.mp3"))
+    assert uploaded and first.startswith("px_") and first.endswith(".mp3")
+    # Same audio rendered again under another temp name: nothing to upload
+    again, uploaded = store.put(clip(tmp_path, "reply_2.mp3"))
+    assert (again, uploaded) == (first, False)
+    other, uploaded = store.put(clip(tmp_path, "reply_3.mp3", fill=b"b"))
+    assert uploaded and other != first
+
+    assert sftp.puts == 2
+    assert sorted(os.listdir(remote)) == sorted([first, other])
+    assert store.stats == {"uploads": 2, "skipped": 1, "bytes_up": 2000, "removed": 0}
+    # The manifest survives a restart
+    assert make_store(handler, tmp_path).put(clip(tmp_path, "reply_4.mp3")) == (first, False)
+
+
+def test_garbage_collects_by_size_then_age(robot, tmp_path):
+    handler, sftp, remote = robot
+    clock = FakeClock(1_000_000.0)
+    store = make_store(handler, tmp_path, max_bytes=3500, max_age=3600, keep=1, clock=clock)
+
+    names = []
+    for i in range(4):
+        clock.now += 10
+        names.append(store.put(clip(tmp_path, f"c{i}.mp3", fill=bytes([65 + i])))[0])
+    # 4000 bytes > 3500: the least recently used clip goes
+    assert sorted(os.listdir(remote)) == sorted(names[1:])
+
+    clock.now += 10
+    store.put(clip(tmp_path, "again.mp3", fill=b"B"))  # touches names[1]
+    clock.now += 7200
+    store.put(clip(tmp_path, "new.mp3", fill=b"Z"))  # everything else has expired
+    assert sorted(os.listdir(remote)) == sorted(store.clips) and len(store.clips) == 1
+    assert store.stats["removed"] == 4
+
+
+def test_reconcile_after_robot_reset_and_interrupted_upload(robot, tmp_path):
+    handler, sftp, remote = robot
+    store = make_store(handler, tmp_path)
+    kept, _ = store.put(clip(tmp_path, "a.mp3", fill=b"a"))
+    wiped, _ = store.put(clip(tmp_path, "b.mp3", fill=b"b"))
+    partial, _ = store.put(clip(tmp_path, "c.mp3", fill=b"c"))
+
+    os.remove(remote / wiped)                      # robot was cleaned
+    (remote / partial).write_bytes(b"c" * 10)      # upload cut off
+    (remote / "px_0123456789abcdef.mp3").write_bytes(b"x" * 50)  # unknown: can't be trusted
+    (remote / "asterix_greeting.mp3").write_bytes(b"g")          # not ours: left alone
+
+    store = make_store(handler, tmp_path).reconcile()
+    assert sorted(store.clips) == [kept]
+    assert sorted(os.listdir(remote)) == sorted([kept, "asterix_greeting.mp3"])
+    with open(tmp_path / "manifest.json") as f:
+        assert sorted(json.load(f)) == sorted(store.clips)
+
+    puts = sftp.puts
+    assert store.put(clip(tmp_path, "b2.mp3", fill=b"b")) == (wiped, True)
+    assert sftp.puts == puts + 1
+
+
+class CrashingSFTP(CountingSFTP):
+    """Loses the connection after the first 10 bytes of each upload."""
+
+    def put(self, local, remote):
+        self.puts += 1
+        with open(local, "rb") as src, open(self._remote(remote), "wb") as dst:
+            dst.write(src.read(10))
+        raise EOFError("connection lost")
+
+
+def test_upload_cut_off_midway_is_never_adopted(robot, tmp_path):
+    handler, sftp, remote = robot
+    handler.ssh = FakeSSH(CrashingSFTP(str(remote)))
+    reply = clip(tmp_path, "reply.mp3")
+    with pytest.raises(EOFError):
+        make_store(handler, tmp_path).put(reply)
+    name = make_store(handler, tmp_path).name_for(reply)
+    assert os.listdir(remote) == [name + ".part"]  # never under the clip's own name
+
+    handler.ssh = FakeSSH(sftp)
+    store = make_store(handler, tmp_path).reconcile()
+    assert store.clips == {} and os.listdir(remote) == []
+    assert store.put(reply) == (name, True)
+    assert (remote / name).read_bytes() == b"a" * 1000
+
+
+def test_robot_sink_plays_the_stored_name(robot, tmp_path):
+    from conversation_engine import Clip
+    from stages import RobotSink
+
+    class Robot:
+        def __init__(self):
+            self.played = []
+
+        def play_sound(self, name):
+            self.played.append(name)
+
+    handler, sftp, remote = robot
+    sink = RobotSink(Robot(), handler, store=make_store(handler, tmp_path))
+    sink.play(Clip(clip(tmp_path, "faq.mp3"), "I am Asterix!", temporary=False))
+    sink.play(Clip(clip(tmp_path, "temp_1.mp3"), "I am Asterix!"))
+
+    assert sftp.puts == 1
+    assert sink.robot.played[0] == sink.robot.played[1] and sink.robot.played[0] in os.listdir(remote)
+    assert not os.path.exists(tmp_path / "temp_1.mp3")  # temporary clips are still cleaned up
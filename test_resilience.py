@@ -0,0 +1,296 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from fakes import FakeClock, FakeSFTP, FakeSSH
+from persona import FALLBACK_REPLY
+from resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, Policy, backoff_delays, hedged,
+                        iterate_with_deadline, retry, run_with_deadline)
+
+
+def stall(seconds):
+    def call(*args, **kwargs):
+        time.sleep(seconds)
+        return "late"
+    return call
+
+
+def test_deadline_abandons_stalled_call():
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(stall(2), 0.05)
+    assert time.perf_counter() - start < 0.5
+    assert run_with_deadline(lambda x: x * 2, 1, 21) == 42
+
+
+def test_stream_deadline():
+    def trickle():
+        yield "By "
+        yield "Toutatis!"
+        time.sleep(2)
+        yield "never"
+
+    chunks = []
+    with pytest.raises(DeadlineExceeded):
+        for chunk in iterate_with_deadline(trickle(), first_timeout=0.5, idle_timeout=0.05):
+            chunks.append(chunk)
+    assert chunks == ["By ", "Toutatis!"]
+    assert list(iterate_with_deadline(iter("abc"), 0.5)) == ["a", "b", "c"]
+
+
+def test_retry_with_jittered_backoff():
+    calls, sleeps = [], []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert retry(flaky, attempts=3, base_delay=0.1, sleep=sleeps.append) == "ok"
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.1 and 0 <= sleeps[1] <= 0.2
+
+    with pytest.raises(ConnectionError):
+        retry(lambda: (_ for _ in ()).throw(ConnectionError("down")), attempts=2, sleep=lambda s: None)
+
+    assert all(d <= 2.0 for d in backoff_delays(10, base_delay=1.0, max_delay=2.0))
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker("robot", failure_threshold=2, reset_timeout=10, clock=clock)
+    policy = Policy("robot.command", breaker=breaker)
+
+    def down():
+        raise ConnectionError("no route to host")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.call(down)
+    assert breaker.state == "open"
+
+    # Fails fast, without touching the backend
+    backend_calls = []
+    with pytest.raises(CircuitOpenError):
+        policy.call(lambda: backend_calls.append(1))
+    assert backend_calls == []
+    assert policy.call(down, fallback="By Toutatis!") == "By Toutatis!"
+
+    # Half-open: one trial; success closes the circuit
+    clock.now = 11
+    assert breaker.state == "half_open"
+    assert policy.call(lambda: "pong") == "pong"
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker("gemini", failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 6
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_hedged_request_beats_slow_first_copy():
+    delays = iter([1.0, 0.01])
+
+    def read():
+        time.sleep(next(delays))
+        return "status"
+
+    start = time.perf_counter()
+    assert hedged(read, hedge_after=0.05) == "status"
+    assert time.perf_counter() - start < 0.5
+
+    with pytest.raises(DeadlineExceeded):
+        hedged(stall(2), hedge_after=0.01, timeout=0.1)
+
+
+class FakeChat:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.history = []
+        self.calls = 0
+
+    def send_message(self, text, stream=False, request_options=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return type("Reply", (), {"text": "By Toutatis!"})()
+
+
+def make_llm(monkeypatch, errors):
+    llm_client = pytest.importorskip("llm_client")
+    chat = FakeChat(errors)
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_client.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(llm_client.genai, "upload_file", lambda *a, **kw: (_ for _ in ()).throw(OSError("offline")))
+    monkeypatch.setattr(llm_client.genai, "GenerativeModel",
+                        lambda **kwargs: type("Model", (), {"start_chat": lambda self, history: chat})())
+    llm = llm_client.AsterixLLM()
+    llm.policy.sleep = lambda seconds: None
+    return llm, chat
+
+
+def test_llm_retries_only_transient_errors(monkeypatch):
+    from google.api_core import exceptions as api_errors
+
+    llm, chat = make_llm(monkeypatch, [api_errors.ServiceUnavailable("busy")])
+    assert llm.get_response("Who are you?") == "By Toutatis!"
+    assert chat.calls == 2
+
+    llm, chat = make_llm(monkeypatch, [api_errors.PermissionDenied("bad key")])
+    assert llm.get_response("Who are you?") == FALLBACK_REPLY
+    assert chat.calls == 1
+
+
+def test_llm_breaker_answers_with_fallback(monkeypatch):
+    llm, chat = make_llm(monkeypatch, [ConnectionError("reset")] * 4)
+    for _ in range(2):
+        assert llm.get_response("Hello") == FALLBACK_REPLY
+    assert llm.breaker.state == "open"
+
+    calls = chat.calls
+    assert llm.get_response("Hello") == FALLBACK_REPLY
+    assert list(llm.get_streaming_response("Hello")) == [FALLBACK_REPLY]
+    assert chat.calls == calls  # Gemini isn't contacted while the circuit is open
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    """Local stand-in for Elmo's HTTP API with injectable faults."""
+    mode = "ok"
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond()
+
+    def _respond(self):
+        if self.mode == "stall":
+            time.sleep(1)
+        if self.mode == "error":
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"ok": true}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_robot():
+    server = HTTPServer(("127.0.0.1", 0), StallingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    StallingHandler.mode = "ok"
+
+
+def make_robot(server):
+    elmo = pytest.importorskip("ElmoV2API")
+    robot = elmo.ElmoV2API("127.0.0.1", timeout=0.2)
+    robot.POST_COMMAND_PATH = f"http://127.0.0.1:{server.server_port}/command"
+    robot.GET_REQUEST_PATH = f"http://127.0.0.1:{server.server_port}/status"
+    return robot
+
+
+def test_robot_calls_have_deadlines(fake_robot):
+    pytest.importorskip("requests")
+    robot = make_robot(fake_robot)
+    assert robot.status() == {"ok": True}
+
+    StallingHandler.mode = "stall"
+    start = time.perf_counter()
+    assert robot.post_command({"op": "set_screen"}) is None  # no NameError on failure
+    assert time.perf_counter() - start < 0.9
+
+
+def test_robot_breaker_fails_fast(fake_robot):
+    pytest.importorskip("requests")
+    robot = make_robot(fake_robot)
+    StallingHandler.mode = "error"
+    for _ in range(robot.breaker.failure_threshold):
+        robot.post_command({"op": "play_sound", "name": "x.mp3"})
+    assert robot.breaker.state == "open"
+
+    start = time.perf_counter()
+    assert robot.set_screen(text="Listening...") is None
+    assert time.perf_counter() - start < 0.05
+    assert robot.status() is None  # polling callers get "unknown", not CircuitOpenError
+
+
+def test_sftp_transfers_use_channel_timeout(tmp_path):
+    AudioHandler = pytest.importorskip("audio_handler").AudioHandler
+    handler = AudioHandler("127.0.0.1", timeout=0.2)
+    sftp = FakeSFTP(str(tmp_path))
+    handler.ssh = FakeSSH(sftp)
+
+    reply = tmp_path / "reply.mp3"
+    reply.write_bytes(b"ID3 fake mp3")
+    assert handler.upload_response("panoramix_response.mp3", local_file=str(reply))
+    assert (tmp_path / "panoramix_response.mp3").read_bytes() == b"ID3 fake mp3"
+    assert sftp.timeout == 0.2 and sftp.closed
+    assert handler.has_sound("panoramix_response.mp3")
+    assert not handler.has_sound("missing.mp3")
+
+    (tmp_path / "audio.wav").write_bytes(b"RIFF fake wav")
+    handler.local_recording_path = str(tmp_path / "downloaded.wav")
+    assert handler.download_recording()
+    assert (tmp_path / "downloaded.wav").read_bytes() == b"RIFF fake wav"
+
+
+def test_ssh_connect_times_out_on_silent_server():
+    AudioHandler = pytest.importorskip("audio_handler").AudioHandler
+
+    # Accepts TCP connections but never sends an SSH banner
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    handler = AudioHandler("127.0.0.1", timeout=0.2)
+    handler.ssh_policy.base_delay = 0
+    port = listener.getsockname()[1]
+    original = handler.ssh.connect
+    handler.ssh.connect = lambda host, **kwargs: original(host, port=port, **kwargs)
+
+    start = time.perf_counter()
+    assert handler.connect_ssh() is False
+    assert time.perf_counter() - start < 2
+    listener.close()
+
+
+def test_ssh_auth_errors_fail_fast():
+    audio_handler = pytest.importorskip("audio_handler")
+    paramiko = pytest.importorskip("paramiko")
+    handler = audio_handler.AudioHandler("127.0.0.1", timeout=0.2)
+    handler.ssh_policy.sleep = lambda seconds: None
+    calls = []
+
+    def failing(error):
+        def connect(host, **kwargs):
+            calls.append(host)
+            raise error
+        return connect
+
+    handler.ssh.connect = failing(paramiko.AuthenticationException("bad password"))
+    for _ in range(handler.ssh_policy.breaker.failure_threshold + 1):
+        assert handler.connect_ssh() is False
+    assert len(calls) == handler.ssh_policy.breaker.failure_threshold + 1  # never retried
+    assert handler.ssh_policy.breaker.state == "closed"
+
+    calls.clear()
+    handler.ssh.connect = failing(EOFError())  # dropped mid-handshake: worth one more try
+    assert handler.connect_ssh() is False
+    assert len(calls) == 2
@@ -0,0 +1,164 @@
+import types
+
+import pytest
+
+from accounting import SessionAccountant
+from conversation_engine import ConversationEngine
+from fakes import EchoLLM, FakeSink, FakeSpeakingSource, FakeSTT, FakeTTS
+from faq import FAQHit
+from speculation import Speculator, similarity, words
+
+
+def run(utterances, speculator=None, llm=None, tts=None, gap=0.15, accountant=None):
+    llm = llm or EchoLLM()
+    engine = ConversationEngine(FakeSpeakingSource(utterances, gap), FakeSTT(), llm, tts or FakeTTS(), FakeSink(),
+                                accountant=accountant)
+    if speculator:
+        speculator.attach(engine)
+    turns = []
+    engine.observers.append(turns.append)
+    engine.run()
+    return turns, llm, engine
+
+
+def test_similarity_ignores_case_and_punctuation():
+    assert similarity(words("Tell me about the potion?"), words("tell me about the potion")) == 1.0
+    assert similarity(words("tell me about the Romans"), words("tell me about the Gauls")) == 0.8
+    assert similarity([], []) == 1.0
+
+
+def test_matching_final_transcript_commits_the_speculation():
+    speculator = Speculator()
+    partials = ["tell me", "tell me about", "tell me about the potion"]
+    turns, llm, _ = run([(partials, "Tell me about the potion?")], speculator)
+
+    # "tell me" is too short; "tell me about" was overtaken by the longer partial
+    assert llm.prompts == ["tell me about", "tell me about the potion"]
+    assert llm.discarded == 1 and llm.history == ["tell me about the potion"]
+    assert turns[0].response_text.startswith("You asked: tell me about the potion.")
+    assert speculator.stats["hits"] == 1 and speculator.stats["misses"] == 0
+    assert speculator.stats["started"] == 2 and speculator.stats["wasted_tokens"] > 0
+    assert speculator.hit_rate() == 1.0
+
+
+def test_speculation_cuts_time_to_first_audio():
+    utterance = (["what is the magic potion"], "what is the magic potion")
+    plain, _, _ = run([utterance], gap=0.4)
+    speculative, llm, _ = run([utterance], Speculator(), gap=0.4)
+
+    def waited(turn):
+        return turn.timings["first_chunk"] - turn.timings["transcribed"]
+
+    # The reply was already streaming while the visitor finished the sentence
+    assert waited(plain[0]) >= 0.25
+    assert waited(speculative[0]) < 0.1
+    assert speculative[0].time_to_first_audio() < plain[0].time_to_first_audio() - 0.2
+    assert llm.prompts == ["what is the magic potion"]
+
+
+def test_diverging_final_transcript_regenerates():
+    speculator = Speculator()
+    accountant = SessionAccountant()
+    turns, llm, _ = run([(["tell me about the Romans"], "tell me about the Gauls")], speculator,
+                        accountant=accountant)
+
+    assert llm.prompts == ["tell me about the Romans", "tell me about the Gauls"]
+    assert llm.discarded == 1 and llm.history == ["tell me about the Gauls"]
+    assert turns[0].response_text.startswith("You asked: tell me about the Gauls.")
+    assert speculator.stats["misses"] == 1 and speculator.stats["hits"] == 0
+    assert speculator.stats["wasted_tokens"] > 0
+    assert accountant.turns[0]["speculative_tokens_wasted"] == speculator.stats["wasted_tokens"]
+
+
+def test_fast_path_and_unclear_turns_cancel_the_speculation():
+    hit = FAQHit("who is obelix", "who is obelix", "My best friend, the menhir delivery man.", 0.95)
+    speculator = Speculator()
+    llm = EchoLLM(faq={"who is obelix": hit})
+    turns, _, _ = run([(["who is obelix"], "who is obelix"), (["mumble mumble mumble"], "")], speculator, llm)
+
+    assert turns[0].from_fast_path
+    assert turns[1].user_text is None
+    assert llm.prompts == ["who is obelix", "mumble mumble mumble"]
+    assert llm.discarded == 2 and llm.history == []
+    assert speculator.stats["misses"] == 2 and speculator.current is None
+
+
+def test_first_sentence_is_synthesized_ahead():
+    tts = FakeTTS(delay=0.2)
+    speculator = Speculator(prepare_tts=True)
+    turns, _, engine = run([(["what is the magic potion"], "what is the magic potion")], speculator, tts=tts, gap=0.6)
+
+    # Rendered while the visitor was still speaking, then played without a second render
+    assert tts.texts[0] == "You asked: what is the magic potion."
+    assert tts.texts.count(tts.texts[0]) == 1
+    assert [c.text for c in engine.sink.played] == turns[0].sentences
+    assert turns[0].time_to_first_audio() < 0.1
+
+    tts = FakeTTS(delay=0.05)
+    speculator = Speculator(prepare_tts=True)
+    turns, _, engine = run([(["tell me about the Romans"], "tell me about the Gauls")], speculator, tts=tts, gap=0.6)
+    assert speculator.stats["wasted_clips"] == 1
+    assert "You asked: tell me about the Romans." in tts.texts
+    assert [c.text for c in engine.sink.played] == turns[0].sentences
+
+
+def test_hit_rate_report():
+    speculator = Speculator()
+    run([(["what is the magic potion"], "what is the magic potion"),
+         (["tell me about the Romans"], "tell me about the Gauls")], speculator, EchoLLM(first_token=0.05))
+
+    assert speculator.hit_rate() == 0.5
+    report = speculator.report()
+    print("\n" + report)
+    assert "1 hits, 1 misses (50% hit rate)" in report
+
+
+class FlakyChat:
+    """Gemini chat whose first streamed reply fails: at send, or after one chunk."""
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.history = [("primer", "context")]
+        self.rewinds = 0
+
+    def send_message(self, text, stream=False, request_options=None):
+        if self.fail == "send":
+            self.fail = None
+            raise ConnectionError("reset")
+        failing, self.fail = self.fail, None
+        self.history.append((text, "reply"))
+
+        def chunks():
+            yield types.SimpleNamespace(text=f"About {text}. ")
+            if failing:
+                raise ConnectionError("stream cut")
+            yield types.SimpleNamespace(text="By Toutatis!")
+        return chunks()
+
+    def rewind(self):
+        self.rewinds += 1
+        self.history.pop()
+
+
+@pytest.mark.parametrize("fail", ["send", "stream", None])
+def test_failed_speculation_is_not_discarded_twice(monkeypatch, fail):
+    llm_client = pytest.importorskip("llm_client")
+    from stages import GeminiLLM
+
+    chat = FlakyChat(fail)
+    model = types.SimpleNamespace(start_chat=lambda history: chat)
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_client, "genai", types.SimpleNamespace(
+        configure=lambda **kwargs: None, GenerativeModel=lambda **kwargs: model))
+    gemini = llm_client.AsterixLLM(context=(None, 0))
+    llm = GeminiLLM(gemini, faq=types.SimpleNamespace(match=lambda text: None))
+
+    speculator = Speculator()
+    turns, _, _ = run([(["tell me about the Romans"], "tell me about the Gauls")], speculator, llm)
+
+    assert speculator.stats["misses"] == 1
+    assert turns[0].response_text == "About tell me about the Gauls. By Toutatis!"
+    # A failed stream already dropped its exchange (or never made one); only a
+    # speculation that reached the chat is rewound, and the primer always stays
+    assert chat.rewinds == (0 if fail == "send" else 1)
+    assert chat.history == [("primer", "context"), ("tell me about the Gauls", "reply")]
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+from startup import StartupOrchestrator
+
+# Mocked backend init costs (seconds), roughly proportional to the real ones:
+# the robot status call is fast, the transcript upload + polling is slow.
+ROBOT_DELAY = 0.05
+AUDIO_DELAY = 0.05
+FAQ_DELAY = 0.02
+LLM_DELAY = 0.4
+
+
+def slow(delay, value):
+    def factory(*deps):
+        time.sleep(delay)
+        return value
+    return factory
+
+
+def build_mock_startup(greeted):
+    startup = StartupOrchestrator()
+    startup.add("robot", slow(ROBOT_DELAY, "robot"), on_ready=lambda robot: greeted.set())
+    startup.add("audio", slow(AUDIO_DELAY, "audio"))
+    startup.add("faq", slow(FAQ_DELAY, "faq"))
+    startup.add("llm", slow(LLM_DELAY, "llm"), depends_on=["faq"])
+    return startup
+
+
+def test_dependencies_are_passed_and_ordered():
+    startup = StartupOrchestrator()
+    startup.add("faq", slow(0.01, "faq"))
+    startup.add("llm", lambda faq: f"llm({faq})", depends_on=["faq"])
+    results = startup.start().wait(timeout=2)
+
+    assert results == {"faq": "faq", "llm": "llm(faq)"}
+    assert startup.timings["llm"]["start"] >= startup.timings["faq"]["ready"]
+
+
+def test_unknown_dependency_rejected():
+    with pytest.raises(ValueError):
+        StartupOrchestrator().add("llm", lambda faq: faq, depends_on=["faq"])
+
+
+def test_failure_propagates_to_dependents():
+    def broken():
+        raise ValueError("GEMINI_API_KEY not found")
+
+    startup = StartupOrchestrator()
+    startup.add("llm", broken)
+    startup.add("engine", lambda llm: llm, depends_on=["llm"])
+    startup.add("robot", slow(0.01, "robot"))
+    startup.start()
+
+    assert startup.get("robot", timeout=2) == "robot"
+    with pytest.raises(ValueError):
+        startup.get("engine", timeout=2)
+    assert not startup.ready("llm")
+
+
+def test_startup_benchmark():
+    """Ready-before-complete: greeting fires at robot speed, not LLM speed."""
+    sequential = ROBOT_DELAY + AUDIO_DELAY + FAQ_DELAY + LLM_DELAY
+
+    greeted = threading.Event()
+    start = time.perf_counter()
+    startup = build_mock_startup(greeted).start()
+    assert greeted.wait(timeout=2)
+    time_to_greeting = time.perf_counter() - start
+    startup.wait(timeout=2)
+    total = time.perf_counter() - start
+
+    print(f"\nsequential {sequential:.2f}s | greeting {time_to_greeting:.2f}s | all ready {total:.2f}s")
+    print(startup.report())
+
+    assert time_to_greeting < LLM_DELAY / 2
+    assert total < sequential - (ROBOT_DELAY + AUDIO_DELAY) / 2
+    assert set(startup.timings) == {"robot", "audio", "faq", "llm"}
+
+
+class FakeRobot:
+    def __init__(self):
+        self.played = []
+
+    def play_sound(self, name):
+        self.played.append(name)
+
+
+class FakeRobotAudio:
+    """The robot's sounds directory, as seen through AudioHandler."""
+
+    def __init__(self, sounds=()):
+        self.sounds = set(sounds)
+        self.uploads = []
+
+    def has_sound(self, filename):
+        return filename in self.sounds
+
+    def upload_response(self, filename, local_file=None):
+        self.uploads.append(filename)
+        self.sounds.add(filename)
+        return True
+
+
+class FakeRenderer:
+    def __init__(self):
+        self.rendered = []
+
+    def render(self, text, path, voice=None):
+        self.rendered.append(text)
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def test_greeting_is_on_the_robot_before_it_plays(monkeypatch, tmp_path):
+    bot = pytest.importorskip("panoramix_bot")
+    monkeypatch.setattr(bot, "GREETING_CACHE", str(tmp_path / "faq_audio" / bot.GREETING_SOUND))
+    robot, audio, tts = FakeRobot(), FakeRobotAudio(), FakeRenderer()
+
+    assert bot.greet(robot, audio, tts)
+    assert audio.uploads == [bot.GREETING_SOUND] and robot.played == [bot.GREETING_SOUND]
+
+    # Cached locally and on the robot: nothing to render or upload
+    bot.greet(robot, audio, tts)
+    assert len(tts.rendered) == 1 and len(audio.uploads) == 1
+
+    # A reset robot gets the cached clip again
+    audio.sounds.clear()
+    bot.greet(robot, audio, tts)
+    assert len(tts.rendered) == 1 and len(audio.uploads) == 2
+
+
+def test_bot_starts_without_the_clip_store(monkeypatch, tmp_path):
+    bot = pytest.importorskip("panoramix_bot")
+    monkeypatch.setattr(bot, "store_manifest", lambda robot_ip: str(tmp_path / "manifest.json"))
+
+    class UnreachableAudio:
+        robot_ip = "10.0.0.9"
+
+        def connect_ssh(self):
+            return False
+
+    assert bot.open_store(UnreachableAudio(), "10.0.0.9") is None